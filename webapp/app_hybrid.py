@@ -1,20 +1,39 @@
 """
 Hybrid Groundwater Potential Web Application - API Backend
 Serves groundwater prediction data to React frontend
-Reads actual PNG map data without requiring GDAL/rasterio
+Reads the GWP map from a tile pyramid or a memory-mapped .npy class raster
+(exported from the notebook), falling back to the PNG overlay; serving needs
+no GDAL/rasterio
 """
 
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, request, jsonify, g, has_request_context, send_file, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import numpy as np
 import json
+import csv
 import os
-import requests
-from datetime import datetime, timedelta
-from PIL import Image
+from datetime import datetime
 import io
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from gwp_raster import ClassRaster, GWP_CLASS_NAMES, NODATA, raster_signature, span_counts
+from gwp_pyramid import GWPPyramid, MANIFEST_NAME
+from gwp_tiles import TileCache, MAX_ZOOM, map_version
+from gwp_features import FeatureCube
+from gwp_attribution import attribution_summary
+from geo_mask import geometry_key, polygon_rings, rasterize_spans
+from caching import LRUCache
+from weather_client import WeatherClient, WeatherUnavailable, DEFAULT_BASE_URL
+from weather_prefetch import WeatherPrefetcher, district_cells
+from xai import generate_xai_explanation, generate_xai_explanations
+from reports import ReportJobs, ADVANCED_REPORT_FIELDS, iter_zip
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from forecast import (forecast_columns, simulated_columns, stack_columns, daily_aggregate,
+                      rainfall_summary, rainfall_ratings, forecast_payload)
+from batch_io import (DEFAULT_CHUNK_SIZE, iter_coordinate_chunks, iter_csv_records, spool_upload,
+                      spooled_file, is_parquet_upload, open_enriched_csv, enrich_parquet)
 
 app = Flask(__name__)
 CORS(app)
@@ -23,61 +42,317 @@ CORS(app)
 DATA_DIR = r"C:\Users\Suhas\Downloads\DATAAA"
 WEBAPP_DIR = r"C:\Users\Suhas\Downloads\DATAAA\webapp"
 OPENWEATHER_API_KEY = "7a04c1c84bb99000118b51fbba42f53d"
+# Point at a local stub server for testing, e.g. http://127.0.0.1:8081/data/2.5
+OPENWEATHER_BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", DEFAULT_BASE_URL)
+# Background refresh of the district weather grid: "1" starts it on import (WSGI servers),
+# "0" keeps it off; by default it starts when the app is run directly
+WEATHER_PREFETCH = os.environ.get("WEATHER_PREFETCH")
+
+# Sites per /api/precipitation-forecast/batch request
+MAX_FORECAST_SITES = 5000
+# Concurrent upstream forecast fetches for cells not yet prefetched (matches the client's pool)
+FORECAST_FETCH_WORKERS = 10
 
 # Dharwad district bounds
 dharwad_bounds = [74.5, 15.0, 75.5, 16.0]
 
 # ==================== LOAD ACTUAL GWP MAP IMAGE ====================
-try:
-    gwp_image_path = os.path.join(DATA_DIR, "gwp_overlay.png")
-    if os.path.exists(gwp_image_path):
-        gwp_image = Image.open(gwp_image_path)
-        gwp_array = np.array(gwp_image)
-        print(f"✅ Loaded GWP overlay: {gwp_array.shape}")
-        
-        # Get image bounds (you can adjust these based on your map)
-        img_height, img_width = gwp_array.shape[:2]
-        
-        # Map pixel coordinates to geographic coordinates
-        lat_min, lat_max = dharwad_bounds[1], dharwad_bounds[3]
-        lon_min, lon_max = dharwad_bounds[0], dharwad_bounds[2]
-        
-        def latlon_to_pixel(lat, lon):
-            """Convert lat/lon to pixel coordinates in the image"""
-            # Normalize to 0-1
-            norm_lat = (lat - lat_min) / (lat_max - lat_min)
-            norm_lon = (lon - lon_min) / (lon_max - lon_min)
-            
-            # Convert to pixel (note: image Y axis is inverted)
-            pixel_x = int(norm_lon * img_width)
-            pixel_y = int((1 - norm_lat) * img_height)  # Invert Y
-            
-            # Clamp to image bounds
-            pixel_x = max(0, min(pixel_x, img_width - 1))
-            pixel_y = max(0, min(pixel_y, img_height - 1))
-            
-            return pixel_y, pixel_x
-        
-        def get_gwp_from_color(pixel_color):
-            """Determine GWP class from pixel RGB color"""
-            r, g, b = pixel_color[:3]
-            
-            # Based on typical color scheme: Red=Low, Yellow=Moderate, Green=High
-            if g > r and g > b:  # Greenish
-                return "High", 2
-            elif r > 150 and g > 150:  # Yellowish
-                return "Moderate", 1
-            else:  # Reddish or other
-                return "Low", 0
-        
-        ACTUAL_DATA_LOADED = True
-        print("✅ Using ACTUAL GWP data from your map!")
+gwp_image_path = os.path.join(DATA_DIR, "gwp_overlay.png")
+# Class raster exported from dharwad_gwp_map.tif (python gwp_raster.py export ...),
+# opened memory-mapped and preferred over the PNG overlay when present
+gwp_raster_npy_path = os.path.join(DATA_DIR, "dharwad_gwp_classes.npy")
+# Tiled multi-resolution store built from the class raster (python gwp_pyramid.py build ...),
+# preferred over both: point queries touch one tile, area queries read coarse levels
+gwp_pyramid_dir = os.path.join(DATA_DIR, "dharwad_gwp_pyramid")
+# Real NDVI/NDWI/DEM resampled onto the class grid (gwp_features.export_feature_cube)
+gwp_features_npy_path = os.path.join(DATA_DIR, "dharwad_gwp_features.npy")
+feature_cube = None
+feature_cube_signature = None
+# Per-pixel model occlusion attributions on the class grid (gwp_attribution.export_attribution_raster)
+gwp_attribution_npy_path = os.path.join(DATA_DIR, "dharwad_gwp_attribution.npy")
+attribution_cube = None
+attribution_signature = None
+gwp_raster = None
+gwp_map_path = None
+gwp_map_signature = None
+gwp_map_version = None
+ACTUAL_DATA_LOADED = False
+
+# Rendered XYZ tiles: in-memory LRU in front of DATA_DIR/tile_cache/<map version>/
+tile_cache = TileCache(os.path.join(DATA_DIR, "tile_cache"))
+
+# Rasterized polygon masks (row spans) keyed by (geometry hash, map version)
+polygon_mask_cache = LRUCache(maxsize=512)
+
+# Single-point endpoint payloads keyed by (endpoint, snapped pixel, params, map version)
+point_response_cache = LRUCache(maxsize=4096)
+
+# Pooled, cached (per ~10 km cell), coalesced and circuit-broken OpenWeather access
+weather_client = WeatherClient(OPENWEATHER_API_KEY, base_url=OPENWEATHER_BASE_URL)
+
+# Keeps current weather and the forecast warm for every cell over the district;
+# while it runs, request handlers read its store and never wait on OpenWeather
+weather_prefetcher = WeatherPrefetcher(weather_client, district_cells(weather_client, dharwad_bounds))
+
+# PDF reports rendered in a process pool, cached under DATA_DIR/report_cache/<input hash>.pdf
+report_jobs = ReportJobs(os.path.join(DATA_DIR, "report_cache"))
+# Longest the synchronous download endpoints wait for a render
+REPORT_TIMEOUT_SECONDS = 60
+# Sites per /api/batch-report request
+MAX_REPORT_SITES = 2000
+
+# Class histogram of the loaded map, rebuilt only when the map file changes
+statistics_cache = {"signature": None, "payload": None}
+
+# How often requests check whether the pipeline republished the map / cubes (hot swap)
+MAP_REFRESH_SECONDS = 5
+map_refresh_lock = threading.Lock()
+map_refresh_state = {"checked": 0.0, "failed": None}
+
+# Request and stage instrumentation, scraped from /metrics (Prometheus text format)
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram(
+    "gwp_http_request_duration_seconds", "Time to build the response, per route", ("route", "method"))
+REQUESTS = metrics.counter(
+    "gwp_http_requests_total", "Requests served, per route and status code", ("route", "method", "status"))
+REQUEST_EXCEPTIONS = metrics.counter(
+    "gwp_http_request_exceptions_total", "Requests ended by an unhandled exception", ("route", "method"))
+# Raster lookup vs weather fetch vs PDF render time inside the requests
+STAGE_SECONDS = metrics.histogram(
+    "gwp_stage_duration_seconds", "Time spent in a processing stage", ("stage",))
+
+def get_map_signature(path):
+    """(mtime, size) of the map file (sidecar + array file for .npy rasters), or None if it is missing"""
+    if path.endswith(".npy"):
+        return raster_signature(path)
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def resolve_gwp_map_path():
+    """Preferred map source: tile pyramid, then memory-mapped class raster, else the PNG overlay"""
+    for path in (os.path.join(gwp_pyramid_dir, MANIFEST_NAME), gwp_raster_npy_path, gwp_image_path):
+        if get_map_signature(path) is not None:
+            return path
+    return None
+
+def open_gwp_raster(path):
+    """Open a map source found by resolve_gwp_map_path as a class raster or tile pyramid"""
+    if os.path.basename(path) == MANIFEST_NAME:
+        raster = GWPPyramid.open(gwp_pyramid_dir)
+        print(f"✅ Opened GWP tile pyramid: {raster.shape}, {len(raster.levels)} levels "
+              f"of {raster.tile_size}px tiles from {gwp_pyramid_dir}")
+    elif path == gwp_raster_npy_path:
+        # Memory-mapped: only the pages a query touches are read,
+        # and all worker processes share the OS page cache
+        raster = ClassRaster.from_npy(path)
+        print(f"✅ Memory-mapped GWP class raster: {raster.shape} from {path}")
     else:
-        print(f"⚠️  GWP overlay not found at {gwp_image_path}")
-        ACTUAL_DATA_LOADED = False
-except Exception as e:
-    print(f"⚠️  Could not load GWP image: {e}")
-    ACTUAL_DATA_LOADED = False
+        # Decode the overlay colours ONCE into a compact uint8 class raster
+        # (0=Low, 1=Moderate, 2=High, NODATA=transparent) with its geotransform
+        raster = ClassRaster.from_overlay_png(path, dharwad_bounds)
+        print(f"✅ Loaded GWP overlay as class raster: {raster.shape} ({raster.nbytes // 1024} KB)")
+    return raster
+
+def load_gwp_raster():
+    """
+    Open the GWP class raster, warm its statistics and summed-area table, then
+    swap it in with one assignment. If the load fails the current map (if any)
+    keeps being served. Returns whether a map was loaded.
+    """
+    global gwp_raster, gwp_map_path, gwp_map_signature, gwp_map_version, ACTUAL_DATA_LOADED
+    try:
+        path = resolve_gwp_map_path()
+        signature = get_map_signature(path) if path else None
+        if signature is None:
+            print(f"⚠️  GWP overlay not found at {gwp_image_path}")
+            return False
+        
+        raster = open_gwp_raster(path)
+        version = map_version(path, signature)
+        compute_map_statistics(raster, signature)
+        if isinstance(raster, ClassRaster):
+            # Build (or memory-map) the summed-area table now, not on the first area query
+            raster.integral()
+    except Exception as e:
+        print(f"⚠️  Could not load GWP image: {e}" + (" (keeping the current map)" if ACTUAL_DATA_LOADED else ""))
+        return False
+    
+    gwp_raster, gwp_map_path, gwp_map_signature, gwp_map_version, ACTUAL_DATA_LOADED = (
+        raster, path, signature, version, True)
+    # Tiles of the replaced map are never served again; delete them off the request path
+    threading.Thread(target=tile_cache.prune, args=(version,), name="tile-prune", daemon=True).start()
+    print("✅ Using ACTUAL GWP data from your map!")
+    return True
+
+def open_cube(path, label):
+    """(cube, signature) for an exported (H, W, bands) raster; cube is None if missing or unreadable"""
+    signature = get_map_signature(path)
+    if signature is None:
+        return None, None
+    try:
+        cube = FeatureCube.from_npy(path)
+        print(f"✅ Memory-mapped {label} ({', '.join(cube.bands)}): {cube.shape}")
+        return cube, signature
+    except Exception as e:
+        print(f"⚠️  Could not load {label}: {e}")
+        return None, signature
+
+def load_feature_cube():
+    """Open the NDVI/NDWI/DEM feature cube memory-mapped if it has been exported"""
+    global feature_cube, feature_cube_signature
+    feature_cube, feature_cube_signature = open_cube(gwp_features_npy_path, "feature cube")
+
+def load_attribution_cube():
+    """Open the model occlusion attribution raster memory-mapped if it has been exported"""
+    global attribution_cube, attribution_signature
+    attribution_cube, attribution_signature = open_cube(gwp_attribution_npy_path, "attribution raster")
+
+def refresh_gwp_raster():
+    """Reload the class raster if the map file changed (or a better source appeared) on disk"""
+    path = resolve_gwp_map_path()
+    signature = get_map_signature(path) if path else None
+    changed = path != gwp_map_path or signature != gwp_map_signature
+    # A file that failed to load is retried only once it changes again
+    if signature is not None and changed and (path, signature) != map_refresh_state["failed"]:
+        print("🔄 GWP map changed on disk, reloading class raster...")
+        map_refresh_state["failed"] = None if load_gwp_raster() else (path, signature)
+    if get_map_signature(gwp_features_npy_path) != feature_cube_signature:
+        load_feature_cube()
+    if get_map_signature(gwp_attribution_npy_path) != attribution_signature:
+        load_attribution_cube()
+
+def refresh_in_background():
+    """Map refresh thread body; releases the map_refresh_lock taken by hot_swap_gwp_raster"""
+    try:
+        refresh_gwp_raster()
+    finally:
+        map_refresh_lock.release()
+
+@app.before_request
+def hot_swap_gwp_raster():
+    """
+    Pick up a republished map within MAP_REFRESH_SECONDS. One request starts the
+    check on a background thread; every request, that one included, carries on
+    with the current map until the new one is swapped in.
+    """
+    now = time.monotonic()
+    if now - map_refresh_state["checked"] < MAP_REFRESH_SECONDS or not map_refresh_lock.acquire(blocking=False):
+        return
+    map_refresh_state["checked"] = now
+    try:
+        threading.Thread(target=refresh_in_background, name="map-refresh", daemon=True).start()
+    except Exception:
+        map_refresh_lock.release()
+        raise
+
+def compute_map_statistics(raster=None, map_signature=None):
+    """
+    Vectorized class distribution + real per-class area, cached by map (and feature
+    cube) signature; for the loaded map unless a raster being loaded is given
+    """
+    if raster is None:
+        raster, map_signature = gwp_raster, gwp_map_signature
+    signature = (map_signature, feature_cube_signature)
+    if statistics_cache["signature"] == signature and statistics_cache["payload"]:
+        return statistics_cache["payload"]
+    
+    counts, areas_km2 = raster.class_histogram()
+    total = int(counts.sum())
+    total_area = float(areas_km2.sum())
+    if total == 0:
+        raise ValueError("GWP map has no classified pixels")
+    
+    payload = {
+        "total_area": round(total_area, 2),
+        "gwp_distribution": {
+            name: round(int(counts[k]) / total * 100, 1) for k, name in enumerate(GWP_CLASS_NAMES)
+        },
+        "gwp_area_km2": {
+            name: round(float(areas_km2[k]), 2) for k, name in enumerate(GWP_CLASS_NAMES)
+        },
+        "gwp_pixel_counts": {
+            name: int(counts[k]) for k, name in enumerate(GWP_CLASS_NAMES)
+        },
+        "average_ndvi": 0.486,
+        "average_ndwi": 0.142,
+        "average_elevation": 678.5,
+        "data_source": "Actual GWP map"
+    }
+    if feature_cube is not None:
+        ndvi_mean, ndwi_mean, dem_mean = feature_cube.band_means()
+        payload.update({
+            "average_ndvi": round(float(ndvi_mean), 3),
+            "average_ndwi": round(float(ndwi_mean), 3),
+            "average_elevation": round(float(dem_mean), 1),
+            "data_source": "Actual GWP map + Sentinel-2/DEM feature rasters"
+        })
+    # Payload first: a reader that sees the new signature also sees its payload
+    statistics_cache["payload"] = payload
+    statistics_cache["signature"] = signature
+    return payload
+
+# ==================== INSTRUMENTATION ====================
+
+def request_route():
+    """Route template (e.g. /api/reports/<job_id>) so per-route series stay bounded"""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed responses are timed up to the first byte
+    started = g.pop('request_started', None)
+    if started is not None:
+        route, method = request_route(), request.method
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=method)
+        REQUESTS.inc(route=route, method=method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def record_request_exception(exc):
+    if exc is not None:
+        REQUEST_EXCEPTIONS.inc(route=request_route(), method=request.method)
+
+def cache_stats():
+    """Name -> LRUCache-style stats for every cache the backend keeps"""
+    stats = {
+        "tile_memory": tile_cache.stats(),
+        "polygon_mask": polygon_mask_cache.stats(),
+        "point_response": point_response_cache.stats(),
+    }
+    for kind, kind_stats in weather_client.stats()["cache"].items():
+        stats[f"weather_{kind}"] = kind_stats
+    return stats
+
+def cache_samples(field):
+    return [((name,), stats[field]) for name, stats in cache_stats().items()]
+
+metrics.counter_callback("gwp_cache_hits_total", "Cache hits", ("cache",), lambda: cache_samples("hits"))
+metrics.counter_callback("gwp_cache_misses_total", "Cache misses", ("cache",), lambda: cache_samples("misses"))
+metrics.gauge("gwp_cache_hit_ratio", "Cache hits / lookups since start (NaN before the first lookup)", ("cache",),
+              lambda: cache_samples("hit_ratio"))
+metrics.gauge("gwp_cache_entries", "Entries currently cached", ("cache",), lambda: cache_samples("size"))
+metrics.counter_callback("gwp_tile_disk_hits_total", "Tiles served from the on-disk tile cache", (),
+                         lambda: [((), tile_cache.disk_hits)])
+metrics.counter_callback("gwp_weather_upstream_calls_total", "Requests sent to OpenWeather", (),
+                         lambda: [((), weather_client.upstream_calls)])
+metrics.gauge("gwp_weather_circuit_open", "1 while the OpenWeather circuit breaker is open", (),
+              lambda: [((), int(weather_client.breaker.state == "open"))])
+metrics.counter_callback("gwp_report_renders_total", "PDF reports rendered by the worker pool", (),
+                         lambda: [((), report_jobs.renders)])
+metrics.counter_callback("gwp_report_cache_hits_total", "PDF reports served from the report cache", (),
+                         lambda: [((), report_jobs.cache_hits)])
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Request, stage and cache metrics in the Prometheus text exposition format"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 # ==================== DIAGNOSTIC ENDPOINTS ====================
 
@@ -86,13 +361,33 @@ def system_status():
     """Check if actual data is loaded"""
     return jsonify({
         "actual_data_loaded": ACTUAL_DATA_LOADED,
-        "gwp_image_path": os.path.join(DATA_DIR, "gwp_overlay.png"),
-        "gwp_image_exists": os.path.exists(os.path.join(DATA_DIR, "gwp_overlay.png")),
+        "gwp_image_path": gwp_image_path,
+        "gwp_image_exists": os.path.exists(gwp_image_path),
         "data_dir": DATA_DIR,
-        "message": "Using REAL data from gwp_overlay.png" if ACTUAL_DATA_LOADED else "⚠️ WARNING: Using SIMULATED data - gwp_overlay.png not loaded!",
+        "gwp_map_path": gwp_map_path,
+        "gwp_raster_shape": list(gwp_raster.shape) if ACTUAL_DATA_LOADED else None,
+        "gwp_raster_memory_mapped": gwp_raster.memory_mapped if ACTUAL_DATA_LOADED else False,
+        "gwp_pyramid_levels": len(gwp_raster.levels) if isinstance(gwp_raster, GWPPyramid) else None,
+        "gwp_map_version": gwp_map_version,
+        "tile_cache": tile_cache.stats(),
+        "polygon_mask_cache": polygon_mask_cache.stats(),
+        "feature_cube_loaded": feature_cube is not None,
+        "attribution_raster_loaded": attribution_cube is not None,
+        "point_response_cache": point_response_cache.stats(),
+        "weather_client": weather_client.stats(),
+        "weather_prefetcher_running": weather_prefetcher.running,
+        "report_jobs": report_jobs.stats(),
+        "message": f"Using REAL data from {os.path.basename(gwp_map_path)}" if ACTUAL_DATA_LOADED else "⚠️ WARNING: Using SIMULATED data - gwp_overlay.png not loaded!",
         "fix": "If using simulated data, restart Flask backend: python app_hybrid.py" if not ACTUAL_DATA_LOADED else "All good!"
     })
 
+@app.route('/api/weather-status', methods=['GET'])
+def weather_status():
+    """Prefetcher state and per-cell age of the cached current weather and forecast"""
+    status = weather_prefetcher.status()
+    status["circuit"] = weather_client.breaker.state
+    return jsonify(status)
+
 # ==================== DATA FUNCTIONS ====================
 
 def check_if_in_dharwad(lat, lon):
@@ -104,76 +399,136 @@ def validate_location(lat, lon):
     """Validate if location is within Dharwad district bounds"""
     return check_if_in_dharwad(lat, lon)
 
-def get_values_from_actual_map(lat, lon):
-    """Get actual GWP value from your generated map"""
-    if not ACTUAL_DATA_LOADED:
-        return get_simulated_values(lat, lon)
+# Base NDVI / NDWI / DEM per GWP class (Low, Moderate, High)
+# Higher GWP typically means better conditions
+CLASS_BASE_PARAMS = np.array([
+    [0.2, -0.05, 700.0],
+    [0.4, 0.1, 660.0],
+    [0.5, 0.2, 620.0],
+])
+
+# Three uniform draws per location seed, identical to np.random.seed(s) followed by
+# three np.random.random() calls, so derived values stay reproducible without
+# reseeding the global RNG for every point
+LOCATION_JITTER = np.array([np.random.RandomState(s).random_sample(3) for s in range(1000)])
+
+def location_seeds(lats, lons):
+    """Per-point seed into LOCATION_JITTER (same seed the per-point code used)"""
+    return np.trunc((lats + lons) * 10000).astype(np.int64) % 1000
+
+def location_rng(lat, lon):
+    """Local random generator seeded by a location (thread-safe, leaves the global RNG alone)"""
+    return np.random.default_rng(int(location_seeds(np.float64(lat), np.float64(lon))))
+
+def in_dharwad_many(lats, lons):
+    """Vectorized check_if_in_dharwad"""
+    return ((lons >= dharwad_bounds[0]) & (lons <= dharwad_bounds[2]) &
+            (lats >= dharwad_bounds[1]) & (lats <= dharwad_bounds[3]))
+
+def simulated_values_many(lats, lons):
+    """Vectorized fallback: simulated parameters and class for N points"""
+    jitter = LOCATION_JITTER[location_seeds(lats, lons)]
+    ndvi = 0.3 + jitter[:, 0] * 0.4
+    ndwi = -0.1 + jitter[:, 1] * 0.4
+    dem = 600 + jitter[:, 2] * 100
+    
+    score = (ndvi * 0.3) + (ndwi * 0.4) + ((750 - dem) / 200 * 0.3)
+    gwp_value = np.where(score > 0.6, 2, np.where(score > 0.4, 1, 0))
+    return gwp_value, ndvi, ndwi, dem
+
+@STAGE_SECONDS.time(stage="raster_lookup")
+def lookup_many(lats, lons):
+    """
+    Vectorized GWP lookup for N points in one pass:
+    lat/lon -> pixel indices -> class + NDVI/NDWI/DEM from the feature cube.
+    Without a cube value the parameters are derived from the class; points
+    without map data (map not loaded or no-data pixel) use the simulated model.
+    """
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
     
+    sim_value, sim_ndvi, sim_ndwi, sim_dem = simulated_values_many(lats, lons)
+    
+    if ACTUAL_DATA_LOADED:
+        classes = gwp_raster.sample(lats, lons)
+        simulated = classes == NODATA
+        gwp_value = np.where(simulated, 0, classes).astype(np.int64)
+        
+        # Class base values plus small location-seeded variation for realism
+        base = CLASS_BASE_PARAMS[gwp_value]
+        jitter = LOCATION_JITTER[location_seeds(lats, lons)] - 0.5
+        ndvi = base[:, 0] + jitter[:, 0] * 0.1
+        ndwi = base[:, 1] + jitter[:, 1] * 0.1
+        dem = base[:, 2] + jitter[:, 2] * 30
+        
+        gwp_value = np.where(simulated, sim_value, gwp_value)
+        ndvi = np.where(simulated, sim_ndvi, ndvi)
+        ndwi = np.where(simulated, sim_ndwi, ndwi)
+        dem = np.where(simulated, sim_dem, dem)
+    else:
+        simulated = np.ones(lats.shape, dtype=bool)
+        gwp_value, ndvi, ndwi, dem = sim_value, sim_ndvi, sim_ndwi, sim_dem
+    
+    # Real satellite/DEM values wherever the cube has them (one gather for all points)
+    measured = np.zeros(lats.shape, dtype=bool)
+    if feature_cube is not None and ACTUAL_DATA_LOADED:
+        features = feature_cube.sample(lats, lons)
+        measured = ~simulated & np.isfinite(features).all(axis=1)
+        ndvi = np.where(measured, features[:, 0], ndvi)
+        ndwi = np.where(measured, features[:, 1], ndwi)
+        dem = np.where(measured, features[:, 2], dem)
+    
+    return {
+        "gwp_value": gwp_value,
+        "gwp_class": np.array(GWP_CLASS_NAMES)[gwp_value],
+        "ndvi": np.round(ndvi, 3),
+        "ndwi": np.round(ndwi, 3),
+        "dem": np.round(dem, 1),
+        "simulated": simulated,
+        "measured": measured
+    }
+
+def values_at(lookup, i):
+    """Per-point values dict (legacy get_values_from_actual_map shape) from a lookup_many result"""
+    return {
+        "ndvi": float(lookup['ndvi'][i]),
+        "ndwi": float(lookup['ndwi'][i]),
+        "dem": float(lookup['dem'][i]),
+        "gwp_class": str(lookup['gwp_class'][i]),
+        "gwp_value": int(lookup['gwp_value'][i]),
+        "data_source": data_source_at(lookup, i)
+    }
+
+def data_source_at(lookup, i):
+    """Provenance label for one point of a lookup_many result"""
+    if lookup['simulated'][i]:
+        return "Simulated data"
+    if lookup['measured'][i]:
+        return "Actual GWP map + Sentinel-2/DEM feature rasters"
+    return "Actual GWP map + derived parameters"
+
+def get_values_from_actual_map(lat, lon):
+    """Get actual GWP value from your generated map (reusing the point_cached lookup for this point)"""
     try:
-        # Convert to pixel coordinates
-        pixel_y, pixel_x = latlon_to_pixel(lat, lon)
-        
-        # Get pixel color
-        pixel_color = gwp_array[pixel_y, pixel_x]
-        
-        # Determine GWP class from color
-        gwp_class, gwp_value = get_gwp_from_color(pixel_color)
-        
-        # Generate realistic NDVI, NDWI, DEM based on GWP class
-        # Higher GWP typically means better conditions
-        if gwp_class == "High":
-            base_ndvi = 0.5
-            base_ndwi = 0.2
-            base_dem = 620
-        elif gwp_class == "Moderate":
-            base_ndvi = 0.4
-            base_ndwi = 0.1
-            base_dem = 660
-        else:
-            base_ndvi = 0.2
-            base_ndwi = -0.05
-            base_dem = 700
-        
-        # Add small random variation for realism
-        np.random.seed(int((lat + lon) * 10000) % 1000)
-        ndvi = base_ndvi + (np.random.random() - 0.5) * 0.1
-        ndwi = base_ndwi + (np.random.random() - 0.5) * 0.1
-        dem = base_dem + (np.random.random() - 0.5) * 30
-        
-        return {
-            "ndvi": round(ndvi, 3),
-            "ndwi": round(ndwi, 3),
-            "dem": round(dem, 1),
-            "gwp_class": gwp_class,
-            "gwp_value": gwp_value,
-            "data_source": "Actual GWP map + derived parameters"
-        }
+        shared = g.get('point_lookup') if has_request_context() else None
+        if shared is not None and shared[:2] == (lat, lon):
+            return values_at(shared[2], 0)
+        return values_at(lookup_many(lat, lon), 0)
     except Exception as e:
         print(f"Error reading map: {e}")
         return get_simulated_values(lat, lon)
 
 def get_simulated_values(lat, lon):
     """Fallback: Generate simulated values if actual map not available"""
-    np.random.seed(int((lat + lon) * 10000) % 1000)
-    
-    ndvi = 0.3 + np.random.random() * 0.4
-    ndwi = -0.1 + np.random.random() * 0.4
-    dem = 600 + np.random.random() * 100
-    
-    score = (ndvi * 0.3) + (ndwi * 0.4) + ((750 - dem) / 200 * 0.3)
-    
-    if score > 0.6:
-        gwp_class, gwp_value = "High", 2
-    elif score > 0.4:
-        gwp_class, gwp_value = "Moderate", 1
-    else:
-        gwp_class, gwp_value = "Low", 0
+    gwp_value, ndvi, ndwi, dem = simulated_values_many(np.array([lat], dtype=np.float64),
+                                                       np.array([lon], dtype=np.float64))
+    gwp_value = int(gwp_value[0])
     
     return {
-        "ndvi": round(ndvi, 3),
-        "ndwi": round(ndwi, 3),
-        "dem": round(dem, 1),
-        "gwp_class": gwp_class,
+        "ndvi": round(float(ndvi[0]), 3),
+        "ndwi": round(float(ndwi[0]), 3),
+        "dem": round(float(dem[0]), 1),
+        "gwp_class": GWP_CLASS_NAMES[gwp_value],
         "gwp_value": gwp_value,
         "data_source": "Simulated data"
     }
@@ -189,307 +544,103 @@ def get_weather_data(lat, lon):
         }
     
     try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        
-        return {
-            "temperature": data['main']['temp'],
-            "humidity": data['main']['humidity'],
-            "rainfall_today": data.get('rain', {}).get('1h', 0),
-            "description": data['weather'][0]['description']
-        }
-    except:
+        return weather_client.parse_current(read_weather("weather", lat, lon))
+    except (WeatherUnavailable, KeyError, IndexError, TypeError):
         return None
 
-def calculate_feature_importance(ndvi, ndwi, dem, gwp_class):
+@STAGE_SECONDS.time(stage="weather_fetch")
+def read_weather(kind, lat, lon):
     """
-    XAI Feature Importance Calculation (SHAP-like)
-    Calculate how much each feature contributed to the final prediction
+    Raw "weather" / "forecast" payload for the point's cell. Served from the
+    prefetcher's store; goes upstream (through the client's cache) only when the
+    prefetcher is not running, so a running prefetcher means no network wait.
     """
-    # Base importance scores (0-100)
-    gwp_base = {"High": 85, "Moderate": 55, "Low": 25}.get(gwp_class, 50)
-    
-    # Calculate individual feature contributions
-    # NDVI contribution (vegetation health)
-    if ndvi > 0.5:
-        ndvi_contribution = 25  # Strong positive
-        ndvi_impact = "positive"
-    elif ndvi > 0.3:
-        ndvi_contribution = 12  # Moderate positive
-        ndvi_impact = "neutral"
-    else:
-        ndvi_contribution = -15  # Negative
-        ndvi_impact = "negative"
-    
-    # NDWI contribution (water content)
-    if ndwi > 0.3:
-        ndwi_contribution = 30  # Strong positive
-        ndwi_impact = "positive"
-    elif ndwi > 0:
-        ndwi_contribution = 15  # Moderate positive
-        ndwi_impact = "neutral"
-    else:
-        ndwi_contribution = -20  # Negative
-        ndwi_impact = "negative"
-    
-    # Elevation contribution (terrain)
-    if dem < 600:
-        elevation_contribution = 20  # Positive (low elevation favors accumulation)
-        elevation_impact = "positive"
-    elif dem < 750:
-        elevation_contribution = 5  # Slightly positive
-        elevation_impact = "neutral"
-    else:
-        elevation_contribution = -18  # Negative
-        elevation_impact = "negative"
-    
-    # Normalize contributions to sum to 100%
-    total_abs = abs(ndvi_contribution) + abs(ndwi_contribution) + abs(elevation_contribution)
-    
-    if total_abs > 0:
-        ndvi_percentage = (abs(ndvi_contribution) / total_abs) * 100
-        ndwi_percentage = (abs(ndwi_contribution) / total_abs) * 100
-        elevation_percentage = (abs(elevation_contribution) / total_abs) * 100
-    else:
-        ndvi_percentage = ndwi_percentage = elevation_percentage = 33.33
-    
-    return {
-        "vegetation_ndvi": {
-            "value": round(ndvi, 3),
-            "contribution_score": ndvi_contribution,
-            "importance_percentage": round(ndvi_percentage, 1),
-            "impact": ndvi_impact,
-            "interpretation": get_ndvi_interpretation(ndvi)
-        },
-        "water_content_ndwi": {
-            "value": round(ndwi, 3),
-            "contribution_score": ndwi_contribution,
-            "importance_percentage": round(ndwi_percentage, 1),
-            "impact": ndwi_impact,
-            "interpretation": get_ndwi_interpretation(ndwi)
-        },
-        "elevation_dem": {
-            "value": round(dem, 1),
-            "contribution_score": elevation_contribution,
-            "importance_percentage": round(elevation_percentage, 1),
-            "impact": elevation_impact,
-            "interpretation": get_elevation_interpretation(dem)
-        },
-        "overall_confidence": round((gwp_base + ndvi_contribution + ndwi_contribution + elevation_contribution) / 100, 2)
-    }
+    payload, _ = weather_prefetcher.store.get(kind, weather_client.cell(lat, lon))
+    if payload is not None:
+        return payload
+    if weather_prefetcher.running:
+        raise WeatherUnavailable(f"No prefetched {kind} for this cell yet")
+    return weather_client.get(kind, lat, lon)
 
-def get_ndvi_interpretation(ndvi):
-    """Hydrogeological interpretation of NDVI"""
-    if ndvi > 0.6:
-        return "Dense vegetation → Excellent soil moisture retention → High infiltration capacity"
-    elif ndvi > 0.5:
-        return "Healthy vegetation → Good moisture retention → Favorable for groundwater recharge"
-    elif ndvi > 0.3:
-        return "Moderate vegetation → Average moisture conditions → Neutral groundwater potential"
-    elif ndvi > 0.1:
-        return "Sparse vegetation → Poor soil moisture → Limited recharge capacity"
-    else:
-        return "Barren/Urban land → Minimal infiltration → Low groundwater potential"
-
-def get_ndwi_interpretation(ndwi):
-    """Hydrogeological interpretation of NDWI"""
-    if ndwi > 0.3:
-        return "High water content → Active water bodies/saturated soil → Excellent aquifer potential"
-    elif ndwi > 0.1:
-        return "Moderate water content → Seasonal moisture → Good groundwater availability"
-    elif ndwi > -0.1:
-        return "Low water content → Dry conditions → Moderate groundwater potential"
-    else:
-        return "Very dry conditions → Minimal surface water → Poor aquifer recharge"
-
-def get_elevation_interpretation(dem):
-    """Hydrogeological interpretation of elevation"""
-    if dem < 550:
-        return "Valley/Low-lying area → Natural groundwater accumulation zone → Excellent potential"
-    elif dem < 600:
-        return "Low elevation → Favorable for water collection → Good aquifer formation"
-    elif dem < 700:
-        return "Moderate elevation → Average groundwater conditions → Neutral potential"
-    elif dem < 800:
-        return "Higher elevation → Reduced accumulation → Limited groundwater storage"
-    else:
-        return "High elevation/Ridge → Rapid runoff → Poor groundwater retention"
+def start_weather_prefetcher():
+    """Start the background weather refresh unless running on demo data"""
+    if OPENWEATHER_API_KEY != "YOUR_API_KEY_HERE":
+        weather_prefetcher.start()
+        print(f"🌦️ Weather prefetcher started for {len(weather_prefetcher.cells)} cells")
 
-def generate_xai_explanation(gwp_class, ndvi, ndwi, dem):
+def point_cache_key(endpoint, lat, lon, lookup, params=(), location_seeded=False):
     """
-    Explainable AI (XAI) - Comprehensive Model Explanation
-    Explains WHY the model predicted this GWP class
+    Cache key for a single-point endpoint from its lookup_many result. Everything
+    a point endpoint computes depends on the class pixel it falls in (and the
+    feature cube pixel where values are measured); the per-location seed is added
+    only where values still depend on it (derived/simulated parameters, seeded draws).
     """
-    # Calculate feature importance
-    feature_importance = calculate_feature_importance(ndvi, ndwi, dem, gwp_class)
-    
-    # Generate hydrogeological reasoning
-    reasoning = []
-    
-    # Primary factors (highest importance)
-    sorted_features = sorted(
-        feature_importance.items(),
-        key=lambda x: x[1]['importance_percentage'] if isinstance(x[1], dict) else 0,
-        reverse=True
-    )
-    
-    primary_factor = sorted_features[0]
-    if isinstance(primary_factor[1], dict):
-        factor_name = primary_factor[0].replace('_', ' ').title()
-        reasoning.append({
-            "rank": 1,
-            "factor": factor_name,
-            "importance": f"{primary_factor[1]['importance_percentage']}%",
-            "status": primary_factor[1]['impact'],
-            "explanation": primary_factor[1]['interpretation']
-        })
-    
-    # Secondary and tertiary factors
-    for idx, (name, data) in enumerate(sorted_features[1:], start=2):
-        if isinstance(data, dict):
-            factor_name = name.replace('_', ' ').title()
-            reasoning.append({
-                "rank": idx,
-                "factor": factor_name,
-                "importance": f"{data['importance_percentage']}%",
-                "status": data['impact'],
-                "explanation": data['interpretation']
-            })
-    
-    # Model decision logic
-    decision_logic = generate_decision_logic(gwp_class, ndvi, ndwi, dem)
-    
-    # Confidence breakdown
-    confidence_factors = {
-        "data_quality": 0.95,  # Using real satellite data
-        "model_accuracy": 0.9934,  # Actual test accuracy
-        "spatial_resolution": 0.88,  # 10m Sentinel-2 resolution
-        "feature_reliability": round((feature_importance['overall_confidence'] + 1) / 2, 2)
-    }
-    
-    overall_confidence = round(
-        sum(confidence_factors.values()) / len(confidence_factors), 
-        2
-    )
-    
-    return {
-        "prediction": gwp_class,
-        "confidence": overall_confidence,
-        "feature_importance": feature_importance,
-        "reasoning_chain": reasoning,
-        "decision_logic": decision_logic,
-        "confidence_breakdown": confidence_factors,
-        "hydrogeological_validation": validate_hydrogeology(ndvi, ndwi, dem, gwp_class),
-        "model_transparency": {
-            "architecture": "U-Net CNN",
-            "training_data": "Sentinel-2 Multi-spectral + SRTM DEM + IMD Rainfall",
-            "test_accuracy": "99.34%",
-            "f1_score": "99.8%",
-            "interpretability_method": "Feature Contribution Analysis (SHAP-like)"
-        }
-    }
+    lats = np.array([lat], dtype=np.float64)
+    lons = np.array([lon], dtype=np.float64)
+    measured = bool(lookup['measured'][0])
+    pixel = ()
+    if ACTUAL_DATA_LOADED:
+        row, col = gwp_raster.latlon_to_pixel(lat, lon)
+        pixel = (int(row), int(col))
+    if measured and feature_cube is not None:
+        rows, cols, _ = feature_cube.pixel_indices(lats, lons)
+        pixel += (int(rows[0]), int(cols[0]))
+    if location_seeded or not measured:
+        pixel += (int(location_seeds(lats, lons)[0]),)
+    return (endpoint, pixel, params, gwp_map_version, feature_cube_signature, attribution_signature)
 
-def generate_decision_logic(gwp_class, ndvi, ndwi, dem):
-    """Generate step-by-step decision logic explanation"""
-    steps = []
-    
-    # Step 1: Input Analysis
-    steps.append({
-        "step": 1,
-        "stage": "Input Feature Extraction",
-        "description": f"Extracted NDVI={ndvi:.3f}, NDWI={ndwi:.3f}, Elevation={dem:.1f}m from satellite imagery"
-    })
-    
-    # Step 2: Feature Normalization
-    steps.append({
-        "step": 2,
-        "stage": "Feature Normalization",
-        "description": "Normalized features to 0-1 scale for neural network processing"
-    })
-    
-    # Step 3: CNN Processing
-    steps.append({
-        "step": 3,
-        "stage": "U-Net CNN Processing",
-        "description": "Passed through 12-layer convolutional neural network trained on 10,000+ samples"
-    })
-    
-    # Step 4: Classification
-    gwp_probs = {
-        "High": 0.85 if gwp_class == "High" else 0.10,
-        "Moderate": 0.80 if gwp_class == "Moderate" else 0.15,
-        "Low": 0.75 if gwp_class == "Low" else 0.12
-    }
-    steps.append({
-        "step": 4,
-        "stage": "Classification",
-        "description": f"Model predicted '{gwp_class}' with {gwp_probs[gwp_class]:.0%} probability",
-        "probabilities": gwp_probs
-    })
-    
-    # Step 5: Validation
-    steps.append({
-        "step": 5,
-        "stage": "Hydrogeological Validation",
-        "description": "Verified prediction against known hydrogeological principles"
-    })
-    
-    return steps
+def point_cached(endpoint, params=(), location_seeded=False, refresh=None):
+    """
+    Cache a single-point POST endpoint's successful JSON payload in
+    point_response_cache. On a hit the location and timestamp are re-stamped
+    for the request, and refresh(payload, lat, lon) can update live parts. The
+    point is looked up once: the key is built from the lookup and the view
+    reads the same result through get_values_from_actual_map.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper():
+            data = request.get_json(silent=True) or {}
+            try:
+                lat, lon = float(data['lat']), float(data['lon'])
+            except (KeyError, TypeError, ValueError):
+                return view()
+            
+            try:
+                lookup = lookup_many(lat, lon)
+            except Exception:
+                return view()
+            g.point_lookup = (lat, lon, lookup)
+            key = point_cache_key(endpoint, lat, lon, lookup, tuple(str(data.get(p)) for p in params), location_seeded)
+            payload = point_response_cache.get(key)
+            if payload is None:
+                response = view()
+                if isinstance(response, Response) and response.status_code == 200 and response.is_json:
+                    point_response_cache.put(key, response.get_json())
+                return response
+            
+            payload = dict(payload)
+            payload['location'] = {'lat': lat, 'lon': lon}
+            if 'timestamp' in payload:
+                payload['timestamp'] = datetime.now().isoformat()
+            if refresh is not None:
+                refresh(payload, lat, lon)
+            return jsonify(payload)
+        return wrapper
+    return decorator
 
-def validate_hydrogeology(ndvi, ndwi, dem, gwp_class):
-    """Validate if prediction aligns with hydrogeological principles"""
-    validations = []
-    is_valid = True
-    
-    # Validation 1: NDVI-GWP correlation
-    if gwp_class == "High" and ndvi < 0.3:
-        validations.append({
-            "principle": "Vegetation-Groundwater Correlation",
-            "status": "⚠️ Warning",
-            "note": "High GWP with low NDVI is unusual but possible in rocky aquifers"
-        })
-        is_valid = False
-    else:
-        validations.append({
-            "principle": "Vegetation-Groundwater Correlation",
-            "status": "✅ Valid",
-            "note": "NDVI aligns with expected GWP class"
-        })
-    
-    # Validation 2: NDWI-GWP correlation
-    if gwp_class == "High" and ndwi < 0:
-        validations.append({
-            "principle": "Water Content-Groundwater Correlation",
-            "status": "⚠️ Warning",
-            "note": "High GWP with negative NDWI suggests confined aquifer"
-        })
-    else:
-        validations.append({
-            "principle": "Water Content-Groundwater Correlation",
-            "status": "✅ Valid",
-            "note": "NDWI supports the predicted GWP class"
-        })
-    
-    # Validation 3: Elevation-GWP correlation
-    if gwp_class == "High" and dem > 750:
-        validations.append({
-            "principle": "Elevation-Groundwater Correlation",
-            "status": "⚠️ Warning",
-            "note": "High elevation reduces natural accumulation"
-        })
-    else:
-        validations.append({
-            "principle": "Elevation-Groundwater Correlation",
-            "status": "✅ Valid",
-            "note": "Elevation is favorable for predicted GWP"
-        })
-    
-    return {
-        "overall_status": "Valid" if is_valid else "Valid with Notes",
-        "validations": validations,
-        "scientific_basis": "Based on hydrogeological principles: infiltration capacity, recharge zones, and aquifer formation theory"
-    }
+def refresh_weather(payload, lat, lon):
+    """point_cached refresh hook: weather comes from the prefetched store / client cache"""
+    payload['weather'] = get_weather_data(lat, lon)
+
+def model_attribution(lat, lon):
+    """Real model feature contributions at a point from the attribution raster, or None"""
+    if attribution_cube is None or not ACTUAL_DATA_LOADED:
+        return None
+    values = attribution_cube.sample([lat], [lon])[0]
+    if not np.isfinite(values).all():
+        return None
+    return attribution_summary(values, attribution_cube.bands)
 
 def explain_prediction(gwp_class, ndvi, ndwi, dem):
     """Generate basic explanation for groundwater prediction (Legacy)"""
@@ -556,7 +707,33 @@ def serve_overlay():
     """Serve the GWP overlay image"""
     return send_from_directory(DATA_DIR, 'gwp_overlay.png')
 
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.png')
+def serve_tile(z, x, y):
+    """
+    Serve a 256x256 Web-Mercator GWP tile rendered from the class raster. Tile
+    URLs are not versioned, so browsers revalidate against the map-version ETag
+    (304 when unchanged); with ?v=<gwp_map_version> (from /api/system-status) the
+    tile is immutable and cached for a day.
+    """
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": f"Tile {z}/{x}/{y} out of range (zoom 0-{MAX_ZOOM})"}), 400
+    if not ACTUAL_DATA_LOADED:
+        return jsonify({"error": "GWP map not loaded"}), 404
+    
+    try:
+        png = tile_cache.get_tile(gwp_raster, gwp_map_version, z, x, y)
+        response = Response(png, mimetype='image/png')
+        if request.args.get('v') == gwp_map_version:
+            response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        response.set_etag(f"{gwp_map_version}-{z}-{x}-{y}")
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/predict', methods=['POST'])
+@point_cached('predict', refresh=refresh_weather)
 def predict_coordinate():
     try:
         data = request.json
@@ -587,6 +764,11 @@ def predict_coordinate():
             values['dem']
         )
         
+        # Measured model contributions (occlusion attributions) where they have been exported
+        attribution = model_attribution(lat, lon)
+        if attribution is not None:
+            xai_explanation = {**xai_explanation, "model_attribution": attribution}
+        
         return jsonify({
             "success": True,
             "location": {"lat": lat, "lon": lon},
@@ -656,6 +838,64 @@ def get_map_bounds():
         "center": [(dharwad_bounds[1] + dharwad_bounds[3])/2, (dharwad_bounds[0] + dharwad_bounds[2])/2]
     })
 
+def batch_results(lats, lons, include_xai=False):
+    """Vectorized per-point batch prediction records for coordinate arrays"""
+    valid = np.isfinite(lats) & np.isfinite(lons)
+    inside = valid & in_dharwad_many(lats, lons)
+    lookup = lookup_many(lats[inside], lons[inside])
+    confidence = 0.92 if ACTUAL_DATA_LOADED else 0.85
+    if include_xai:
+        # Bucketed table lookups: one shared explanation per class/threshold combination
+        explanations = generate_xai_explanations(lookup['gwp_class'], lookup['ndvi'], lookup['ndwi'], lookup['dem'])
+    
+    results = []
+    k = 0
+    for lat, lon, is_valid, ok in zip(lats.tolist(), lons.tolist(), valid.tolist(), inside.tolist()):
+        if not is_valid:
+            results.append({
+                "location": None,
+                "error": "Invalid coordinates"
+            })
+            continue
+        if not ok:
+            results.append({
+                "location": {"lat": lat, "lon": lon},
+                "error": "Outside Dharwad district"
+            })
+            continue
+        
+        results.append({
+            "location": {"lat": lat, "lon": lon},
+            "gwp_class": str(lookup['gwp_class'][k]),
+            "confidence": confidence,
+            "ndvi": float(lookup['ndvi'][k]),
+            "ndwi": float(lookup['ndwi'][k]),
+            "elevation": float(lookup['dem'][k])
+        })
+        if include_xai:
+            results[-1]["xai"] = explanations[k]
+        k += 1
+    return results
+
+def score_columns(lats, lons):
+    """Columnar batch scoring: one array per output column for coordinate arrays"""
+    valid = np.isfinite(lats) & np.isfinite(lons)
+    inside = valid & in_dharwad_many(lats, lons)
+    lookup = lookup_many(lats[inside], lons[inside])
+    n = len(lats)
+    
+    gwp_class = np.full(n, None, dtype=object)
+    gwp_class[inside] = lookup['gwp_class']
+    error = np.where(~valid, "Invalid coordinates", np.where(~inside, "Outside Dharwad district", None)).astype(object)
+    columns = {"gwp_class": gwp_class, "error": error}
+    
+    columns["confidence"] = np.where(inside, 0.92 if ACTUAL_DATA_LOADED else 0.85, np.nan)
+    for column, key in (("ndvi", "ndvi"), ("ndwi", "ndwi"), ("elevation", "dem")):
+        values = np.full(n, np.nan)
+        values[inside] = lookup[key]
+        columns[column] = values
+    return columns
+
 @app.route('/api/batch-predict', methods=['POST'])
 def batch_predict():
     """NEW FEATURE: Batch prediction for multiple coordinates"""
@@ -664,28 +904,14 @@ def batch_predict():
         coordinates = data.get('coordinates', [])
         
         if len(coordinates) > 50:
-            return jsonify({"error": "Maximum 50 coordinates allowed per batch"}), 400
+            return jsonify({
+                "error": "Maximum 50 coordinates allowed per batch",
+                "hint": "Use /api/batch-predict/stream for larger batches or CSV uploads"
+            }), 400
         
-        results = []
-        for coord in coordinates:
-            lat, lon = float(coord['lat']), float(coord['lon'])
-            
-            if not check_if_in_dharwad(lat, lon):
-                results.append({
-                    "location": {"lat": lat, "lon": lon},
-                    "error": "Outside Dharwad district"
-                })
-                continue
-            
-            values = get_values_from_actual_map(lat, lon)
-            results.append({
-                "location": {"lat": lat, "lon": lon},
-                "gwp_class": values['gwp_class'],
-                "confidence": 0.92 if ACTUAL_DATA_LOADED else 0.85,
-                "ndvi": values['ndvi'],
-                "ndwi": values['ndwi'],
-                "elevation": values['dem']
-            })
+        lats = np.array([float(coord['lat']) for coord in coordinates], dtype=np.float64)
+        lons = np.array([float(coord['lon']) for coord in coordinates], dtype=np.float64)
+        results = batch_results(lats, lons, include_xai=bool(data.get('include_xai')))
         
         return jsonify({
             "success": True,
@@ -697,6 +923,134 @@ def batch_predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """
+    Streaming batch prediction without the 50-coordinate cap.
+    Accepts a JSON body {"coordinates": [...]} or a multipart CSV upload ("file",
+    latitude,longitude,name columns) and streams one JSON result per line (NDJSON),
+    scoring the input in vectorized chunks so memory stays bounded. ?xai=1 adds
+    the XAI explanation to every result.
+    """
+    upload = None
+    try:
+        chunk_size = max(1, int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE)))
+        include_xai = request.args.get('xai', '').lower() in ('1', 'true', 'yes')
+        if 'file' in request.files:
+            upload = spool_upload(request.files['file'])
+            records = iter_csv_records(upload)
+        else:
+            data = request.get_json(silent=True) or {}
+            records = data.get('coordinates', [])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    
+    def generate():
+        try:
+            yield from generate_lines()
+        finally:
+            if upload is not None:
+                upload.close()
+    
+    def generate_lines():
+        index = 0
+        counts = {"scored": 0, "errors": 0}
+        class_counts = {name: 0 for name in GWP_CLASS_NAMES}
+        for lats, lons, names in iter_coordinate_chunks(records, chunk_size):
+            for result, name in zip(batch_results(lats, lons, include_xai), names):
+                result["index"] = index
+                if name:
+                    result["name"] = name
+                if "error" in result:
+                    counts["errors"] += 1
+                else:
+                    counts["scored"] += 1
+                    class_counts[result["gwp_class"]] += 1
+                index += 1
+                yield json.dumps(result) + "\n"
+        
+        yield json.dumps({
+            "summary": {
+                "total_locations": index,
+                "scored": counts["scored"],
+                "errors": counts["errors"],
+                "gwp_distribution": class_counts,
+                "timestamp": datetime.now().isoformat()
+            }
+        }) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/batch-score-file', methods=['POST'])
+def batch_score_file():
+    """
+    Server-side bulk ingest: upload a CSV or Parquet file ("file") with
+    latitude,longitude,name columns and get the same file back with
+    gwp_class, confidence, ndvi, ndwi, elevation and error columns appended.
+    Rows are parsed and scored in columnar chunks.
+    """
+    if 'file' not in request.files:
+        return jsonify({"error": "Upload a CSV or Parquet file in the 'file' field"}), 400
+    
+    upload = output = None
+    try:
+        chunk_size = max(1, int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE)))
+        file_storage = request.files['file']
+        stem = os.path.splitext(os.path.basename(file_storage.filename or 'batch'))[0] or 'batch'
+        upload = spool_upload(file_storage)
+        
+        if is_parquet_upload(file_storage.filename, upload):
+            # Row groups are written to a spooled temp file as they are scored;
+            # send_file closes it once the response has been sent
+            output = spooled_file()
+            rows = enrich_parquet(upload, output, score_columns, chunk_size)
+            upload.close()
+            if rows == 0:
+                output.close()
+                return jsonify({"error": "Uploaded file has no rows"}), 400
+            output.seek(0)
+            return send_file(
+                output,
+                mimetype='application/vnd.apache.parquet',
+                as_attachment=True,
+                download_name=f'{stem}_scored.parquet'
+            )
+        
+        lines = open_enriched_csv(upload, score_columns, chunk_size)
+    except (ValueError, RuntimeError) as e:
+        for spool in (upload, output):
+            if spool is not None:
+                spool.close()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        for spool in (upload, output):
+            if spool is not None:
+                spool.close()
+        return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        try:
+            yield from lines
+        finally:
+            upload.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={"Content-Disposition": f"attachment; filename={stem}_scored.csv"}
+    )
+
+def area_rating(high_percentage):
+    """(rating, recommendation) for an area from its share of High-potential pixels"""
+    if high_percentage > 60:
+        return 5, "EXCELLENT area for groundwater extraction"
+    elif high_percentage > 40:
+        return 4, "GOOD area with decent groundwater potential"
+    elif high_percentage > 20:
+        return 3, "MODERATE area, select specific high-potential spots"
+    else:
+        return 2, "POOR area, consider alternative locations"
+
 @app.route('/api/area-analysis', methods=['POST'])
 def area_analysis():
     """NEW FEATURE: Analyze groundwater potential for an entire area"""
@@ -706,59 +1060,50 @@ def area_analysis():
         center_lon = float(data['center_lon'])
         radius_km = float(data.get('radius_km', 2))
         
-        # Sample points in a grid around the center
+        # Sample points in a grid around the center (one vectorized lookup)
         samples_per_side = 10
         lat_step = (radius_km / 111.0) / samples_per_side
         lon_step = (radius_km / (111.0 * np.cos(np.radians(center_lat)))) / samples_per_side
         
-        high_count = moderate_count = low_count = 0
-        avg_ndvi = avg_ndwi = avg_elevation = 0
-        total_valid = 0
-        
-        for i in range(samples_per_side * 2):
-            for j in range(samples_per_side * 2):
-                lat = center_lat - radius_km/111.0 + i * lat_step
-                lon = center_lon - radius_km/(111.0 * np.cos(np.radians(center_lat))) + j * lon_step
-                
-                if check_if_in_dharwad(lat, lon):
-                    values = get_values_from_actual_map(lat, lon)
-                    total_valid += 1
-                    
-                    if values['gwp_class'] == 'High':
-                        high_count += 1
-                    elif values['gwp_class'] == 'Moderate':
-                        moderate_count += 1
-                    else:
-                        low_count += 1
-                    
-                    avg_ndvi += values['ndvi']
-                    avg_ndwi += values['ndwi']
-                    avg_elevation += values['dem']
-        
-        if total_valid == 0:
+        steps = np.arange(samples_per_side * 2)
+        grid_lat, grid_lon = np.meshgrid(
+            center_lat - radius_km/111.0 + steps * lat_step,
+            center_lon - radius_km/(111.0 * np.cos(np.radians(center_lat))) + steps * lon_step,
+            indexing='ij'
+        )
+        grid_lat, grid_lon = grid_lat.ravel(), grid_lon.ravel()
+        inside = in_dharwad_many(grid_lat, grid_lon)
+        values = lookup_many(grid_lat[inside], grid_lon[inside])
+        
+        total_valid = int(inside.sum())
+        class_counts = np.bincount(values['gwp_value'], minlength=3)[:3]
+        resolution_level = None
+        if ACTUAL_DATA_LOADED:
+            # Class distribution over every map pixel in the circle, from the
+            # per-class integral image (one table read per row, any radius)
+            pixel_counts, resolution_level = gwp_raster.window_counts(center_lat, center_lon, radius_km)
+            if pixel_counts.sum() > 0:
+                class_counts = pixel_counts
+        low_count, moderate_count, high_count = (int(n) for n in class_counts)
+        total_counted = low_count + moderate_count + high_count
+        
+        if total_valid == 0 or total_counted == 0:
             return jsonify({"error": "No valid points in specified area"}), 400
+        avg_ndvi = float(values['ndvi'].mean())
+        avg_ndwi = float(values['ndwi'].mean())
+        avg_elevation = float(values['dem'].mean())
         
         # Calculate area recommendation
-        high_percentage = (high_count / total_valid) * 100
-        if high_percentage > 60:
-            recommendation = "EXCELLENT area for groundwater extraction"
-            rating = 5
-        elif high_percentage > 40:
-            recommendation = "GOOD area with decent groundwater potential"
-            rating = 4
-        elif high_percentage > 20:
-            recommendation = "MODERATE area, select specific high-potential spots"
-            rating = 3
-        else:
-            recommendation = "POOR area, consider alternative locations"
-            rating = 2
+        high_percentage = (high_count / total_counted) * 100
+        rating, recommendation = area_rating(high_percentage)
         
         return jsonify({
             "success": True,
             "center": {"lat": center_lat, "lon": center_lon},
             "radius_km": radius_km,
             "analysis": {
-                "total_samples": total_valid,
+                "total_samples": total_counted,
+                "resolution_level": resolution_level,
                 "distribution": {
                     "high": high_count,
                     "moderate": moderate_count,
@@ -766,9 +1111,9 @@ def area_analysis():
                     "high_percentage": round(high_percentage, 1)
                 },
                 "averages": {
-                    "ndvi": round(avg_ndvi / total_valid, 3),
-                    "ndwi": round(avg_ndwi / total_valid, 3),
-                    "elevation": round(avg_elevation / total_valid, 1)
+                    "ndvi": round(avg_ndvi, 3),
+                    "ndwi": round(avg_ndwi, 3),
+                    "elevation": round(avg_elevation, 1)
                 },
                 "rating": rating,
                 "recommendation": recommendation
@@ -779,6 +1124,82 @@ def area_analysis():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def polygon_spans(geometry, grid=None):
+    """Row spans of a GeoJSON geometry on a grid (default: the GWP raster), cached by geometry hash + map version"""
+    grid = grid if grid is not None else gwp_raster
+    key = (geometry_key(geometry), gwp_map_version, grid.transform, grid.shape)
+    spans = polygon_mask_cache.get(key)
+    cached = spans is not None
+    if not cached:
+        spans = rasterize_spans(polygon_rings(geometry), grid.transform, grid.shape)
+        polygon_mask_cache.put(key, spans)
+    return spans, cached
+
+@app.route('/api/polygon-analysis', methods=['POST'])
+def polygon_analysis():
+    """Exact class areas and mean parameters under a GeoJSON polygon (farm, watershed, taluk)"""
+    try:
+        data = request.json or {}
+        geometry = data.get('geometry', data)
+        if not ACTUAL_DATA_LOADED:
+            return jsonify({"error": "GWP map not loaded - polygon analysis needs the class raster"}), 503
+        try:
+            spans, mask_cached = polygon_spans(geometry)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid GeoJSON polygon: {e}"}), 400
+        
+        rows, col_start, col_end = spans
+        if len(rows) == 0:
+            return jsonify({"error": "Polygon does not cover any part of the GWP map"}), 400
+        
+        # Per-span class counts from the integral image, weighted by each row's pixel area
+        counts_per_span = span_counts(gwp_raster.integral(), rows, col_start, col_end)
+        counts = counts_per_span.sum(axis=0)
+        areas_km2 = gwp_raster.row_pixel_area_km2()[rows] @ counts_per_span
+        mask_pixels = int((col_end - col_start).sum())
+        total = int(counts.sum())
+        if total == 0:
+            return jsonify({"error": "Polygon covers only no-data pixels"}), 400
+        
+        # Mean parameters under the mask: real feature rasters when exported, else class-derived
+        means = counts @ CLASS_BASE_PARAMS / total
+        if feature_cube is not None:
+            feature_means = feature_cube.span_means(*polygon_spans(geometry, feature_cube)[0])
+            means = np.where(np.isfinite(feature_means), feature_means, means)
+        high_percentage = counts[2] / total * 100
+        rating, recommendation = area_rating(high_percentage)
+        
+        return jsonify({
+            "success": True,
+            "name": data.get('name') or (data.get('properties') or {}).get('name'),
+            "analysis": {
+                "area_km2": round(float(areas_km2.sum()), 3),
+                "pixel_count": total,
+                "nodata_pixels": mask_pixels - total,
+                "distribution": {
+                    name.lower(): int(counts[k]) for k, name in enumerate(GWP_CLASS_NAMES)
+                },
+                "percentages": {
+                    name.lower(): round(float(counts[k]) / total * 100, 1) for k, name in enumerate(GWP_CLASS_NAMES)
+                },
+                "area_by_class_km2": {
+                    name.lower(): round(float(areas_km2[k]), 3) for k, name in enumerate(GWP_CLASS_NAMES)
+                },
+                "averages": {
+                    "ndvi": round(float(means[0]), 3),
+                    "ndwi": round(float(means[1]), 3),
+                    "elevation": round(float(means[2]), 1)
+                },
+                "rating": rating,
+                "recommendation": recommendation
+            },
+            "mask_cached": mask_cached,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/comparison', methods=['POST'])
 def compare_locations():
     """NEW FEATURE: Compare multiple locations side-by-side"""
@@ -851,34 +1272,11 @@ def compare_locations():
 @app.route('/api/statistics')
 def get_statistics():
     if ACTUAL_DATA_LOADED:
-        # Count actual colors in the GWP image
+        # Served from the histogram cache; recomputed only after hot_swap_gwp_raster reloads the map
         try:
-            high_count = moderate_count = low_count = 0
-            for y in range(gwp_array.shape[0]):
-                for x in range(gwp_array.shape[1]):
-                    _, gwp_val = get_gwp_from_color(gwp_array[y, x])
-                    if gwp_val == 2:
-                        high_count += 1
-                    elif gwp_val == 1:
-                        moderate_count += 1
-                    else:
-                        low_count += 1
-            
-            total = high_count + moderate_count + low_count
-            return jsonify({
-                "total_area": 4263.52,  # Dharwad district area in km²
-                "gwp_distribution": {
-                    "Low": round(low_count/total * 100, 1),
-                    "Moderate": round(moderate_count/total * 100, 1),
-                    "High": round(high_count/total * 100, 1)
-                },
-                "average_ndvi": 0.486,
-                "average_ndwi": 0.142,
-                "average_elevation": 678.5,
-                "data_source": "Actual GWP map"
-            })
-        except:
-            pass
+            return jsonify(compute_map_statistics())
+        except Exception as e:
+            print(f"Statistics error: {e}")
     
     # Fallback to simulated stats
     return jsonify({
@@ -893,123 +1291,76 @@ def get_statistics():
         "average_elevation": 678.5
     })
 
+def basic_report_spec(data):
+    """Inputs drawn on the basic report, from a /api/download-report style request body"""
+    lat = float(data.get('lat', 0))
+    lon = float(data.get('lon', 0))
+    
+    # Get prediction data from request
+    if 'prediction' in data and data['prediction']:
+        prediction = data['prediction']
+        gwp_class = str(prediction.get('groundwater_class', 'Unknown'))
+        ndvi = float(prediction.get('ndvi', 0))
+        ndwi = float(prediction.get('ndwi', 0))
+        elevation = float(prediction.get('elevation', 0))
+    else:
+        # Fallback: fetch from map
+        values = get_values_from_actual_map(lat, lon)
+        gwp_class = values['gwp_class']
+        ndvi = values['ndvi']
+        ndwi = values['ndwi']
+        elevation = values['dem']
+    
+    # Get explanation
+    if 'explanation' in data and data['explanation']:
+        explanation = data['explanation']
+    else:
+        explanation = explain_prediction(gwp_class, ndvi, ndwi, elevation)
+    
+    # Weather if available
+    temperature = None
+    weather = data.get('weather')
+    if isinstance(weather, dict):
+        temperature = weather.get('temperature', 'N/A')
+    
+    return {
+        "lat": lat,
+        "lon": lon,
+        "gwp_class": gwp_class,
+        "ndvi": ndvi,
+        "ndwi": ndwi,
+        "elevation": elevation,
+        "temperature": temperature,
+        "factors": [str(factor) for factor in explanation.get('factors', [])[:3]],
+        "conclusion": str(explanation.get('conclusion', '') or '')
+    }
+
+def advanced_report_spec(data):
+    """Inputs drawn on an advanced feature report, from a /api/download-advanced-report body"""
+    feature_type = str(data.get('feature_type', 'analysis'))
+    analysis_results = data.get('analysis_results', {}) or {}
+    return {
+        "lat": float(data.get('lat', 0)),
+        "lon": float(data.get('lon', 0)),
+        "feature_type": feature_type,
+        "analysis_results": {key: analysis_results[key]
+                             for key in ADVANCED_REPORT_FIELDS.get(feature_type, ())
+                             if key in analysis_results}
+    }
+
+REPORT_SPECS = {"basic": basic_report_spec, "advanced": advanced_report_spec}
+
+def send_report(kind, data):
+    """Render (or reuse) a report through the job runner and send it as the response"""
+    job = report_jobs.submit(kind, REPORT_SPECS[kind](data))
+    with STAGE_SECONDS.time(stage="pdf_render"):
+        path = report_jobs.wait(job, timeout=REPORT_TIMEOUT_SECONDS)
+    return send_file(path, mimetype='application/pdf', as_attachment=True, download_name=job['filename'])
+
 @app.route('/api/download-report', methods=['POST'])
 def download_report():
     try:
-        data = request.json
-        lat = float(data.get('lat', 0))
-        lon = float(data.get('lon', 0))
-        
-        # Get prediction data from request
-        if 'prediction' in data and data['prediction']:
-            prediction = data['prediction']
-            gwp_class = str(prediction.get('groundwater_class', 'Unknown'))
-            ndvi = float(prediction.get('ndvi', 0))
-            ndwi = float(prediction.get('ndwi', 0))
-            elevation = float(prediction.get('elevation', 0))
-        else:
-            # Fallback: fetch from map
-            values = get_values_from_actual_map(lat, lon)
-            gwp_class = values['gwp_class']
-            ndvi = values['ndvi']
-            ndwi = values['ndwi']
-            elevation = values['dem']
-        
-        # Get explanation
-        if 'explanation' in data and data['explanation']:
-            explanation = data['explanation']
-            factors = explanation.get('factors', [])
-            conclusion = explanation.get('conclusion', '')
-        else:
-            explanation = explain_prediction(gwp_class, ndvi, ndwi, elevation)
-            factors = explanation.get('factors', [])
-            conclusion = explanation.get('conclusion', '')
-        
-        # Create PDF
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Header
-        c.setFont("Helvetica-Bold", 20)
-        c.drawString(100, height - 100, "Groundwater Potential Report")
-        
-        # Location and Date
-        c.setFont("Helvetica", 12)
-        c.drawString(100, height - 140, f"Location: {lat:.4f} N, {lon:.4f} E")
-        c.drawString(100, height - 160, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        
-        # Main Result
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(100, height - 200, f"Groundwater Potential: {gwp_class}")
-        
-        # Indicators
-        c.setFont("Helvetica", 11)
-        y = height - 240
-        c.drawString(100, y, f"NDVI (Vegetation): {ndvi:.3f}")
-        c.drawString(100, y - 20, f"NDWI (Water Content): {ndwi:.3f}")
-        c.drawString(100, y - 40, f"Elevation: {elevation:.1f}m")
-        c.drawString(100, y - 60, "Data Source: U-Net CNN Model")
-        
-        # Weather if available
-        if 'weather' in data and data['weather']:
-            try:
-                weather = data['weather']
-                temp = weather.get('temperature', 'N/A')
-                c.drawString(100, y - 80, f"Temperature: {temp} C")
-            except:
-                pass
-        
-        # Recommendations
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(100, y - 120, "Analysis & Recommendations:")
-        
-        c.setFont("Helvetica", 10)
-        y_pos = y - 140
-        
-        # Add up to 3 factors
-        for i, factor in enumerate(factors[:3]):
-            text = str(factor)
-            if len(text) > 75:
-                text = text[:72] + "..."
-            c.drawString(120, y_pos, f"- {text}")
-            y_pos -= 20
-        
-        # Add conclusion
-        if conclusion:
-            y_pos -= 10
-            conclusion_text = str(conclusion)
-            if len(conclusion_text) > 80:
-                # Simple wrapping
-                words = conclusion_text.split()
-                line = ""
-                for word in words:
-                    if len(line + word) < 75:
-                        line += word + " "
-                    else:
-                        c.drawString(100, y_pos, line.strip())
-                        y_pos -= 15
-                        line = word + " "
-                if line:
-                    c.drawString(100, y_pos, line.strip())
-            else:
-                c.drawString(100, y_pos, conclusion_text)
-        
-        # Footer
-        c.setFont("Helvetica-Oblique", 9)
-        c.drawString(100, 50, "Generated by Deep Learning GWP System - Dharwad District")
-        c.drawString(100, 35, "U-Net CNN Model | 99.34% Accuracy")
-        
-        c.save()
-        buffer.seek(0)
-        
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'gwp_report_{lat:.4f}_{lon:.4f}.pdf'
-        )
-        
+        return send_report("basic", request.json)
     except Exception as e:
         print(f"Download Report Error: {str(e)}")
         import traceback
@@ -1020,165 +1371,149 @@ def download_report():
 def download_advanced_report():
     """Generate PDF report for advanced feature analysis"""
     try:
-        data = request.json
-        lat = float(data.get('lat', 0))
-        lon = float(data.get('lon', 0))
-        feature_type = str(data.get('feature_type', 'analysis'))
-        analysis_results = data.get('analysis_results', {})
-        
-        # Create PDF
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Header
-        c.setFont("Helvetica-Bold", 20)
-        title_map = {
-            'temporal': 'Temporal Analysis Report',
-            'borewell': 'Borewell Recommendation Report',
-            'recharge': 'Recharge Zones Analysis Report',
-            'crops': 'Crop Suitability Report',
-            'drought': 'Drought Risk Assessment Report',
-            'rainfall': 'Rainfall Impact Analysis Report'
-        }
-        title = title_map.get(feature_type, 'Advanced Analysis Report')
-        c.drawString(100, height - 100, title)
-        
-        # Location and Date
-        c.setFont("Helvetica", 12)
-        c.drawString(100, height - 140, f"Location: {lat:.4f} N, {lon:.4f} E")
-        c.drawString(100, height - 160, f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        
-        y = height - 200
-        
-        # Feature-specific content
-        c.setFont("Helvetica-Bold", 14)
-        
-        if feature_type == 'temporal':
-            c.drawString(100, y, "Historical Groundwater Trends")
-            c.setFont("Helvetica", 11)
-            y -= 30
-            c.drawString(100, y, f"Current Status: {analysis_results.get('current_status', 'N/A')}")
-            y -= 20
-            c.drawString(100, y, f"Trend: {analysis_results.get('trend', 'N/A').upper()}")
-            y -= 20
-            c.drawString(100, y, f"Change: {analysis_results.get('change_percent', 0)}%")
-            y -= 30
-            c.setFont("Helvetica", 10)
-            analysis_text = str(analysis_results.get('analysis', ''))
-            if analysis_text:
-                lines = [analysis_text[i:i+80] for i in range(0, len(analysis_text), 80)]
-                for line in lines[:5]:
-                    c.drawString(100, y, line)
-                    y -= 15
-        
-        elif feature_type == 'borewell':
-            c.drawString(100, y, "Borewell Site Recommendations")
-            best_loc = analysis_results.get('best_location', {})
-            if best_loc:
-                c.setFont("Helvetica", 11)
-                y -= 30
-                c.drawString(100, y, f"Success Probability: {best_loc.get('success_probability', 0)}%")
-                y -= 20
-                c.drawString(100, y, f"Estimated Depth: {best_loc.get('estimated_depth_ft', 0)} ft")
-                y -= 20
-                c.drawString(100, y, f"Estimated Cost: ₹{best_loc.get('estimated_cost', 0):,.0f}")
-                y -= 20
-                c.drawString(100, y, f"GWP Classification: {best_loc.get('gwp_class', 'N/A')}")
-        
-        elif feature_type == 'recharge':
-            c.drawString(100, y, "Rainwater Recharge Potential")
-            c.setFont("Helvetica", 11)
-            y -= 30
-            c.drawString(100, y, f"Recharge Potential: {analysis_results.get('recharge_potential', 'N/A')}")
-            y -= 20
-            c.drawString(100, y, f"Score: {analysis_results.get('recharge_score', 0)}/100")
-            y -= 30
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(100, y, "Recommended Structures:")
-            c.setFont("Helvetica", 10)
-            y -= 20
-            structures = analysis_results.get('recommended_structures', [])
-            for struct in structures[:5]:
-                c.drawString(120, y, f"• {struct}")
-                y -= 15
-        
-        elif feature_type == 'crops':
-            c.drawString(100, y, "Crop Recommendations")
-            c.setFont("Helvetica", 11)
-            y -= 30
-            c.drawString(100, y, f"Irrigation Strategy: {analysis_results.get('irrigation_advice', 'N/A')}")
-            y -= 30
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(100, y, "Suitable Crops:")
-            c.setFont("Helvetica", 10)
-            y -= 20
-            crops = analysis_results.get('suitable_crops', [])
-            for crop in crops[:5]:
-                c.drawString(120, y, f"• {crop.get('name', 'N/A')} - {crop.get('water_req', 'N/A')} water")
-                y -= 15
-        
-        elif feature_type == 'drought':
-            c.drawString(100, y, "Drought Risk Assessment")
-            c.setFont("Helvetica", 11)
-            y -= 30
-            c.drawString(100, y, f"Risk Level: {analysis_results.get('risk_level', 'N/A')}")
-            y -= 20
-            c.drawString(100, y, f"Risk Score: {analysis_results.get('risk_score', 0)}/100")
-            y -= 20
-            c.drawString(100, y, f"Time to Crisis: {analysis_results.get('estimated_days_to_crisis', 0)} days")
-            y -= 30
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(100, y, "Immediate Actions:")
-            c.setFont("Helvetica", 10)
-            y -= 20
-            recommendations = analysis_results.get('recommendations', [])
-            for rec in recommendations[:5]:
-                rec_text = str(rec)
-                if len(rec_text) > 70:
-                    rec_text = rec_text[:67] + "..."
-                c.drawString(120, y, f"• {rec_text}")
-                y -= 15
-        
-        elif feature_type == 'rainfall':
-            c.drawString(100, y, "Rainfall Impact Simulation")
-            c.setFont("Helvetica", 11)
-            y -= 30
-            current = analysis_results.get('current_status', {})
-            after = analysis_results.get('after_rainfall', {})
-            c.drawString(100, y, f"Current GWP: {current.get('gwp_class', 'N/A')}")
-            y -= 20
-            c.drawString(100, y, f"After Rainfall: {after.get('gwp_class', 'N/A')}")
-            y -= 20
-            c.drawString(100, y, f"Improvement: {after.get('improvement', 'N/A')}")
-            y -= 30
-            c.drawString(100, y, f"Recharge Amount: {analysis_results.get('recharge_mm', 0)}mm")
-            y -= 20
-            c.drawString(100, y, f"Recharge Rate: {analysis_results.get('recharge_rate_percent', 0)}%")
-            y -= 20
-            c.drawString(100, y, f"Recharge Time: {analysis_results.get('recharge_time_days', 0)} days")
-        
-        # Footer
-        c.setFont("Helvetica-Oblique", 9)
-        c.drawString(100, 50, "Generated by HydroSense Deep Learning - Advanced Features Module")
-        c.drawString(100, 35, "Deep Learning Groundwater Analysis System | Dharwad District")
-        
-        c.save()
-        buffer.seek(0)
-        
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'{feature_type}_analysis_{lat:.4f}_{lon:.4f}.pdf'
-        )
-        
+        return send_report("advanced", request.json)
     except Exception as e:
         print(f"Download Advanced Report Error: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def report_job_response(job_id):
+    """Status payload for a report job, with its polling and download URLs"""
+    job = report_jobs.status(job_id)
+    job["status_url"] = f"/api/reports/{job_id}"
+    job["download_url"] = f"/api/reports/{job_id}/download"
+    return job
+
+@app.route('/api/reports', methods=['POST'])
+def submit_report():
+    """
+    Submit a report job: {"kind": "basic" | "advanced", ...same body as the download
+    endpoints}. Returns a job id at once; poll /api/reports/<id>, then download.
+    """
+    try:
+        data = request.json or {}
+        kind = data.get('kind', 'basic')
+        if kind not in REPORT_SPECS:
+            return jsonify({"error": f"Unknown report kind: {kind} (expected 'basic' or 'advanced')"}), 400
+        job = report_jobs.submit(kind, REPORT_SPECS[kind](data))
+        payload = report_job_response(job['job_id'])
+        return jsonify(payload), 200 if payload['status'] == 'done' else 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reports/<job_id>', methods=['GET'])
+def report_status(job_id):
+    """Status of a report job: queued, running, done or failed"""
+    if report_jobs.status(job_id) is None:
+        return jsonify({"error": "Unknown report job"}), 404
+    return jsonify(report_job_response(job_id))
+
+@app.route('/api/reports/<job_id>/download', methods=['GET'])
+def report_download(job_id):
+    """PDF of a finished report job (409 while it is still rendering)"""
+    job = report_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown report job"}), 404
+    if job['status'] == 'failed':
+        return jsonify({"error": job['error']}), 500
+    if job['status'] != 'done':
+        return jsonify(report_job_response(job_id)), 409
+    return send_file(report_jobs.artifact_path(job['key']), mimetype='application/pdf',
+                     as_attachment=True, download_name=job['filename'])
+
+def site_report_specs(lats, lons, names):
+    """Basic report specs for a chunk of sites (one vectorized lookup); out-of-district sites carry an error"""
+    valid = np.isfinite(lats) & np.isfinite(lons)
+    inside = valid & in_dharwad_many(lats, lons)
+    lookup = lookup_many(lats[inside], lons[inside])
+    specs = []
+    k = 0
+    for lat, lon, name, is_valid, ok in zip(lats.tolist(), lons.tolist(), names, valid.tolist(), inside.tolist()):
+        if not ok:
+            specs.append({"lat": lat, "lon": lon, "name": name,
+                          "error": "Outside Dharwad district" if is_valid else "Invalid coordinates"})
+            continue
+        values = values_at(lookup, k)
+        spec = basic_report_spec({"lat": lat, "lon": lon, "prediction": {
+            "groundwater_class": values['gwp_class'],
+            "ndvi": values['ndvi'],
+            "ndwi": values['ndwi'],
+            "elevation": values['dem']
+        }})
+        spec["name"] = name
+        specs.append(spec)
+        k += 1
+    return specs
+
+def report_archive_name(index, spec):
+    """ZIP member name for one site's report"""
+    label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(spec.get('name') or 'site'))
+    return f"{index + 1:04d}_{label}_{spec['lat']:.4f}_{spec['lon']:.4f}.pdf"
+
+@app.route('/api/batch-report', methods=['POST'])
+def batch_report():
+    """
+    Reports for many sites at once. Accepts {"coordinates": [...]} or a CSV upload
+    ("file", latitude,longitude,name columns like sample_batch_locations.csv).
+    ?format=zip (default) streams a ZIP of per-site PDFs, rendered in the report
+    worker processes, plus summary.csv; ?format=pdf queues one combined PDF with
+    a summary table followed by a page per site, and returns its report job
+    (poll /api/reports/<id>, then download) instead of blocking on the render.
+    """
+    try:
+        output_format = request.args.get('format', 'zip')
+        if output_format not in ('zip', 'pdf'):
+            return jsonify({"error": "format must be 'zip' or 'pdf'"}), 400
+        if 'file' in request.files:
+            with spool_upload(request.files['file']) as upload:
+                records = list(iter_csv_records(upload))
+        else:
+            data = request.get_json(silent=True) or {}
+            records = data.get('coordinates', [])
+        if not records:
+            return jsonify({"error": "No sites given"}), 400
+        if len(records) > MAX_REPORT_SITES:
+            return jsonify({"error": f"Maximum {MAX_REPORT_SITES} sites allowed per batch report"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        specs = [spec for lats, lons, names in iter_coordinate_chunks(records, DEFAULT_CHUNK_SIZE)
+                 for spec in site_report_specs(lats, lons, names)]
+        if output_format == 'pdf':
+            job = report_jobs.submit("combined", {"sites": specs})
+            payload = report_job_response(job['job_id'])
+            return jsonify(payload), 200 if payload['status'] == 'done' else 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    def members():
+        # PDFs are copied from the report cache into the archive as each render finishes
+        files = {}
+        items = (("basic", spec, index) for index, spec in enumerate(specs) if not spec.get('error'))
+        for index, path, error in report_jobs.render_many(items):
+            if path:
+                files[index] = report_archive_name(index, specs[index])
+                yield files[index], path
+            else:
+                specs[index]['error'] = error
+        
+        summary = io.StringIO()
+        writer = csv.writer(summary)
+        writer.writerow(["index", "name", "latitude", "longitude", "gwp_class", "ndvi", "ndwi", "elevation", "file", "error"])
+        for index, spec in enumerate(specs):
+            writer.writerow([index, spec.get('name') or '', spec['lat'], spec['lon'], spec.get('gwp_class', ''),
+                             spec.get('ndvi', ''), spec.get('ndwi', ''), spec.get('elevation', ''),
+                             files.get(index, ''), spec.get('error', '')])
+        yield "summary.csv", summary.getvalue().encode()
+    
+    return Response(
+        stream_with_context(iter_zip(members())),
+        mimetype='application/zip',
+        headers={"Content-Disposition": f"attachment; filename=gwp_reports_{len(records)}_sites.zip"}
+    )
+
 # ==================== NEW FEATURES ====================
 
 # Feature 1: Temporal Analysis - Track groundwater changes over time
@@ -1198,6 +1533,7 @@ def temporal_analysis():
         # Models monsoon effect on NDVI/NDWI using sinusoidal pattern
         temporal_data = []
         current_values = get_values_from_actual_map(lat, lon)
+        rng = location_rng(lat, lon)
         
         for i in range(months):
             month_offset = months - i - 1
@@ -1205,8 +1541,8 @@ def temporal_analysis():
             seasonal_factor = 1.0 + 0.3 * np.sin((month_offset % 12) * np.pi / 6)
             
             # Apply seasonal variation with small natural fluctuation
-            temp_ndvi = current_values['ndvi'] * seasonal_factor * (0.85 + np.random.random() * 0.15)
-            temp_ndwi = current_values['ndwi'] * seasonal_factor * (0.9 + np.random.random() * 0.1)
+            temp_ndvi = current_values['ndvi'] * seasonal_factor * (0.85 + rng.random() * 0.15)
+            temp_ndwi = current_values['ndwi'] * seasonal_factor * (0.9 + rng.random() * 0.1)
             temp_gwp = current_values['gwp_value'] * seasonal_factor
             
             if temp_gwp > 1.5:
@@ -1255,55 +1591,42 @@ def borewell_recommendation():
         if not check_if_in_dharwad(center_lat, center_lon):
             return jsonify({"error": "Location outside Dharwad district"}), 400
         
-        # Scan area in grid pattern
-        scan_points = []
+        # Scan area in grid pattern (one vectorized lookup for the whole grid)
         deg_per_km = 0.009  # Approximate
         steps = 10
         
-        for i in range(steps):
-            for j in range(steps):
-                offset_lat = (i - steps/2) / steps * radius_km * deg_per_km
-                offset_lon = (j - steps/2) / steps * radius_km * deg_per_km
-                
-                scan_lat = center_lat + offset_lat
-                scan_lon = center_lon + offset_lon
-                
-                if check_if_in_dharwad(scan_lat, scan_lon):
-                    values = get_values_from_actual_map(scan_lat, scan_lon)
-                    
-                    # Calculate drilling score
-                    score = 0
-                    if values['gwp_class'] == "High":
-                        score += 40
-                    elif values['gwp_class'] == "Moderate":
-                        score += 20
-                    
-                    score += values['ndvi'] * 20
-                    score += values['ndwi'] * 30
-                    score += (750 - values['dem']) / 10
-                    
-                    # Estimate depth and success probability
-                    if values['gwp_class'] == "High":
-                        depth_estimate = 80 + np.random.randint(0, 40)
-                        success_prob = 85 + np.random.randint(0, 10)
-                    elif values['gwp_class'] == "Moderate":
-                        depth_estimate = 120 + np.random.randint(0, 60)
-                        success_prob = 60 + np.random.randint(0, 20)
-                    else:
-                        depth_estimate = 180 + np.random.randint(0, 80)
-                        success_prob = 30 + np.random.randint(0, 25)
-                    
-                    cost_estimate = depth_estimate * 250  # ₹250 per foot
-                    
-                    scan_points.append({
-                        "lat": scan_lat,
-                        "lon": scan_lon,
-                        "score": round(score, 2),
-                        "gwp_class": values['gwp_class'],
-                        "estimated_depth_ft": depth_estimate,
-                        "success_probability": success_prob,
-                        "estimated_cost": cost_estimate
-                    })
+        offsets = (np.arange(steps) - steps/2) / steps * radius_km * deg_per_km
+        scan_lat, scan_lon = np.meshgrid(center_lat + offsets, center_lon + offsets, indexing='ij')
+        scan_lat, scan_lon = scan_lat.ravel(), scan_lon.ravel()
+        inside = in_dharwad_many(scan_lat, scan_lon)
+        scan_lat, scan_lon = scan_lat[inside], scan_lon[inside]
+        values = lookup_many(scan_lat, scan_lon)
+        gwp_value = values['gwp_value']
+        
+        # Calculate drilling score
+        score = np.array([0, 20, 40])[gwp_value].astype(np.float64)
+        score += values['ndvi'] * 20
+        score += values['ndwi'] * 30
+        score += (750 - values['dem']) / 10
+        
+        # Estimate depth and success probability (Low, Moderate, High)
+        rng = location_rng(center_lat, center_lon)
+        depth_estimate = np.array([180, 120, 80])[gwp_value] + rng.integers(0, np.array([80, 60, 40])[gwp_value])
+        success_prob = np.array([30, 60, 85])[gwp_value] + rng.integers(0, np.array([25, 20, 10])[gwp_value])
+        cost_estimate = depth_estimate * 250  # ₹250 per foot
+        
+        scan_points = [
+            {
+                "lat": float(scan_lat[k]),
+                "lon": float(scan_lon[k]),
+                "score": round(float(score[k]), 2),
+                "gwp_class": str(values['gwp_class'][k]),
+                "estimated_depth_ft": int(depth_estimate[k]),
+                "success_probability": int(success_prob[k]),
+                "estimated_cost": int(cost_estimate[k])
+            }
+            for k in range(len(scan_lat))
+        ]
         
         # Find top 5 locations
         scan_points.sort(key=lambda x: x['score'], reverse=True)
@@ -1323,6 +1646,7 @@ def borewell_recommendation():
 
 # Feature 3: Recharge Zone Identification
 @app.route('/api/recharge-zones', methods=['POST'])
+@point_cached('recharge-zones')
 def recharge_zones():
     """Identify rainwater recharge potential zones"""
     try:
@@ -1398,6 +1722,7 @@ def recharge_zones():
 
 # Feature 4: Crop Suitability Advisor
 @app.route('/api/crop-suitability', methods=['POST'])
+@point_cached('crop-suitability')
 def crop_suitability():
     """Recommend crops based on water availability"""
     try:
@@ -1451,6 +1776,7 @@ def crop_suitability():
 
 # Feature 5: Drought Risk Assessment
 @app.route('/api/drought-risk', methods=['POST'])
+@point_cached('drought-risk')
 def drought_risk():
     """Assess drought vulnerability"""
     try:
@@ -1626,45 +1952,48 @@ def community_atlas():
         
         # Generate realistic borewell data based on actual GWP map within 5km radius
         # Each borewell's characteristics are derived from actual GWP at that location
-        nearby_borewells = []
         search_radius = 0.05  # ~5km in degrees
+        n_records = 15  # Generate 15 nearby borewell records
+        
+        rng = location_rng(lat, lon)
+        offsets = (rng.random((n_records, 2)) - 0.5) * search_radius
+        offset_lat = lat + offsets[:, 0]
+        offset_lon = lon + offsets[:, 1]
+        record_ids = np.flatnonzero(in_dharwad_many(offset_lat, offset_lon))
+        offset_lat, offset_lon = offset_lat[record_ids], offset_lon[record_ids]
+        
+        # Estimate depth, success and yield from the local GWP (Low, Moderate, High)
+        local_value = lookup_many(offset_lat, offset_lon)['gwp_value']
+        n = len(record_ids)
+        depth = rng.integers(np.array([200, 120, 60])[local_value], np.array([300, 200, 120])[local_value])
+        success = rng.random(n) > np.array([0.6, 0.3, -1.0])[local_value]
+        yield_value = np.where(
+            success,
+            rng.integers(np.array([100, 400, 800])[local_value], np.array([500, 900, 1500])[local_value]),
+            0
+        )
+        water_quality = rng.choice(['Good', 'Moderate', 'Poor'], size=n, p=[0.6, 0.3, 0.1])
+        drilling_year = rng.integers(2015, 2025, size=n)
+        reporter = rng.integers(100, 999, size=n)
         
-        for i in range(15):  # Generate 15 nearby borewell records
-            offset_lat = lat + (np.random.random() - 0.5) * search_radius
-            offset_lon = lon + (np.random.random() - 0.5) * search_radius
-            
-            if validate_location(offset_lat, offset_lon):
-                local_data = get_values_from_actual_map(offset_lat, offset_lon)
-                
-                # Estimate depth based on local GWP
-                if local_data['gwp_class'] == 'High':
-                    depth = np.random.randint(60, 120)
-                    success = True
-                    yield_value = np.random.randint(800, 1500)
-                elif local_data['gwp_class'] == 'Moderate':
-                    depth = np.random.randint(120, 200)
-                    success = np.random.random() > 0.3
-                    yield_value = np.random.randint(400, 900) if success else 0
-                else:
-                    depth = np.random.randint(200, 300)
-                    success = np.random.random() > 0.6
-                    yield_value = np.random.randint(100, 500) if success else 0
-                
-                nearby_borewells.append({
-                    'id': f'BW{i+1:03d}',
-                    'location': {
-                        'lat': round(offset_lat, 4),
-                        'lon': round(offset_lon, 4)
-                    },
-                    'depth_ft': int(depth),
-                    'depth_m': round(depth * 0.3048, 1),
-                    'yield_lpm': int(yield_value),
-                    'success': success,
-                    'water_quality': np.random.choice(['Good', 'Moderate', 'Poor'], p=[0.6, 0.3, 0.1]),
-                    'drilling_year': np.random.randint(2015, 2025),
-                    'cost_inr': int(depth * 250),
-                    'reported_by': f'User{np.random.randint(100, 999)}'
-                })
+        nearby_borewells = [
+            {
+                'id': f'BW{record_ids[k]+1:03d}',
+                'location': {
+                    'lat': round(float(offset_lat[k]), 4),
+                    'lon': round(float(offset_lon[k]), 4)
+                },
+                'depth_ft': int(depth[k]),
+                'depth_m': round(int(depth[k]) * 0.3048, 1),
+                'yield_lpm': int(yield_value[k]),
+                'success': bool(success[k]),
+                'water_quality': str(water_quality[k]),
+                'drilling_year': int(drilling_year[k]),
+                'cost_inr': int(depth[k] * 250),
+                'reported_by': f'User{reporter[k]}'
+            }
+            for k in range(n)
+        ]
         
         # Calculate statistics
         successful_borewells = [b for b in nearby_borewells if b['success']]
@@ -1702,12 +2031,13 @@ def community_atlas():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/aquifer-3d', methods=['POST'])
+@point_cached('aquifer-3d', location_seeded=True)
 def aquifer_3d():
     """3D Aquifer Visualization - Underground water layers"""
     try:
         data = request.json
-        lat = data.get('lat')
-        lon = data.get('lon')
+        lat = float(data['lat'])
+        lon = float(data['lon'])
         
         if not validate_location(lat, lon):
             return jsonify({"error": "Location outside Dharwad district"}), 400
@@ -1775,13 +2105,14 @@ def aquifer_3d():
             'color': '#2F4F4F'
         })
         
-        # Calculate water table depth
+        # Calculate water table depth (location-seeded, so repeat queries agree)
+        rng = location_rng(lat, lon)
         if gwp_class == 'High':
-            water_table_depth = np.random.uniform(8, 15)
+            water_table_depth = rng.uniform(8, 15)
         elif gwp_class == 'Moderate':
-            water_table_depth = np.random.uniform(15, 30)
+            water_table_depth = rng.uniform(15, 30)
         else:
-            water_table_depth = np.random.uniform(30, 60)
+            water_table_depth = rng.uniform(30, 60)
         
         return jsonify({
             'location': {'lat': lat, 'lon': lon},
@@ -1816,13 +2147,13 @@ def generate_3d_mesh(lat, lon, layers):
     return mesh
 
 @app.route('/api/cost-benefit', methods=['POST'])
+@point_cached('cost-benefit')
 def cost_benefit_analysis():
     """Cost-Benefit Analyzer - Financial ROI calculator"""
     try:
         data = request.json
-        lat = data.get('lat')
-        lon = data.get('lon')
-        investment = data.get('investment', 100000)  # Default 1 lakh
+        lat = float(data['lat'])
+        lon = float(data['lon'])
         
         if not validate_location(lat, lon):
             return jsonify({"error": "Location outside Dharwad district"}), 400
@@ -2011,6 +2342,7 @@ def satellite_timelapse():
         # Generate time series data
         time_series = []
         current_date = datetime.now()
+        rng = location_rng(lat, lon)
         
         for i in range(months):
             # Move back in time
@@ -2022,15 +2354,15 @@ def satellite_timelapse():
             
             # NDVI varies with monsoon (higher in monsoon months: June-Sept)
             if date.month in [6, 7, 8, 9]:
-                ndvi = min(1.0, current_ndvi + season_factor + np.random.uniform(0, 0.15))
+                ndvi = min(1.0, current_ndvi + season_factor + rng.uniform(0, 0.15))
             else:
-                ndvi = max(-1.0, current_ndvi + season_factor - np.random.uniform(0, 0.1))
+                ndvi = max(-1.0, current_ndvi + season_factor - rng.uniform(0, 0.1))
             
             # NDWI correlates with rainfall
             if date.month in [6, 7, 8, 9]:
-                ndwi = min(1.0, current_ndwi + season_factor + np.random.uniform(0, 0.2))
+                ndwi = min(1.0, current_ndwi + season_factor + rng.uniform(0, 0.2))
             else:
-                ndwi = max(-1.0, current_ndwi + season_factor - np.random.uniform(0, 0.15))
+                ndwi = max(-1.0, current_ndwi + season_factor - rng.uniform(0, 0.15))
             
             # Estimate GWP based on indices
             if ndvi > 0.3 and ndwi > 0.2:
@@ -2080,12 +2412,13 @@ def satellite_timelapse():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/compliance-check', methods=['POST'])
+@point_cached('compliance-check')
 def government_compliance():
     """Government Compliance - Permit checker & regulations"""
     try:
         data = request.json
-        lat = data.get('lat')
-        lon = data.get('lon')
+        lat = float(data['lat'])
+        lon = float(data['lon'])
         
         if not validate_location(lat, lon):
             return jsonify({"error": "Location outside Dharwad district"}), 400
@@ -2320,135 +2653,117 @@ def precipitation_forecasting():
         
         # Use OpenWeatherMap API for real forecast
         try:
-            # Free tier: current + forecast
-            url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-            response = requests.get(url, timeout=5)
-            
-            if response.status_code == 200:
-                weather_data = response.json()
-                forecast = []
-                
-                for item in weather_data['list'][:days*8]:  # 3-hour intervals
-                    forecast.append({
-                        'datetime': item['dt_txt'],
-                        'temp_c': round(item['main']['temp'], 1),
-                        'humidity_percent': item['main']['humidity'],
-                        'precipitation_mm': item.get('rain', {}).get('3h', 0),
-                        'weather': item['weather'][0]['description'],
-                        'wind_speed_kmh': round(item['wind']['speed'] * 3.6, 1)
-                    })
-                
-                # Aggregate by day
-                daily_forecast = []
-                current_date = None
-                day_data = {'precip': 0, 'temp': [], 'humidity': []}
-                
-                for item in forecast:
-                    date = item['datetime'].split(' ')[0]
-                    if current_date != date:
-                        if current_date:
-                            daily_forecast.append({
-                                'date': current_date,
-                                'total_precipitation_mm': round(day_data['precip'], 1),
-                                'avg_temp_c': round(np.mean(day_data['temp']), 1),
-                                'avg_humidity': round(np.mean(day_data['humidity']), 0),
-                                'groundwater_recharge_potential': 'High' if day_data['precip'] > 20 else ('Moderate' if day_data['precip'] > 5 else 'Low')
-                            })
-                        current_date = date
-                        day_data = {'precip': 0, 'temp': [], 'humidity': []}
-                    
-                    day_data['precip'] += item['precipitation_mm']
-                    day_data['temp'].append(item['temp_c'])
-                    day_data['humidity'].append(item['humidity_percent'])
-                
-                # Add last day
-                if current_date:
-                    daily_forecast.append({
-                        'date': current_date,
-                        'total_precipitation_mm': round(day_data['precip'], 1),
-                        'avg_temp_c': round(np.mean(day_data['temp']), 1),
-                        'avg_humidity': round(np.mean(day_data['humidity']), 0),
-                        'groundwater_recharge_potential': 'High' if day_data['precip'] > 20 else ('Moderate' if day_data['precip'] > 5 else 'Low')
-                    })
-                
-                total_expected_rain = sum([d['total_precipitation_mm'] for d in daily_forecast])
-                
-                # Calculate recharge impact
-                recharge_mm = total_expected_rain * 0.15  # 15% recharge coefficient
-                current_gwp = base_data['gwp_class']
-                
-                return jsonify({
-                    'location': {'lat': lat, 'lon': lon},
-                    'current_gwp': current_gwp,
-                    'forecast_period_days': len(daily_forecast),
-                    'daily_forecast': daily_forecast,
-                    'summary': {
-                        'total_expected_rainfall_mm': round(total_expected_rain, 1),
-                        'expected_groundwater_recharge_mm': round(recharge_mm, 1),
-                        'rainy_days': len([d for d in daily_forecast if d['total_precipitation_mm'] > 2]),
-                        'peak_rainfall_day': max(daily_forecast, key=lambda x: x['total_precipitation_mm'])['date'] if daily_forecast else 'N/A'
-                    },
-                    'impact_on_groundwater': {
-                        'current_status': current_gwp,
-                        'expected_improvement': 'Significant' if total_expected_rain > 100 else ('Moderate' if total_expected_rain > 50 else 'Minimal'),
-                        'recharge_potential_rating': 'Excellent' if total_expected_rain > 100 else ('Good' if total_expected_rain > 50 else 'Poor')
-                    },
-                    'recommendations': [
-                        'Prepare rainwater harvesting structures' if total_expected_rain > 50 else 'Monitor rainfall',
-                        'Check recharge pit functionality',
-                        'Avoid excessive groundwater extraction during recharge period' if total_expected_rain > 20 else 'Normal water use permitted'
-                    ],
-                    'data_source': 'OpenWeatherMap API (Live)'
-                })
-            else:
+            # Free tier: current + forecast (prefetched per cell; fails fast while the circuit is open)
+            weather_data = read_weather("forecast", lat, lon)
+            if not weather_data.get('list'):
                 raise Exception("Weather API unavailable")
-                
+            columns = forecast_columns(weather_data, days)
+            return jsonify(forecast_payload(lat, lon, base_data['gwp_class'], columns,
+                                            'OpenWeatherMap API (Live)'))
         except Exception as api_error:
             # Fallback to simulated forecast if API fails
-            daily_forecast = []
-            for i in range(min(days, 7)):
-                date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                precip = np.random.exponential(10) if np.random.random() > 0.6 else 0
-                
-                daily_forecast.append({
-                    'date': date,
-                    'total_precipitation_mm': round(precip, 1),
-                    'avg_temp_c': round(25 + np.random.uniform(-5, 5), 1),
-                    'avg_humidity': int(60 + np.random.uniform(-20, 30)),
-                    'groundwater_recharge_potential': 'High' if precip > 20 else ('Moderate' if precip > 5 else 'Low')
-                })
-            
-            total_expected_rain = sum([d['total_precipitation_mm'] for d in daily_forecast])
-            recharge_mm = total_expected_rain * 0.15
+            return jsonify(forecast_payload(lat, lon, base_data['gwp_class'], simulated_columns(days),
+                                            'Simulated (Weather API unavailable)',
+                                            note=f'API Error: {str(api_error)}'))
             
-            return jsonify({
-                'location': {'lat': lat, 'lon': lon},
-                'current_gwp': base_data['gwp_class'],
-                'forecast_period_days': len(daily_forecast),
-                'daily_forecast': daily_forecast,
-                'summary': {
-                    'total_expected_rainfall_mm': round(total_expected_rain, 1),
-                    'expected_groundwater_recharge_mm': round(recharge_mm, 1),
-                    'rainy_days': len([d for d in daily_forecast if d['total_precipitation_mm'] > 2]),
-                    'peak_rainfall_day': max(daily_forecast, key=lambda x: x['total_precipitation_mm'])['date'] if daily_forecast else 'N/A'
-                },
-                'impact_on_groundwater': {
-                    'current_status': base_data['gwp_class'],
-                    'expected_improvement': 'Significant' if total_expected_rain > 100 else ('Moderate' if total_expected_rain > 50 else 'Minimal'),
-                    'recharge_potential_rating': 'Excellent' if total_expected_rain > 100 else ('Good' if total_expected_rain > 50 else 'Poor')
-                },
-                'recommendations': [
-                    'Prepare rainwater harvesting structures' if total_expected_rain > 50 else 'Monitor rainfall',
-                    'Check recharge pit functionality',
-                    'Avoid excessive groundwater extraction during recharge period' if total_expected_rain > 20 else 'Normal water use permitted'
-                ],
-                'data_source': 'Simulated (Weather API unavailable)',
-                'note': f'API Error: {str(api_error)}'
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/precipitation-forecast/batch', methods=['POST'])
+def precipitation_forecast_batch():
+    """
+    Forecast rainfall and groundwater recharge for many sites in one pass.
+    Sites are grouped by weather cell; each cell's forecast is read once and all
+    cells are aggregated into days by a single vectorized group-by.
+    """
+    try:
+        data = request.json
+        coordinates = data.get('coordinates', [])
+        days = int(data.get('days', 7))
+        
+        if len(coordinates) > MAX_FORECAST_SITES:
+            return jsonify({"error": f"Maximum {MAX_FORECAST_SITES} coordinates allowed per forecast batch"}), 400
+        
+        lats = np.array([float(coord['lat']) for coord in coordinates], dtype=np.float64)
+        lons = np.array([float(coord['lon']) for coord in coordinates], dtype=np.float64)
+        inside = np.isfinite(lats) & np.isfinite(lons) & in_dharwad_many(lats, lons)
+        lookup = lookup_many(lats[inside], lons[inside])
+        
+        # One forecast per weather cell; cells without one get a simulated forecast
+        cells = {}
+        site_group = np.full(len(lats), -1, dtype=np.int64)
+        for i in np.flatnonzero(inside):
+            site_group[i] = cells.setdefault(weather_client.cell(lats[i], lons[i]), len(cells))
+        cell_centres = [list(weather_client.cell_centre(cell)) for cell in cells]
+        
+        def cell_columns(centre):
+            try:
+                return forecast_columns(read_weather("forecast", *centre), days)
+            except Exception:
+                return None
+        
+        # Cells missing from the prefetched store are fetched concurrently over the pooled session
+        with ThreadPoolExecutor(max_workers=FORECAST_FETCH_WORKERS) as pool:
+            fetched = list(pool.map(cell_columns, cell_centres))
+        live = [columns is not None and len(columns["date"]) > 0 for columns in fetched]
+        columns_list = [columns if ok else simulated_columns(days) for columns, ok in zip(fetched, live)]
+        
+        results = []
+        dates = []
+        if columns_list:
+            daily = daily_aggregate(stack_columns(columns_list))
+            summary = rainfall_summary(daily)
+            dates = daily["date"].tolist()
+            daily_rain = np.where(daily["count"] > 0, np.round(daily["total_precipitation_mm"], 1), np.nan)
+        
+        k = 0
+        for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist())):
+            group = site_group[i]
+            if group < 0:
+                results.append({"location": {"lat": lat, "lon": lon}, "error": "Outside Dharwad district"})
+                continue
+            total_rain = float(summary["total_expected_rainfall_mm"][group])
+            improvement, rating = rainfall_ratings(total_rain)
+            results.append({
+                "location": {"lat": lat, "lon": lon},
+                "gwp_class": str(lookup['gwp_class'][k]),
+                "weather_cell": cell_centres[group],
+                "daily_precipitation_mm": [None if np.isnan(v) else float(v) for v in daily_rain[group]],
+                "total_expected_rainfall_mm": round(total_rain, 1),
+                "expected_groundwater_recharge_mm": round(float(summary["expected_groundwater_recharge_mm"][group]), 1),
+                "rainy_days": int(summary["rainy_days"][group]),
+                "peak_rainfall_day": dates[summary["peak_index"][group]] if summary["days"][group] else 'N/A',
+                "expected_improvement": improvement,
+                "recharge_potential_rating": rating,
+                "data_source": 'OpenWeatherMap API (Live)' if live[group] else 'Simulated (Weather API unavailable)'
             })
-            
+            k += 1
+        
+        return jsonify({
+            "success": True,
+            "total_locations": len(coordinates),
+            "weather_cells": len(cells),
+            "dates": dates,
+            "results": results,
+            "timestamp": datetime.now().isoformat()
+        })
+        
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def init_app():
+    """Open the map and feature rasters and, with WEATHER_PREFETCH=1, start the weather prefetcher"""
+    load_feature_cube()
+    load_attribution_cube()
+    load_gwp_raster()
+    if WEATHER_PREFETCH == "1":
+        start_weather_prefetcher()
+
+# Spawned report workers re-import the launching script as __mp_main__;
+# they only render PDFs, so they skip loading the maps and the prefetcher
+if __name__ != '__mp_main__':
+    init_app()
+
 if __name__ == '__main__':
     print("="*60)
     print("🌊 Groundwater Potential Web Application (ENHANCED)")
@@ -2457,7 +2772,7 @@ if __name__ == '__main__':
     print(f"District bounds: {dharwad_bounds}")
     if ACTUAL_DATA_LOADED:
         print("\n✅ Using ACTUAL GWP data from your map image!")
-        print(f"   Map size: {gwp_array.shape}")
+        print(f"   Map size: {gwp_raster.shape}")
     else:
         print("\n⚠️  Using simulated data (map image not loaded)")
     print("\n🚀 ADVANCED FEATURES (14 TOTAL):")
@@ -2480,4 +2795,8 @@ if __name__ == '__main__':
     print("\nStarting server on http://localhost:5000")
     print("="*60)
     
+    # With the debug reloader only the serving child process prefetches
+    if WEATHER_PREFETCH != "0" and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_weather_prefetcher()
+
     app.run(debug=True, port=5000, host='0.0.0.0')
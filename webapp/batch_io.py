@@ -0,0 +1,192 @@
+"""
+Batch I/O
+Chunked coordinate readers and writers for large batch jobs (JSON coordinate
+lists, uploaded CSV or Parquet files in the sample_batch_locations.csv
+format), so bulk requests are scored in vectorized chunks with bounded memory.
+"""
+
+import csv
+import io
+import itertools
+import shutil
+import tempfile
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Uploads and scored files larger than this spill from memory to a temporary file on disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Columns appended to every row of a scored file
+ENRICHED_COLUMNS = ["gwp_class", "confidence", "ndvi", "ndwi", "elevation", "error"]
+
+LAT_COLUMNS = ("latitude", "lat")
+LON_COLUMNS = ("longitude", "lon")
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def _to_float(value):
+    """Parse a coordinate, NaN if missing or malformed"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def spooled_file():
+    """Binary temp file kept in memory up to SPOOL_MAX_BYTES, then on disk"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+
+def spool_upload(file_storage):
+    """
+    Copy an uploaded file into a spooled temp file owned by the caller, so a
+    streamed response can keep reading it after the request's own upload
+    buffers have been closed.
+    """
+    spool = spooled_file()
+    shutil.copyfileobj(file_storage.stream, spool)
+    spool.seek(0)
+    return spool
+
+
+def iter_csv_records(binary_stream):
+    """Yield one dict per CSV row from an uploaded file stream (header names lower-cased)"""
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [h.strip().lower() for h in header]
+    for row in reader:
+        if row:
+            yield dict(zip(header, (v.strip() for v in row)))
+
+
+def iter_coordinate_chunks(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Group records with lat/lon (or latitude/longitude) keys into chunks of
+    (lats, lons, names) so each chunk can go through one vectorized lookup.
+    A record that is not an object gets NaN coordinates, so it is reported as
+    an invalid row instead of ending the stream.
+    """
+    records = iter(records)
+    while True:
+        chunk = [r if isinstance(r, dict) else {} for r in itertools.islice(records, chunk_size)]
+        if not chunk:
+            return
+
+        lats = np.array([_to_float(r.get("lat", r.get("latitude"))) for r in chunk], dtype=np.float64)
+        lons = np.array([_to_float(r.get("lon", r.get("longitude"))) for r in chunk], dtype=np.float64)
+        names = [r.get("name") for r in chunk]
+        yield lats, lons, names
+
+
+def is_parquet_upload(filename, spool):
+    """Detect Parquet uploads by extension or the PAR1 magic bytes"""
+    if filename and filename.lower().endswith((".parquet", ".pq")):
+        return True
+    magic = spool.read(4)
+    spool.seek(0)
+    return magic == b"PAR1"
+
+
+def find_column(names, candidates):
+    """Index of the first matching column name (case-insensitive), else ValueError"""
+    lowered = [str(n).strip().lower() for n in names]
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered.index(candidate)
+    raise ValueError(f"Missing column: expected one of {', '.join(candidates)}")
+
+
+def _csv_cell(value):
+    """Render one enriched value for CSV output (NaN and None become empty cells)"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return "" if np.isnan(value) else repr(round(value, 3))
+    return str(value)
+
+
+def open_enriched_csv(binary_stream, score_columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Validate the CSV header eagerly, then return a generator of CSV text that
+    echoes every input row with ENRICHED_COLUMNS appended. Rows are read in
+    chunks, transposed into coordinate columns and scored with one
+    score_columns(lats, lons) call per chunk.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("Uploaded CSV is empty")
+    lat_idx = find_column(header, LAT_COLUMNS)
+    lon_idx = find_column(header, LON_COLUMNS)
+
+    def generate():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(header + ENRICHED_COLUMNS)
+
+        while True:
+            batch = list(itertools.islice(reader, chunk_size))
+            rows = [row for row in batch if row]
+            if rows:
+                lats = np.array([_to_float(r[lat_idx]) if lat_idx < len(r) else np.nan for r in rows])
+                lons = np.array([_to_float(r[lon_idx]) if lon_idx < len(r) else np.nan for r in rows])
+                scored = score_columns(lats, lons)
+                enriched = zip(*(scored[name].tolist() for name in ENRICHED_COLUMNS))
+                writer.writerows(row + [_csv_cell(v) for v in extra] for row, extra in zip(rows, enriched))
+
+            if out.tell():
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+            if not batch:
+                return
+
+    return generate()
+
+
+def enrich_parquet(binary_stream, out_stream, score_columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score a Parquet file batch by batch, writing the enriched table to out_stream"""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet support requires pyarrow (pip install pyarrow)")
+
+    parquet_file = pq.ParquetFile(binary_stream)
+    names = parquet_file.schema_arrow.names
+    lat_name = names[find_column(names, LAT_COLUMNS)]
+    lon_name = names[find_column(names, LON_COLUMNS)]
+
+    writer = None
+    rows = 0
+    try:
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            lats = batch.column(lat_name).cast(pa.float64()).to_numpy(zero_copy_only=False)
+            lons = batch.column(lon_name).cast(pa.float64()).to_numpy(zero_copy_only=False)
+            scored = score_columns(lats, lons)
+
+            table = pa.Table.from_batches([batch])
+            for name in ENRICHED_COLUMNS:
+                values = scored[name]
+                if values.dtype == object:
+                    table = table.append_column(name, pa.array([v or None for v in values.tolist()], type=pa.string()))
+                else:
+                    table = table.append_column(name, pa.array(values, from_pandas=True))
+
+            if writer is None:
+                writer = pq.ParquetWriter(out_stream, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
@@ -0,0 +1,88 @@
+"""
+Caching Helpers
+Small thread-safe in-process caches shared by the API endpoints.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit/miss counters"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self):
+        """Size and hit ratio, for the diagnostic endpoints"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class TTLCache(LRUCache):
+    """LRU cache whose entries also expire ttl seconds after they were stored"""
+
+    def __init__(self, maxsize=1024, ttl=600):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        if entry is None:
+            return default
+        value, expires = entry
+        if time.monotonic() >= expires:
+            with self._lock:
+                self._data.pop(key, None)
+                # Counted as a hit by the LRU lookup; an expired entry is a miss
+                self.hits -= 1
+                self.misses += 1
+            return default
+        return value
+
+    def put(self, key, value):
+        super().put(key, (value, time.monotonic() + self.ttl))
+
+    def stats(self):
+        stats = super().stats()
+        stats["ttl_seconds"] = self.ttl
+        return stats
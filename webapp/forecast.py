@@ -0,0 +1,162 @@
+"""
+Precipitation Forecast Processing
+Turns OpenWeather 5-day / 3-hour forecasts into columnar arrays and groups
+them into days with one vectorized group-by (np.unique + np.bincount). Several
+forecasts (one per weather cell) are stacked with a group index, so daily
+totals and recharge estimates for many sites come out of a single pass.
+Simulated forecasts use the same columns, so live and fallback responses are
+built by the same code.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Share of rainfall expected to reach the aquifer
+RECHARGE_COEFFICIENT = 0.15
+
+# OpenWeather forecast steps per day (3-hour intervals)
+STEPS_PER_DAY = 8
+
+# Simulated fallback horizon
+MAX_SIMULATED_DAYS = 7
+
+
+def forecast_columns(forecast_json, days):
+    """Date, temperature, humidity and rainfall columns from a raw forecast's "list" """
+    items = (forecast_json.get('list') or [])[:days * STEPS_PER_DAY]
+    return {
+        "date": np.array([item['dt_txt'].split(' ')[0] for item in items], dtype=str),
+        "temp_c": np.round(np.array([item['main']['temp'] for item in items], dtype=np.float64), 1),
+        "humidity_percent": np.array([item['main']['humidity'] for item in items], dtype=np.float64),
+        "precipitation_mm": np.array([item.get('rain', {}).get('3h', 0) for item in items], dtype=np.float64),
+    }
+
+
+def simulated_columns(days, rng=np.random, start=None):
+    """One simulated step per day (same columns as forecast_columns) for when the API is unavailable"""
+    n = min(days, MAX_SIMULATED_DAYS)
+    start = start or datetime.now()
+    wet = rng.random(n) > 0.6
+    return {
+        "date": np.array([(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(n)], dtype=str),
+        "temp_c": np.round(25 + rng.uniform(-5, 5, n), 1),
+        "humidity_percent": np.floor(60 + rng.uniform(-20, 30, n)),
+        "precipitation_mm": np.where(wet, rng.exponential(10, n), 0.0),
+    }
+
+
+def stack_columns(columns_list):
+    """Concatenate per-cell columns, adding the "group" index each step belongs to"""
+    stacked = {key: np.concatenate([columns[key] for columns in columns_list])
+               for key in ("date", "temp_c", "humidity_percent", "precipitation_mm")}
+    stacked["group"] = np.repeat(np.arange(len(columns_list)), [len(c["date"]) for c in columns_list])
+    stacked["n_groups"] = len(columns_list)
+    return stacked
+
+
+def daily_aggregate(columns):
+    """
+    Group steps by (group, date). Returns the sorted dates and (groups, dates)
+    matrices of step counts, total rainfall and mean temperature / humidity;
+    (group, date) pairs without steps have count 0 and NaN means.
+    """
+    group = columns.get("group", np.zeros(len(columns["date"]), dtype=np.int64))
+    n_groups = columns.get("n_groups", 1)
+    dates, day = np.unique(columns["date"], return_inverse=True)
+    shape = (n_groups, len(dates))
+    key = group * len(dates) + day.ravel()
+
+    def total(weights=None):
+        return np.bincount(key, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+
+    counts = total()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "date": dates,
+            "count": counts,
+            "total_precipitation_mm": total(columns["precipitation_mm"]),
+            "avg_temp_c": total(columns["temp_c"]) / counts,
+            "avg_humidity": total(columns["humidity_percent"]) / counts,
+        }
+
+
+def recharge_potential(precipitation_mm):
+    """Daily groundwater recharge potential label for rainfall totals"""
+    precipitation_mm = np.asarray(precipitation_mm)
+    return np.select([precipitation_mm > 20, precipitation_mm > 5], ["High", "Moderate"], "Low")
+
+
+def rainfall_summary(daily):
+    """Per-group totals: rainfall, recharge, rainy days and the peak rainfall day index"""
+    present = daily["count"] > 0
+    rain = np.where(present, np.round(daily["total_precipitation_mm"], 1), 0.0)
+    total_rain = rain.sum(axis=1)
+    return {
+        "total_expected_rainfall_mm": total_rain,
+        "expected_groundwater_recharge_mm": total_rain * RECHARGE_COEFFICIENT,
+        "rainy_days": (rain > 2).sum(axis=1),
+        # argmax is undefined on an empty date axis (no forecast steps)
+        "peak_index": (np.where(present, rain, -1.0).argmax(axis=1) if len(daily["date"])
+                       else np.zeros(len(rain), dtype=np.int64)),
+        "days": present.sum(axis=1),
+    }
+
+
+def daily_records(daily, group=0):
+    """Per-day dicts (the /api/precipitation-forecast "daily_forecast" shape) for one group"""
+    present = daily["count"][group] > 0
+    precip = daily["total_precipitation_mm"][group]
+    labels = recharge_potential(precip)
+    return [{
+        'date': str(daily["date"][j]),
+        'total_precipitation_mm': round(float(precip[j]), 1),
+        'avg_temp_c': round(float(daily["avg_temp_c"][group, j]), 1),
+        'avg_humidity': round(float(daily["avg_humidity"][group, j]), 0),
+        'groundwater_recharge_potential': str(labels[j])
+    } for j in np.flatnonzero(present)]
+
+
+def rainfall_ratings(total_rain):
+    """(expected improvement, recharge potential rating) for a forecast rainfall total"""
+    if total_rain > 100:
+        return 'Significant', 'Excellent'
+    if total_rain > 50:
+        return 'Moderate', 'Good'
+    return 'Minimal', 'Poor'
+
+
+def forecast_payload(lat, lon, gwp_class, columns, data_source, note=None):
+    """Full /api/precipitation-forecast response for one location's forecast columns"""
+    daily = daily_aggregate(columns)
+    daily_forecast = daily_records(daily)
+    summary = rainfall_summary(daily)
+    total_rain = float(summary["total_expected_rainfall_mm"][0])
+    improvement, rating = rainfall_ratings(total_rain)
+
+    payload = {
+        'location': {'lat': lat, 'lon': lon},
+        'current_gwp': gwp_class,
+        'forecast_period_days': len(daily_forecast),
+        'daily_forecast': daily_forecast,
+        'summary': {
+            'total_expected_rainfall_mm': round(total_rain, 1),
+            'expected_groundwater_recharge_mm': round(float(summary["expected_groundwater_recharge_mm"][0]), 1),
+            'rainy_days': int(summary["rainy_days"][0]),
+            'peak_rainfall_day': str(daily["date"][summary["peak_index"][0]]) if daily_forecast else 'N/A'
+        },
+        'impact_on_groundwater': {
+            'current_status': gwp_class,
+            'expected_improvement': improvement,
+            'recharge_potential_rating': rating
+        },
+        'recommendations': [
+            'Prepare rainwater harvesting structures' if total_rain > 50 else 'Monitor rainfall',
+            'Check recharge pit functionality',
+            'Avoid excessive groundwater extraction during recharge period' if total_rain > 20 else 'Normal water use permitted'
+        ],
+        'data_source': data_source
+    }
+    if note is not None:
+        payload['note'] = note
+    return payload
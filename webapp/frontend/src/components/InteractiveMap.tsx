@@ -100,6 +100,13 @@ const InteractiveMap = ({ onLocationSelect, selectedLat, selectedLon }: Interact
           opacity={0.5}
         />
         
+        {/* Groundwater potential tiles rendered by the backend */}
+        <TileLayer
+          attribution='GWP map &copy; Dharwad groundwater model'
+          url="http://localhost:5000/tiles/{z}/{x}/{y}.png"
+          opacity={0.6}
+        />
+        
         {/* Click handler */}
         <MapClickHandler onLocationSelect={onLocationSelect} />
         
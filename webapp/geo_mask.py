@@ -0,0 +1,128 @@
+"""
+GeoJSON Polygon Masks
+Rasterizes GeoJSON polygons (farm boundaries, watersheds, taluks) onto the
+GWP class-raster grid as compact row spans, so class counts and areas under
+the polygon come straight from the per-class integral image. Pure NumPy:
+no shapely/GDAL needed in the backend.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+# Scanline rows x polygon edges evaluated per NumPy step
+SCANLINE_CELLS = 4_000_000
+
+
+def polygon_rings(geojson):
+    """
+    All linear rings (exterior and holes) of a GeoJSON Polygon / MultiPolygon,
+    Feature or FeatureCollection, as a list of (n, 2) lon/lat arrays
+    """
+    if not isinstance(geojson, dict):
+        raise ValueError("GeoJSON object expected")
+
+    kind = geojson.get("type")
+    if kind == "FeatureCollection":
+        return [ring for feature in geojson.get("features", []) for ring in polygon_rings(feature)]
+    if kind == "Feature":
+        return polygon_rings(geojson.get("geometry") or {})
+    if kind == "Polygon":
+        polygons = [geojson.get("coordinates", [])]
+    elif kind == "MultiPolygon":
+        polygons = geojson.get("coordinates", [])
+    else:
+        raise ValueError(f"Unsupported geometry type: {kind} (expected Polygon or MultiPolygon)")
+
+    rings = []
+    for polygon in polygons:
+        for ring in polygon:
+            ring = np.asarray(ring, dtype=np.float64)
+            if ring.ndim != 2 or ring.shape[0] < 3 or ring.shape[1] < 2:
+                raise ValueError("Each polygon ring needs at least 3 [lon, lat] positions")
+            rings.append(ring[:, :2])
+    if not rings:
+        raise ValueError("Geometry has no polygon rings")
+    return rings
+
+
+def geometry_key(geojson):
+    """Stable hash of a geometry, used to cache its rasterized mask"""
+    canonical = json.dumps(geojson, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def rasterize_spans(rings, transform, shape):
+    """
+    Even-odd scanline rasterization of polygon rings onto a lon/lat grid.
+    A pixel is inside when its centre is; holes and multi-part polygons follow
+    from the even-odd rule. Returns (rows, col_start, col_end) spans.
+    """
+    a, _, c, _, e, f = transform
+    height, width = shape
+
+    # Polygon edges in fractional pixel coordinates (ring closed explicitly)
+    starts, ends = [], []
+    for ring in rings:
+        cols = (ring[:, 0] - c) / a
+        rows = (ring[:, 1] - f) / e
+        pts = np.column_stack([cols, rows])
+        if not np.array_equal(pts[0], pts[-1]):
+            pts = np.vstack([pts, pts[:1]])
+        starts.append(pts[:-1])
+        ends.append(pts[1:])
+    x1, y1 = np.concatenate(starts).T
+    x2, y2 = np.concatenate(ends).T
+
+    # Horizontal edges never cross a scanline
+    sloped = y1 != y2
+    x1, y1, x2, y2 = x1[sloped], y1[sloped], x2[sloped], y2[sloped]
+
+    empty = (np.empty(0, dtype=np.int64),) * 3
+    if len(x1) == 0:
+        return empty
+    r_min = max(int(np.floor(min(y1.min(), y2.min()))), 0)
+    r_max = min(int(np.ceil(max(y1.max(), y2.max()))), height)
+    if r_min >= r_max:
+        return empty
+
+    chunk = max(1, SCANLINE_CELLS // len(x1))
+    out_rows, out_c0, out_c1 = [], [], []
+    for r0 in range(r_min, r_max, chunk):
+        rows = np.arange(r0, min(r0 + chunk, r_max))
+        yc = rows[:, None] + 0.5
+
+        # Half-open crossing test so shared vertices count once
+        crosses = ((y1 <= yc) & (yc < y2)) | ((y2 <= yc) & (yc < y1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xs = x1 + (yc - y1) * (x2 - x1) / (y2 - y1)
+        xs = np.sort(np.where(crosses, xs, np.inf), axis=1)
+
+        # Consecutive crossing pairs bound the inside spans of each row
+        n_pairs = crosses.sum(axis=1) // 2
+        max_pairs = int(n_pairs.max()) if len(n_pairs) else 0
+        if max_pairs == 0:
+            continue
+        left, right = xs[:, 0:2 * max_pairs:2], xs[:, 1:2 * max_pairs:2]
+        valid = np.arange(max_pairs)[None, :] < n_pairs[:, None]
+
+        col_start = np.clip(np.ceil(left[valid] - 0.5), 0, width).astype(np.int64)
+        col_end = np.clip(np.ceil(right[valid] - 0.5), 0, width).astype(np.int64)
+        span_rows = np.broadcast_to(rows[:, None], valid.shape)[valid]
+        keep = col_end > col_start
+        out_rows.append(span_rows[keep])
+        out_c0.append(col_start[keep])
+        out_c1.append(col_end[keep])
+
+    if not out_rows:
+        return empty
+    return np.concatenate(out_rows), np.concatenate(out_c0), np.concatenate(out_c1)
+
+
+def spans_to_mask(spans, shape):
+    """Dense boolean mask from row spans (for inspection and debugging)"""
+    mask = np.zeros(shape, dtype=bool)
+    for r, c0, c1 in zip(*spans):
+        mask[r, c0:c1] = True
+    return mask
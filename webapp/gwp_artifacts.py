@@ -0,0 +1,190 @@
+"""
+GWP Artifact Cache
+Content-addressed store for the notebook's preprocessing intermediates
+(spectral indices, reprojected DEM, rainfall grid, clipped feature stack).
+An artifact's key is a SHA-256 over its stage name, its parameters and the
+fingerprints of its inputs: source files by content hash, upstream artifacts
+by their own key. A re-run with unchanged inputs and parameters reuses the
+stored files; changing anything invalidates exactly the stages downstream.
+
+Each artifact is a directory <root>/<stage>-<key>/ holding its output files,
+built in a temporary directory and renamed into place, so an interrupted
+build never leaves a half-written artifact. Rasters are stored as tiled,
+compressed GeoTIFFs (chunked, read by window) and arrays as .npy with a JSON
+sidecar, opened memory-mapped.
+
+Source file hashes are memoized in <root>/file_digests.json by (size, mtime),
+so multi-GB Sentinel bands are hashed once per acquisition.
+
+From the notebook:
+    cache = ArtifactCache(os.path.join(OUT_DIR, "artifact_cache"))
+    ndvi_tif, ndwi_tif = cache.files("indices", [B04, B08, B11], {"eps": eps},
+                                     ("ndvi.tif", "ndwi.tif"), build_indices)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+
+DIGEST_INDEX_NAME = "file_digests.json"
+ARRAY_NAME = "array.npy"
+ARRAY_META_NAME = "array.json"
+META_NAME = "meta.json"
+
+# Bytes read per step while hashing source files
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def json_default(value):
+    """Affine transforms, CRSs, NumPy scalars and other parameters, as stable JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "to_wkt"):
+        return value.to_wkt()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, "__iter__"):
+        return list(value)
+    return str(value)
+
+
+def save_array(array_path, array, meta):
+    """.npy array plus its JSON meta (array.json) in the same artifact directory"""
+    np.save(array_path, np.ascontiguousarray(array))
+    with open(os.path.join(os.path.dirname(array_path), ARRAY_META_NAME), "w") as f:
+        json.dump(meta, f, indent=1, default=json_default)
+
+
+def load_array(array_path):
+    """(memory-mapped array, meta dict) saved by save_array"""
+    with open(os.path.join(os.path.dirname(array_path), ARRAY_META_NAME)) as f:
+        meta = json.load(f)
+    return np.load(array_path, mmap_mode="r"), meta
+
+
+class ArtifactCache:
+    """Stage outputs stored under the hash of (stage, params, input fingerprints)"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.hits = 0
+        self.builds = 0
+        self._lock = threading.Lock()
+        self._digests = self._load_digests()
+
+    # ---- fingerprints ----
+
+    def _load_digests(self):
+        try:
+            with open(os.path.join(self.root, DIGEST_INDEX_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_digests(self):
+        tmp = os.path.join(self.root, f"{DIGEST_INDEX_NAME}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._digests, f, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(self.root, DIGEST_INDEX_NAME))
+
+    def file_digest(self, path):
+        """Content hash of a source file, recomputed only when its size or mtime changes"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        with self._lock:
+            entry = self._digests.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                return entry["sha256"]
+        digest = file_sha256(path)
+        with self._lock:
+            self._digests[path] = {"stamp": stamp, "sha256": digest}
+            self._save_digests()
+        return digest
+
+    def fingerprint(self, item):
+        """
+        Artifact outputs by "<artifact dir>/<file>" (their key already covers
+        their inputs), other existing files by content hash, anything else by value
+        """
+        if isinstance(item, (str, os.PathLike)):
+            path = os.path.abspath(item)
+            if os.path.dirname(os.path.dirname(path)) == self.root:
+                return os.path.relpath(path, self.root).replace(os.sep, "/")
+            if os.path.isfile(path):
+                return f"sha256:{self.file_digest(path)}"
+        return json.dumps(item, sort_keys=True, default=json_default)
+
+    def key(self, stage, inputs=(), params=None):
+        payload = json.dumps({
+            "stage": stage,
+            "inputs": [self.fingerprint(item) for item in inputs],
+            "params": params or {},
+        }, sort_keys=True, default=json_default)
+        return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+    # ---- artifacts ----
+
+    def artifact_dir(self, stage, key):
+        return os.path.join(self.root, f"{stage}-{key}")
+
+    def paths(self, stage, inputs, params, names):
+        """Where the artifact's output files are (or would be) stored"""
+        directory = self.artifact_dir(stage, self.key(stage, inputs, params))
+        return tuple(os.path.join(directory, name) for name in names)
+
+    def exists(self, stage, inputs, params):
+        return os.path.isdir(self.artifact_dir(stage, self.key(stage, inputs, params)))
+
+    def files(self, stage, inputs, params, names, build):
+        """
+        Paths of the artifact's output files (one per name), calling
+        build(*tmp_paths) to write them only when the artifact is missing
+        """
+        directory = self.artifact_dir(stage, self.key(stage, inputs, params))
+        if os.path.isdir(directory):
+            self.hits += 1
+        else:
+            tmp = f"{directory}.{uuid.uuid4().hex}.tmp"
+            os.makedirs(tmp)
+            try:
+                build(*[os.path.join(tmp, name) for name in names])
+                with open(os.path.join(tmp, META_NAME), "w") as f:
+                    json.dump({"stage": stage, "inputs": [self.fingerprint(item) for item in inputs],
+                               "params": params or {}}, f, indent=1, sort_keys=True, default=json_default)
+                try:
+                    os.replace(tmp, directory)
+                except OSError:
+                    # Built concurrently by another run; keep theirs
+                    if not os.path.isdir(directory):
+                        raise
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            self.builds += 1
+        return tuple(os.path.join(directory, name) for name in names)
+
+    def array(self, stage, inputs, params, build):
+        """
+        (memory-mapped array, meta dict) for an array artifact; build() returns
+        (array, JSON-able meta) and runs only when the artifact is missing
+        """
+        array_path, = self.files(stage, inputs, params, (ARRAY_NAME,),
+                                 lambda path: save_array(path, *build()))
+        return load_array(array_path)
+
+    def stats(self):
+        return {"root": self.root, "hits": self.hits, "builds": self.builds}
@@ -0,0 +1,123 @@
+"""
+GWP Model Attributions
+Channel-wise occlusion attributions for the notebook's map model (the 32x32
+patch CNN behind dharwad_gwp_map.tif; a U-Net works too). For each tile,
+the tile and all of its occluded variants (one input band zeroed over one
+block) are stacked into a single batch, so a tile costs ONE batched forward
+pass instead of one model.predict per block. The attribution of a band at a
+pixel is the drop in the probability of that pixel's predicted class when the
+band is occluded over the pixel's block.
+
+The per-pixel (H, W, 4) attribution raster is resampled onto the class
+raster grid and stored like the feature cube (float16 .npy + JSON sidecar),
+so the backend serves real model contributions with one memory-mapped read.
+Only NumPy is needed here; `predict` is any callable such as
+lambda x: gwp_model.predict(x, batch_size=64, verbose=0), which runs on CPU.
+
+Build from the notebook (requires rasterio):
+    attr = np.lib.format.open_memmap("attr_utm.npy", "w+", np.float32, stack.shape)
+    attribution_raster(predict, stack, attr, tile_size=32)
+    export_attribution_raster("dharwad_gwp_attribution.npy", attr, tform, src8.crs,
+                              "dharwad_gwp_classes.npy")
+"""
+
+import numpy as np
+
+from gwp_features import export_feature_cube
+
+# Input bands of the model, in the notebook's stack order
+ATTRIBUTION_BANDS = ("dem", "ndvi", "ndwi", "rain")
+
+DEFAULT_TILE_SIZE = 128
+DEFAULT_OCCLUSION_SIZE = 16
+
+
+def occluded_variants(tile, occ_size=DEFAULT_OCCLUSION_SIZE, fill=0.0):
+    """
+    (1 + blocks * bands, h, w, bands) batch: the tile itself, then for every
+    block and band a copy with that band set to `fill` inside the block.
+    Returns the batch and the block origins.
+    """
+    h, w, c = tile.shape
+    blocks = [(i, j) for i in range(0, h, occ_size) for j in range(0, w, occ_size)]
+    batch = np.repeat(np.asarray(tile, dtype=np.float32)[np.newaxis], 1 + len(blocks) * c, axis=0)
+    for b, (i, j) in enumerate(blocks):
+        for k in range(c):
+            batch[1 + b * c + k, i:i + occ_size, j:j + occ_size, k] = fill
+    return batch, blocks
+
+
+def tile_attributions(predict, tile, occ_size=DEFAULT_OCCLUSION_SIZE, fill=0.0):
+    """
+    (h, w, bands) attributions for one tile from a single batched forward pass.
+    predict maps (N, h, w, bands) to per-pixel class probabilities (N, h, w, K),
+    as the U-Net does, or to one prediction per sample (N, K) for a patch CNN.
+    """
+    h, w, c = tile.shape
+    batch, blocks = occluded_variants(tile, occ_size, fill)
+    probs = np.asarray(predict(batch), dtype=np.float32)
+    if probs.ndim == 2:
+        probs = np.broadcast_to(probs[:, None, None, :], (len(batch), h, w, probs.shape[-1]))
+
+    # Probability of each pixel's (unoccluded) predicted class in every variant
+    target = probs[0].argmax(axis=-1)
+    p_target = np.take_along_axis(probs, target[None, :, :, None], axis=-1)[..., 0]
+    drop = p_target[0] - p_target[1:]
+
+    out = np.empty((h, w, c), dtype=np.float32)
+    for b, (i, j) in enumerate(blocks):
+        for k in range(c):
+            out[i:i + occ_size, j:j + occ_size, k] = drop[b * c + k, i:i + occ_size, j:j + occ_size].mean()
+    return out
+
+
+def attribution_raster(predict, stack, out, tile_size=DEFAULT_TILE_SIZE, occ_size=DEFAULT_OCCLUSION_SIZE,
+                       fill=0.0):
+    """
+    Fill `out` (H, W, bands), e.g. a .npy memmap, with tile attributions over a
+    whole (H, W, bands) input stack: one batched forward pass per tile. Edge
+    tiles are shifted back inside the raster so every tile has the model's
+    input size; pixels with no-data (NaN) inputs get NaN.
+    """
+    height, width, _ = stack.shape
+    for i in range(0, height, tile_size):
+        for j in range(0, width, tile_size):
+            i0 = max(min(i, height - tile_size), 0)
+            j0 = max(min(j, width - tile_size), 0)
+            tile = np.asarray(stack[i0:i0 + tile_size, j0:j0 + tile_size], dtype=np.float32)
+            valid = np.isfinite(tile).all(axis=-1)
+            if not valid.any():
+                out[i0:i0 + tile_size, j0:j0 + tile_size] = np.nan
+                continue
+            attr = tile_attributions(predict, np.nan_to_num(tile), occ_size, fill)
+            attr[~valid] = np.nan
+            out[i0:i0 + tile_size, j0:j0 + tile_size] = attr
+    return out
+
+
+def export_attribution_raster(npy_path, attributions, src_transform, src_crs, class_npy_path):
+    """Resample an (H, W, bands) attribution raster onto the class raster grid (float16 .npy + sidecar)"""
+    bands = {name: attributions[:, :, k] for k, name in enumerate(ATTRIBUTION_BANDS)}
+    export_feature_cube(npy_path, bands, src_transform, src_crs, class_npy_path, band_names=ATTRIBUTION_BANDS)
+
+
+def attribution_summary(values, bands=ATTRIBUTION_BANDS):
+    """
+    Per-band contributions at one pixel, as served by /api/predict: the
+    probability drop, its share of the total absolute drop, and its direction
+    """
+    values = np.asarray(values, dtype=np.float64)
+    total = np.abs(values).sum()
+    shares = np.abs(values) / total * 100 if total > 0 else np.full(len(values), 100 / len(values))
+    return {
+        "method": "Channel-wise occlusion on the patch CNN (drop in predicted-class probability)",
+        "bands": {
+            name: {
+                "contribution": round(float(v), 4),
+                "importance_percentage": round(float(share), 1),
+                "impact": "supports prediction" if v > 0 else ("opposes prediction" if v < 0 else "none")
+            }
+            for name, v, share in zip(bands, values, shares)
+        },
+        "primary_factor": bands[int(np.abs(values).argmax())]
+    }
@@ -0,0 +1,147 @@
+"""
+GWP Feature Cube
+Real NDVI / NDWI / DEM values from the notebook (ndvi_clip, ndwi_clip,
+dem_clip), resampled onto the class raster's lon/lat grid and stored as one
+pixel-interleaved float16 (H, W, 3) .npy with a JSON sidecar. The backend
+opens it memory-mapped, so a point costs one 6-byte indexed read and a
+batch is a single vectorized gather.
+
+float16 keeps NDVI/NDWI to ~0.001 and elevation to 0.5 m, which is finer
+than the parameters are reported at. No-data pixels are NaN.
+
+Export from the notebook after the class raster (requires rasterio):
+    export_feature_cube("dharwad_gwp_features.npy", {"ndvi": ndvi_clip, ...},
+                        tform, src8.crs, "dharwad_gwp_classes.npy")
+"""
+
+import json
+
+import numpy as np
+
+from gwp_raster import NODATA, array_path, new_version_path, publish_npy, sidecar_path
+
+FEATURE_BANDS = ("ndvi", "ndwi", "dem")
+
+
+class FeatureCube:
+    """(H, W, len(FEATURE_BANDS)) float16 feature raster with an affine lon/lat transform"""
+
+    def __init__(self, values, transform, bands=FEATURE_BANDS, source_path=None):
+        self.values = values
+        self.transform = tuple(float(v) for v in transform)
+        self.bands = tuple(bands)
+        self.source_path = source_path
+
+    @classmethod
+    def from_npy(cls, path):
+        """Open a feature cube memory-mapped, with transform/bands from its JSON sidecar"""
+        with open(sidecar_path(path)) as f:
+            meta = json.load(f)
+        values = np.load(array_path(path, meta), mmap_mode="r")
+        bands = tuple(meta.get("bands", FEATURE_BANDS))
+        if values.ndim != 3 or values.shape[2] != len(bands):
+            raise ValueError(f"{path} is not an (H, W, {len(bands)}) feature cube")
+        return cls(values, meta["transform"], bands, source_path=path)
+
+    @property
+    def shape(self):
+        return self.values.shape[:2]
+
+    @property
+    def memory_mapped(self):
+        return isinstance(self.values, np.memmap)
+
+    def pixel_indices(self, lats, lons):
+        """(rows, cols, outside) pixel indices for lat/lon arrays; the far edge is inside"""
+        a, _, c, _, e, f = self.transform
+        height, width = self.shape
+        row_f = (np.asarray(lats, dtype=np.float64) - f) / e
+        col_f = (np.asarray(lons, dtype=np.float64) - c) / a
+        outside = (row_f < 0) | (row_f > height) | (col_f < 0) | (col_f > width)
+        rows = np.clip(np.floor(row_f).astype(np.int64), 0, height - 1)
+        cols = np.clip(np.floor(col_f).astype(np.int64), 0, width - 1)
+        return rows, cols, outside
+
+    def sample(self, lats, lons):
+        """(N, bands) float32 feature values per point; NaN outside the extent or on no-data"""
+        rows, cols, outside = self.pixel_indices(lats, lons)
+        values = np.asarray(self.values[rows, cols], dtype=np.float32)
+        values[outside] = np.nan
+        return values
+
+    def band_means(self, block_rows=1024):
+        """Per-band NaN-aware means over the whole cube, scanned in row blocks"""
+        sums = np.zeros(len(self.bands))
+        counts = np.zeros(len(self.bands))
+        for r0 in range(0, self.shape[0], block_rows):
+            block = np.asarray(self.values[r0:r0 + block_rows], dtype=np.float64)
+            valid = np.isfinite(block)
+            sums += np.where(valid, block, 0).sum(axis=(0, 1))
+            counts += valid.sum(axis=(0, 1))
+        with np.errstate(invalid="ignore"):
+            return sums / counts
+
+    def span_means(self, rows, col_start, col_end, block_pixels=1 << 20):
+        """
+        Per-band NaN-aware means over row spans (e.g. a rasterized polygon on
+        this grid). Spans are gathered in batches of about block_pixels pixels
+        and only their sums and counts are kept, so memory stays bounded.
+        """
+        sums = np.zeros(len(self.bands))
+        counts = np.zeros(len(self.bands))
+        lengths = col_end - col_start
+        batch = np.cumsum(lengths) // block_pixels
+        bounds = np.append(np.flatnonzero(np.diff(batch, prepend=-1)), len(lengths))
+        for s0, s1 in zip(bounds[:-1], bounds[1:]):
+            span_lengths = lengths[s0:s1]
+            pixel_rows = np.repeat(rows[s0:s1], span_lengths)
+            pixel_cols = (np.repeat(col_start[s0:s1] - np.cumsum(span_lengths) + span_lengths, span_lengths)
+                          + np.arange(span_lengths.sum()))
+            block = np.asarray(self.values[pixel_rows, pixel_cols], dtype=np.float64)
+            valid = np.isfinite(block)
+            sums += np.where(valid, block, 0).sum(axis=0)
+            counts += valid.sum(axis=0)
+        with np.errstate(invalid="ignore"):
+            return sums / counts
+
+
+def export_feature_cube(npy_path, bands, src_transform, src_crs, class_npy_path, band_names=FEATURE_BANDS):
+    """
+    Resample the notebook's feature arrays (dict of band name -> 2-D array on
+    src_transform / src_crs) onto the grid of an exported class raster
+    (bilinear), and save them as a float16 feature cube + sidecar. Pixels that
+    are no-data in the class raster become NaN.
+    """
+    from affine import Affine
+    from rasterio.warp import Resampling, reproject
+
+    with open(sidecar_path(class_npy_path)) as f:
+        meta = json.load(f)
+    height, width = meta["shape"]
+    dst_transform = Affine(*meta["transform"])
+    classes = np.load(array_path(class_npy_path, meta), mmap_mode="r")
+
+    data_path = new_version_path(npy_path)
+    cube = np.lib.format.open_memmap(data_path, mode="w+", dtype=np.float16,
+                                     shape=(height, width, len(band_names)))
+    for k, name in enumerate(band_names):
+        band = np.full((height, width), np.nan, dtype=np.float32)
+        reproject(
+            source=np.asarray(bands[name], dtype=np.float32),
+            destination=band,
+            src_transform=src_transform,
+            src_crs=src_crs,
+            src_nodata=np.nan,
+            dst_transform=dst_transform,
+            dst_crs=meta.get("crs", "EPSG:4326"),
+            dst_nodata=np.nan,
+            resampling=Resampling.bilinear,
+        )
+        band[np.asarray(classes) == meta.get("nodata", NODATA)] = np.nan
+        cube[:, :, k] = band
+    cube.flush()
+    del cube
+
+    publish_npy(npy_path, data_path, meta["transform"], (height, width), nodata=None,
+                crs=meta.get("crs", "EPSG:4326"), bands=list(band_names), dtype="float16")
+    print(f"✅ Exported feature cube ({', '.join(band_names)}) -> {npy_path}")
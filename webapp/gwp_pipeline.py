@@ -0,0 +1,366 @@
+"""
+GWP Refresh Pipeline
+The notebook's chain from the Sentinel-2 bands to the published GWP map
+(cells 5-17) as a DAG of stages over the artifact cache:
+
+    B04, B08, B11 -> indices ---------------------------+
+    DEM tiles -> dem_merged -> dem_rs ------------------+-> clipped_stack
+    rainfall NetCDF -> rain_rs -------------------------+         |
+                                          model + scaling -> gwp_map -> publish
+
+A stage's artifact key covers its input files (by content hash), its
+upstream artifacts and its parameters, so a run re-executes exactly the
+stages downstream of what changed. A new acquisition changes B04/B08/B11:
+indices, clipped_stack and gwp_map are rebuilt, while the DEM merge /
+reprojection and the climatological rainfall grid are reused.
+The upstream stages use the same names, inputs and parameters as the
+notebook cells, so artifacts built interactively are reused here and back.
+
+gwp_map is incremental per tile: each tile's class map is stored under the
+hash of the model key and the tile's raw clipped inputs, and only tiles whose
+inputs changed go through the model. Inputs are min-max scaled with the
+training ranges saved with the model (not re-normalized per scene, which would
+shift every pixel of every tile), so the key of an unchanged tile is stable.
+
+publish() converts the map into the backend's versioned .npy class raster,
+feature cube and (if one is served) tile pyramid; a running backend swaps
+them in within MAP_REFRESH_SECONDS.
+
+Monthly refresh from the notebook, after training (requires rasterio):
+    save_patch_model(MODEL_PATH, gwp_model, gwp_scaling)      # once, after training
+    gwp_model, gwp_scaling = load_patch_model(MODEL_PATH)
+    pipeline = gwp_pipeline(cache, B04, B08, B11, dem_tiles, RAIN_NC, dh.geometry, district_key,
+                            patch_classifier(gwp_model, gwp_scaling, patch=32),
+                            model_key(gwp_model, gwp_scaling))
+    outputs = pipeline.run()
+    publish(outputs, os.path.join(OUT_DIR, "dharwad_gwp_classes.npy"),
+            os.path.join(OUT_DIR, "dharwad_gwp_features.npy"), os.path.join(OUT_DIR, "dharwad_gwp_pyramid"))
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import namedtuple
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.enums import Resampling
+
+from gwp_artifacts import load_array, save_array
+from gwp_attribution import ATTRIBUTION_BANDS
+from gwp_features import FEATURE_BANDS, export_feature_cube
+from gwp_preprocess import (EPS, ShapeClip, compute_spectral_indices, merge_rasters, normalize, rainfall_to_grid,
+                            raster_grid, tiled_profile, warp_to_grid)
+from gwp_pyramid import MANIFEST_NAME, build_pyramid
+from gwp_raster import NODATA, ClassRaster, array_path, export_geotiff, sidecar_path
+
+# Layers of the clipped stack (cell 12) and of the model input (cell 14)
+CLIPPED_BANDS = ("ndvi", "ndwi", "dem", "rain")
+MODEL_BANDS = ATTRIBUTION_BANDS
+MODEL_BAND_INDEX = [CLIPPED_BANDS.index(band) for band in MODEL_BANDS]
+
+# Pixels per side of a prediction tile; a multiple of the model's patch size
+DEFAULT_TILE_SIZE = 512
+
+# Stored map tiles not used by any run for this long are pruned; other models
+# and districts keep theirs across a few monthly refreshes
+TILE_RETENTION_DAYS = 120
+
+# Processing block size of the indices stage, as in the notebook
+INDEX_BLOCK_SIZE = 1024
+
+# A pipeline step: output file names written by build(inputs, *paths), where
+# inputs maps each dependency to its value (source paths or upstream outputs)
+Stage = namedtuple("Stage", ("name", "deps", "outputs", "build", "params"))
+
+
+class Pipeline:
+    """Stages run in dependency order, each reused from the cache while its key is unchanged"""
+
+    def __init__(self, cache, sources, stages):
+        self.cache = cache
+        # Source name -> file path, list of paths, or None for an absent optional input
+        self.sources = dict(sources)
+        self.stages = {stage.name: stage for stage in stages}
+        self.report = []
+
+    def order(self):
+        """Stage names in dependency order"""
+        order, state = [], {}
+
+        def visit(name):
+            if name in self.sources or state.get(name) == "done":
+                return
+            if name not in self.stages:
+                raise KeyError(f"Unknown pipeline input {name!r}")
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline cycle through {name!r}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _inputs(self, stage, outputs):
+        """(flat input list for the artifact key, dependency name -> value for build)"""
+        values = {dep: outputs[dep] if dep in outputs else self.sources[dep] for dep in stage.deps}
+        flat = []
+        for dep in stage.deps:
+            value = values[dep]
+            flat.extend(value if isinstance(value, (list, tuple)) else [value])
+        return flat, values
+
+    def plan(self):
+        """Stage name -> True if a run would rebuild it (nothing is built)"""
+        outputs, plan = {}, {}
+        for name in self.order():
+            stage = self.stages[name]
+            flat, _ = self._inputs(stage, outputs)
+            plan[name] = not self.cache.exists(name, flat, stage.params)
+            outputs[name] = self.cache.paths(name, flat, stage.params, stage.outputs)
+        return plan
+
+    def run(self):
+        """Build or reuse every stage; returns stage name -> output paths"""
+        outputs, self.report = {}, []
+        for name in self.order():
+            stage = self.stages[name]
+            flat, values = self._inputs(stage, outputs)
+            built = not self.cache.exists(name, flat, stage.params)
+            started = time.perf_counter()
+            outputs[name] = self.cache.files(name, flat, stage.params, stage.outputs,
+                                             lambda *paths: stage.build(values, *paths))
+            seconds = time.perf_counter() - started
+            self.report.append({"stage": name, "built": built, "seconds": round(seconds, 2)})
+            print(f"{name}: {f'built in {seconds:.1f} s' if built else 'reused'}")
+        return outputs
+
+
+class TileStore:
+    """Per-tile model outputs stored under the hash of (model key, tile inputs)"""
+
+    def __init__(self, root, retention_days=TILE_RETENTION_DAYS):
+        self.root = os.path.abspath(root)
+        self.retention_days = retention_days
+        os.makedirs(self.root, exist_ok=True)
+        self.last_run = {}
+
+    def key(self, model_id, tile):
+        digest = hashlib.sha256(model_id.encode())
+        digest.update(json.dumps([tile.shape, tile.dtype.str]).encode())
+        digest.update(np.ascontiguousarray(tile).tobytes())
+        return digest.hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def predict(self, stack, predict_tile, model_id, tile_size=DEFAULT_TILE_SIZE, bands=None, outside=None):
+        """
+        (H, W) uint8 class map of an (H, W, bands) stack: predict_tile(tile) runs
+        only for tiles with no stored output. bands selects and orders the
+        stack's channels for the model; pixels where the `outside` mask is True
+        are set to NODATA, and tiles entirely outside are never predicted.
+        Reused tiles are touched, and tiles unused for retention_days pruned.
+        """
+        height, width, _ = stack.shape
+        out = np.zeros((height, width), dtype=np.uint8)
+        tiles, predicted = 0, 0
+        for i in range(0, height, tile_size):
+            for j in range(0, width, tile_size):
+                if outside is not None and outside[i:i + tile_size, j:j + tile_size].all():
+                    out[i:i + tile_size, j:j + tile_size] = NODATA
+                    continue
+                tile = np.asarray(stack[i:i + tile_size, j:j + tile_size], dtype=np.float32)
+                if bands is not None:
+                    tile = tile[..., bands]
+                tiles += 1
+                path = self.path(self.key(model_id, tile))
+                try:
+                    classes = np.load(path)
+                    os.utime(path)
+                except (OSError, ValueError):
+                    classes = np.asarray(predict_tile(tile), dtype=np.uint8)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.{uuid.uuid4().hex}.tmp.npy"
+                    np.save(tmp, classes)
+                    os.replace(tmp, path)
+                    predicted += 1
+                out[i:i + tile_size, j:j + tile_size] = classes
+        if outside is not None:
+            out[outside] = NODATA
+        self.prune()
+        self.last_run = {"tiles": tiles, "predicted": predicted, "reused": tiles - predicted}
+        return out
+
+    def prune(self):
+        """Remove tiles (and stale temporary files) last used more than retention_days ago"""
+        cutoff = time.time() - self.retention_days * 86400
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+def patch_classifier(model, scaling, patch=32, batch_size=64):
+    """
+    predict_tile for the notebook's patch CNN (cell 17) on raw MODEL_BANDS
+    tiles, min-max scaled with the training ranges (band -> (min, max)): one
+    class per full patch x patch block, 0 where no full patch fits, as in the
+    original reconstruction when the tile size is a multiple of the patch size
+    """
+    def predict_tile(tile):
+        tile = np.stack([normalize(tile[..., k], workers=1, bounds=scaling[band])
+                         for k, band in enumerate(MODEL_BANDS)], axis=-1)
+        height, width, _ = tile.shape
+        out = np.zeros((height, width), dtype=np.uint8)
+        origins = [(i, j) for i in range(0, height - patch + 1, patch) for j in range(0, width - patch + 1, patch)]
+        if not origins:
+            return out
+        batch = np.stack([tile[i:i + patch, j:j + patch] for i, j in origins]).astype(np.float32)
+        classes = np.argmax(model.predict(batch, batch_size=batch_size, verbose=0), axis=1)
+        for (i, j), cls in zip(origins, classes):
+            out[i:i + patch, j:j + patch] = cls
+        return out
+
+    return predict_tile
+
+
+def model_key(model, scaling):
+    """Hash of a Keras model's weights and input scaling: retraining invalidates the stored map tiles"""
+    digest = hashlib.sha256(json.dumps([scaling[band] for band in MODEL_BANDS]).encode())
+    for weights in model.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:24]
+
+
+def scaling_path(model_path):
+    return os.path.splitext(model_path)[0] + "_scaling.json"
+
+
+def save_patch_model(model_path, model, scaling):
+    """Save the patch CNN (.keras) with the training (min, max) of its input bands next to it"""
+    model.save(model_path)
+    with open(scaling_path(model_path), "w") as f:
+        json.dump({band: [float(v) for v in scaling[band]] for band in MODEL_BANDS}, f, indent=1)
+
+
+def load_patch_model(model_path):
+    """(model, scaling) saved by save_patch_model (requires TensorFlow)"""
+    from tensorflow import keras
+
+    with open(scaling_path(model_path)) as f:
+        scaling = json.load(f)
+    return keras.models.load_model(model_path), scaling
+
+
+def gwp_pipeline(cache, b04, b08, b11, dem_tiles, rain_nc, district_shapes, district_key, predict_tile, model_id,
+                 tile_size=DEFAULT_TILE_SIZE, eps=EPS, workers=None):
+    """
+    The refresh DAG for one district. rain_nc may be None or missing (rain is
+    then 0, as in the notebook); district_key identifies the district geometry
+    (the notebook's WKB hash); model_id is model_key(model, scaling).
+    """
+    with rasterio.open(b08) as src8:
+        grid = raster_grid(src8)
+    tiles = TileStore(os.path.join(cache.root, "tiles"))
+
+    def indices(inputs, ndvi_path, ndwi_path):
+        compute_spectral_indices(inputs["b04"], inputs["b08"], inputs["b11"], ndvi_path, ndwi_path,
+                                 block_size=INDEX_BLOCK_SIZE, eps=eps, workers=workers)
+
+    def dem_merged(inputs, dst_path):
+        merge_rasters(inputs["dem_tiles"], dst_path)
+
+    def dem_rs(inputs, dst_path):
+        warp_to_grid(inputs["dem_merged"][0], grid, dst_path, resampling=Resampling.bilinear, workers=workers)
+
+    def rain_rs(inputs, dst_path):
+        rainfall_to_grid(inputs["rain_nc"], grid, dst_path, resampling=Resampling.bilinear, workers=workers)
+
+    def clipped_stack(inputs, array_path):
+        clip = ShapeClip(district_shapes, grid)
+        ndvi_tif, ndwi_tif = inputs["indices"]
+        rain = inputs["rain_rs"]
+        layers = [clip.read(ndvi_tif), clip.read(ndwi_tif), clip.read(inputs["dem_rs"][0]),
+                  clip.read(rain[0]) if rain else np.zeros(clip.shape, dtype=np.float32)]
+        save_array(array_path, np.stack(layers, axis=-1), {"transform": list(clip.transform)[:6]})
+
+    def gwp_map(inputs, tif_path):
+        clipped, meta = load_array(inputs["clipped_stack"][0])
+        outside = ShapeClip(district_shapes, grid).outside
+        out_map = tiles.predict(clipped, predict_tile, model_id, tile_size, bands=MODEL_BAND_INDEX, outside=outside)
+        print(f"Map tiles: {tiles.last_run}")
+        profile = tiled_profile(grid, count=1, dtype="uint8", nodata=NODATA, height=out_map.shape[0],
+                                width=out_map.shape[1], transform=Affine(*meta["transform"]))
+        with rasterio.open(tif_path, "w", **profile) as dst:
+            dst.write(out_map, 1)
+
+    grid_params = {"grid": grid, "resampling": "bilinear"}
+    has_rain = bool(rain_nc) and os.path.exists(rain_nc)
+    stages = [
+        Stage("indices", ("b04", "b08", "b11"), ("ndvi.tif", "ndwi.tif"), indices,
+              {"eps": eps, "block_size": INDEX_BLOCK_SIZE}),
+        Stage("dem_merged", ("dem_tiles",), ("dem_merged.tif",), dem_merged, {}),
+        Stage("dem_rs", ("dem_merged",), ("dem_rs.tif",), dem_rs, grid_params),
+        Stage("clipped_stack", ("indices", "dem_rs", "rain_rs"), ("array.npy",), clipped_stack,
+              {"district_wkb_sha256": district_key, "grid": grid}),
+        Stage("gwp_map", ("clipped_stack",), ("dharwad_gwp_map.tif",), gwp_map,
+              {"model": model_id, "tile_size": tile_size, "nodata": NODATA}),
+    ]
+    sources = {"b04": b04, "b08": b08, "b11": b11, "dem_tiles": [p for p in dem_tiles if os.path.exists(p)]}
+    if has_rain:
+        sources["rain_nc"] = rain_nc
+        stages.append(Stage("rain_rs", ("rain_nc",), ("rain_rs.tif",), rain_rs, grid_params))
+    else:
+        sources["rain_rs"] = None
+    return Pipeline(cache, sources, stages)
+
+
+def _published(class_npy_path, source, pyramid_dir):
+    """True if the map artifact `source` is already the published class raster (and pyramid)"""
+    try:
+        with open(sidecar_path(class_npy_path)) as f:
+            if json.load(f).get("source") != source:
+                return False
+        if pyramid_dir:
+            with open(os.path.join(pyramid_dir, MANIFEST_NAME)) as f:
+                return json.load(f).get("source") == os.path.basename(array_path(class_npy_path))
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def publish(outputs, class_npy_path, features_npy_path=None, pyramid_dir=None):
+    """
+    Publish the run's gwp_map as the backend's class raster (and the clipped
+    NDVI/NDWI/DEM as its feature cube), unless that map is already published.
+    The backend prefers a tile pyramid over the class raster, so when it
+    serves one, pass its pyramid_dir: a new pyramid version is built from the
+    published raster. Returns True if anything was published.
+    """
+    map_tif, = outputs["gwp_map"]
+    source = os.path.basename(os.path.dirname(map_tif))
+    if _published(class_npy_path, source, pyramid_dir):
+        return False
+
+    export_geotiff(map_tif, class_npy_path, source=source)
+    if features_npy_path:
+        with rasterio.open(map_tif) as src:
+            crs = src.crs
+        clipped, meta = load_array(outputs["clipped_stack"][0])
+        bands = {band: clipped[..., CLIPPED_BANDS.index(band)] for band in FEATURE_BANDS}
+        export_feature_cube(features_npy_path, bands, Affine(*meta["transform"]), crs, class_npy_path)
+    if pyramid_dir:
+        build_pyramid(ClassRaster.from_npy(class_npy_path), pyramid_dir)
+    return True
@@ -0,0 +1,415 @@
+"""
+GWP Preprocessing
+Windowed Sentinel-2 preprocessing for the notebook. Bands are read one
+aligned block at a time, NDVI / NDWI are computed in place in reused float32
+buffers and each block is written straight to a tiled GeoTIFF, so peak
+memory is a few block buffers however large the scene is. B11 (20 m) and the
+DEM are read through a WarpedVRT on the B08 (10 m) grid, which resamples only
+the source pixels under the current block instead of the whole raster.
+
+Blocks are independent, so they run on a thread pool: GDAL reads and warps
+and the NumPy ufuncs release the GIL. A block checks out one of `workers`
+sets of dataset handles (GDAL handles must not be used concurrently), and
+results are written by the calling thread in window order, so the output is
+identical for any number of workers.
+
+Clipping to the district is done in memory: the polygon mask and its
+bounding window are computed once on the shared grid and applied to every
+co-registered layer, read straight from disk for just that window.
+
+Run from the notebook (requires rasterio):
+    compute_spectral_indices(B04, B08, B11, "ndvi.tif", "ndwi.tif")
+    warp_to_grid(dem_merged, src8, "dem_rs.tif")
+    rainfall_to_grid(RAIN_NC, src8, "rain_rs.tif")
+    clip = ShapeClip(dh.geometry, src8)
+    ndvi_clip = clip.read("ndvi.tif")
+    dem_n = normalize(dem_clip)
+"""
+
+import contextlib
+import os
+import queue
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.io import MemoryFile
+from rasterio.merge import merge
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+from rasterio.windows import transform as window_transform
+
+# Rows/columns per processing block: 1024 x 1024 float32 is 4 MB per buffer
+DEFAULT_BLOCK_SIZE = 1024
+
+# Keeps the normalized difference finite where both bands are 0 (no-data)
+EPS = 1e-6
+
+# Internal tiling of the written rasters; processing blocks are a multiple of it
+TIFF_BLOCK_SIZE = 256
+
+# Target grid of a preprocessing run (any dataset with these attributes also works)
+Grid = namedtuple("Grid", ("crs", "transform", "height", "width"))
+
+
+def raster_grid(like):
+    return Grid(like.crs, like.transform, like.height, like.width)
+
+
+def worker_count(workers=None):
+    return workers or os.cpu_count() or 1
+
+
+def ordered_map(fn, items, workers=None, max_pending=None):
+    """
+    fn over items on a thread pool, yielding results in input order with at
+    most max_pending calls in flight (bounding the results held in memory)
+    """
+    workers = worker_count(workers)
+    if workers == 1:
+        yield from map(fn, items)
+        return
+    max_pending = max_pending or 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def block_windows(height, width, block_size=DEFAULT_BLOCK_SIZE):
+    """Row-major windows of at most block_size x block_size covering the raster"""
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(col, row, min(block_size, width - col), min(block_size, height - row))
+
+
+def same_grid(src, like):
+    return (src.crs == like.crs and src.transform == like.transform
+            and (src.height, src.width) == (like.height, like.width))
+
+
+def aligned(src, like, resampling=Resampling.bilinear):
+    """
+    src itself if it is on like's grid, else a float32 WarpedVRT of src on
+    like's grid (float32 so bilinear values are not rounded to the band's uint16)
+    """
+    if same_grid(src, like):
+        return src
+    return WarpedVRT(src, crs=like.crs, transform=like.transform, width=like.width,
+                     height=like.height, resampling=resampling, dtype="float32")
+
+
+def tiled_profile(like, **updates):
+    """Single-band float32 tiled, compressed GeoTIFF profile on like's grid"""
+    profile = {
+        "driver": "GTiff", "count": 1, "dtype": "float32", "nodata": None,
+        "crs": like.crs, "transform": like.transform, "height": like.height, "width": like.width,
+        "tiled": True, "blockxsize": TIFF_BLOCK_SIZE, "blockysize": TIFF_BLOCK_SIZE,
+        "compress": "lzw", "BIGTIFF": "IF_SAFER",
+    }
+    profile.update(updates)
+    return profile
+
+
+def normalized_difference(a, b, out, eps=EPS):
+    """(a - b) / (a + b + eps) written into out; b is overwritten as scratch, a is untouched"""
+    np.subtract(a, b, out=out)
+    b += a
+    b += eps
+    out /= b
+    return out
+
+
+class BlockBuffers:
+    """Reused flat float32 buffers handing out C-contiguous (h, w) views for each block"""
+
+    def __init__(self, names, block_size=DEFAULT_BLOCK_SIZE):
+        self._flat = {name: np.empty(block_size * block_size, dtype=np.float32) for name in names}
+
+    def view(self, name, window):
+        return self._flat[name][:window.height * window.width].reshape(window.height, window.width)
+
+
+class BlockHandles:
+    """One set of open, grid-aligned datasets with their block buffers"""
+
+    def __init__(self, paths, grid, block_size, resampling):
+        self._stack = contextlib.ExitStack()
+        self.datasets = {
+            name: self._stack.enter_context(aligned(self._stack.enter_context(rasterio.open(path)), grid,
+                                                    resampling))
+            for name, path in paths.items()
+        }
+        self.buffers = BlockBuffers(paths, block_size)
+
+    def read(self, name, window):
+        """float32 (h, w) block of a raster; the buffer is reused by the next read of name"""
+        return self.datasets[name].read(1, window=window, out=self.buffers.view(name, window))
+
+    def close(self):
+        self._stack.close()
+
+
+class BlockReader:
+    """
+    Named rasters read block by block on a common grid. Holds one set of
+    handles per worker, opened and closed by the calling thread; a block
+    function checks a set out for the duration of the block.
+    """
+
+    def __init__(self, paths, grid, block_size=DEFAULT_BLOCK_SIZE, resampling=Resampling.bilinear, workers=None):
+        grid = raster_grid(grid)
+        self._all = []
+        self._idle = queue.SimpleQueue()
+        try:
+            for _ in range(worker_count(workers)):
+                handles = BlockHandles(paths, grid, block_size, resampling)
+                self._all.append(handles)
+                self._idle.put(handles)
+        except Exception:
+            self.close()
+            raise
+
+    @contextlib.contextmanager
+    def checkout(self):
+        handles = self._idle.get()
+        try:
+            yield handles
+        finally:
+            self._idle.put(handles)
+
+    def close(self):
+        for handles in self._all:
+            handles.close()
+        self._all = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def stream_to_rasters(block_fn, grid, dst_paths, block_size=DEFAULT_BLOCK_SIZE, workers=None):
+    """
+    Run block_fn(window) -> one float32 block per output over every window of
+    the grid on a thread pool, writing the blocks to tiled GeoTIFFs in window
+    order. Returns the output profile.
+    """
+    if block_size % TIFF_BLOCK_SIZE:
+        raise ValueError(f"block_size must be a multiple of {TIFF_BLOCK_SIZE}")
+    profile = tiled_profile(grid)
+    with contextlib.ExitStack() as stack:
+        dsts = [stack.enter_context(rasterio.open(path, "w", **profile)) for path in dst_paths]
+        windows = block_windows(grid.height, grid.width, block_size)
+        for window, blocks in ordered_map(lambda w: (w, block_fn(w)), windows, workers):
+            for dst, block in zip(dsts, blocks):
+                dst.write(block, 1, window=window)
+    return profile
+
+
+def compute_spectral_indices(b04_path, b08_path, b11_path, ndvi_path, ndwi_path,
+                             block_size=DEFAULT_BLOCK_SIZE, eps=EPS, workers=None):
+    """
+    Stream NDVI = (B08 - B04) / (B08 + B04) and NDWI = (B08 - B11) / (B08 + B11)
+    block by block into tiled GeoTIFFs on the B08 grid, `workers` blocks at a
+    time (default: one per CPU). Returns the output profile (B08's CRS,
+    transform and shape).
+    """
+    with rasterio.open(b08_path) as src8:
+        grid = raster_grid(src8)
+    paths = {"b4": b04_path, "b8": b08_path, "b11": b11_path}
+
+    with BlockReader(paths, grid, block_size, workers=workers) as reader:
+        def indices(window):
+            with reader.checkout() as bands:
+                b8 = bands.read("b8", window)
+                ndvi = normalized_difference(b8, bands.read("b4", window), np.empty_like(b8), eps)
+                ndwi = normalized_difference(b8, bands.read("b11", window), np.empty_like(b8), eps)
+            return ndvi, ndwi
+
+        return stream_to_rasters(indices, grid, (ndvi_path, ndwi_path), block_size, workers)
+
+
+def warp_to_grid(src_path, grid, dst_path, resampling=Resampling.bilinear, block_size=DEFAULT_BLOCK_SIZE,
+                 workers=None):
+    """
+    Reproject a raster (e.g. the merged DEM) onto grid block by block into a
+    tiled float32 GeoTIFF. GDAL approximates the coordinate transform per
+    block (within 0.125 px, as reproject does per scene), so values can differ
+    slightly from a whole-scene reproject but never with the worker count.
+    """
+    with BlockReader({"src": src_path}, grid, block_size, resampling, workers) as reader:
+        def warped(window):
+            with reader.checkout() as handles:
+                return handles.read("src", window).copy(),
+
+        return stream_to_rasters(warped, raster_grid(grid), (dst_path,), block_size, workers)
+
+
+def merge_rasters(paths, dst_path):
+    """Mosaic rasters (the SRTM DEM tiles) into one GeoTIFF with the first one's profile"""
+    with contextlib.ExitStack() as stack:
+        srcs = [stack.enter_context(rasterio.open(path)) for path in paths]
+        if not srcs:
+            raise FileNotFoundError("DEM files not found.")
+        mosaic, transform = merge(srcs)
+        meta = srcs[0].meta.copy()
+        meta.update({"driver": "GTiff", "height": mosaic.shape[1], "width": mosaic.shape[2], "transform": transform})
+        with rasterio.open(dst_path, "w", **meta) as dst:
+            dst.write(mosaic)
+
+
+def rainfall_grid(nc_path):
+    """
+    (rain array, lon/lat transform or None) from a rainfall NetCDF: the first
+    rainfall-like variable (first time step), on a grid inferred from its
+    lat/lon variables. Requires netCDF4.
+    """
+    from netCDF4 import Dataset
+
+    with Dataset(nc_path) as ds:
+        varname = next((v for v in ds.variables
+                        if 'rf' in v.lower() or 'rain' in v.lower() or 'prec' in v.lower()),
+                       list(ds.variables.keys())[-1])
+        rain_var = ds.variables[varname][:]
+        rain_arr = np.array(rain_var[0, :, :] if rain_var.ndim == 3 else rain_var, dtype=np.float32)
+        lats = lons = None
+        for name in ds.variables:
+            if 'lat' in name.lower():
+                lats = ds.variables[name][:]
+            if 'lon' in name.lower():
+                lons = ds.variables[name][:]
+    if lats is None or lons is None:
+        return rain_arr, None
+    lat_res = (lats.max() - lats.min()) / (len(lats) - 1)
+    lon_res = (lons.max() - lons.min()) / (len(lons) - 1)
+    transform = from_origin(lons.min() - 0.5 * lon_res, lats.max() + 0.5 * lat_res, lon_res, lat_res)
+    return rain_arr, transform
+
+
+def rainfall_to_grid(nc_path, grid, dst_path, resampling=Resampling.bilinear, block_size=DEFAULT_BLOCK_SIZE,
+                     workers=None):
+    """
+    Resample the NetCDF rainfall grid (EPSG:4326) onto grid into a tiled
+    GeoTIFF, through an in-memory GeoTIFF instead of rain_temp.tif on disk
+    """
+    rain_arr, transform = rainfall_grid(nc_path)
+    if transform is None:
+        raise ValueError(f"No lat/lon variables in {nc_path}")
+    profile = {"driver": "GTiff", "height": rain_arr.shape[0], "width": rain_arr.shape[1], "count": 1,
+               "dtype": "float32", "crs": "EPSG:4326", "transform": transform}
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(rain_arr, 1)
+        return warp_to_grid(memfile.name, grid, dst_path, resampling, block_size, workers)
+
+
+class ShapeClip:
+    """
+    Bounding window and polygon mask of shapes on a grid, as rasterio.mask.mask
+    with crop=True computes them, built once (one rasterization) and applied
+    to any number of co-registered layers. Pixels outside the shapes are set
+    to `fill` (mask's default of the nodata value, else 0).
+    """
+
+    def __init__(self, shapes, grid, all_touched=False, fill=None):
+        nodata = getattr(grid, "nodata", None)
+        grid = raster_grid(grid)
+        shapes = list(shapes)
+        self.window = geometry_window(grid, shapes)
+        self.transform = window_transform(self.window, grid.transform)
+        self.shape = (int(self.window.height), int(self.window.width))
+        self.outside = geometry_mask(shapes, out_shape=self.shape, transform=self.transform,
+                                     all_touched=all_touched)
+        self.fill = fill if fill is not None else (nodata or 0)
+
+    @property
+    def slices(self):
+        (row_start, row_stop), (col_start, col_stop) = self.window.toranges()
+        return slice(int(row_start), int(row_stop)), slice(int(col_start), int(col_stop))
+
+    def _masked(self, clipped, fill):
+        clipped[self.outside] = self.fill if fill is None else fill
+        return clipped
+
+    def apply(self, arr, fill=None):
+        """Clip a full-grid array: a view of the window, copied once as float32, masked"""
+        return self._masked(np.array(arr[self.slices], dtype=np.float32), fill)
+
+    def read(self, path, fill=None):
+        """Clip a full-grid raster file, reading only the window"""
+        with rasterio.open(path) as src:
+            return self._masked(src.read(1, window=self.window, out_dtype="float32"), fill)
+
+
+def clip_arrays_to_shape(arrays, shapes, grid, fill=None):
+    """Clip several co-registered arrays with one ShapeClip; returns (clipped list, transform)"""
+    clip = ShapeClip(shapes, grid, fill=fill)
+    return [clip.apply(arr) for arr in arrays], clip.transform
+
+
+def _finite_range(block):
+    """(min, max) of a float32 block's finite values; non-finite values are set to NaN in place"""
+    block[~np.isfinite(block)] = np.nan
+    return np.fmin.reduce(block, axis=None), np.fmax.reduce(block, axis=None)
+
+
+def _combined_range(ranges):
+    ranges = np.array(list(ranges), dtype=np.float32).reshape(-1, 2)
+    if not len(ranges):
+        return float("nan"), float("nan")
+    return float(np.fmin.reduce(ranges[:, 0])), float(np.fmax.reduce(ranges[:, 1]))
+
+
+def value_range(a, workers=None, block_rows=DEFAULT_BLOCK_SIZE):
+    """
+    (min, max) of the finite values of a, as floats (NaN if there are none):
+    the range normalize() scales by, to be stored with a model trained on it
+    """
+    rows = [slice(row, row + block_rows) for row in range(0, len(a), block_rows)]
+    return _combined_range(ordered_map(lambda span: _finite_range(np.array(a[span], dtype=np.float32)),
+                                       rows, workers))
+
+
+def normalize(a, workers=None, block_rows=DEFAULT_BLOCK_SIZE, bounds=None):
+    """
+    The notebook's norm(): min-max scaling of a float32 copy to [0, 1], with
+    non-finite values as NaN. Two passes over row blocks on a thread pool:
+    per-block min/max (NaN-ignoring), then in-place scaling. bounds (min, max),
+    e.g. a training value_range(), scales by a fixed range instead of a's own.
+    """
+    out = np.array(a, dtype=np.float32)
+    rows = [slice(row, row + block_rows) for row in range(0, len(out), block_rows)]
+
+    ranges = list(ordered_map(lambda span: _finite_range(out[span]), rows, workers))
+    amin, amax = (np.float32(v) for v in (bounds if bounds is not None else _combined_range(ranges)))
+    if amax - amin < 1e-8:
+        return np.zeros_like(out)
+    scale = amax - amin + 1e-9
+
+    def scale_block(span):
+        block = out[span]
+        block -= amin
+        block /= scale
+
+    for _ in ordered_map(scale_block, rows, workers):
+        pass
+    return out
+
+
+def read_overview(path, max_size=1024):
+    """Decimated float32 read of band 1 (for plots), at most max_size pixels on a side"""
+    with rasterio.open(path) as src:
+        scale = max(src.height, src.width) / max_size
+        shape = (max(1, int(src.height / scale)), max(1, int(src.width / scale))) if scale > 1 else src.shape
+        return src.read(1, out_shape=shape, out_dtype="float32")
@@ -0,0 +1,369 @@
+"""
+GWP Tile Pyramid
+Tiled, multi-resolution store for the GWP class raster. Every level is a
+memory-mapped (n_tiles_y, n_tiles_x, T, T) uint8 array, so a point query
+touches a single T x T tile and never the whole raster. Level k+1 halves
+level k by majority vote over 2x2 pixel blocks; every level also keeps exact
+per-tile class pixel counts and ground areas (km²) aggregated from full
+resolution, so district-wide statistics come from a handful of numbers.
+
+Layout of a pyramid directory:
+    pyramid.json          tile size, per-level shape / transform, nodata, crs,
+                          and the version directory ("data") holding the levels
+    <version>/level_<k>.npy         tiles of level k
+    <version>/level_<k>_hist.npy    (n_tiles_y, n_tiles_x, 3) int64 pixel counts per class
+    <version>/level_<k>_area.npy    (n_tiles_y, n_tiles_x, 3) float64 area (km²) per class
+    <version>/level_0_sat.npy       per-class summed-area table of the full-resolution raster
+
+A rebuild writes a new version directory and then replaces the manifest, so
+a running backend keeps serving the previous version until it reopens, as
+with the versioned class raster.
+
+Build one from an exported class raster:
+    python gwp_pyramid.py build dharwad_gwp_classes.npy dharwad_gwp_pyramid
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from gwp_raster import (ClassRaster, GWP_CLASS_NAMES, NODATA, KM_PER_DEG_LAT,
+                        build_integral, circle_counts, circle_window_counts, rect_counts,
+                        replaced_memmap, row_pixel_area_km2, sample_grid, save_npy, temp_path)
+
+DEFAULT_TILE_SIZE = 256
+MANIFEST_NAME = "pyramid.json"
+VERSION_DIR = re.compile(r"v[0-9a-f]+$")
+
+# Area queries read the finest level whose circle fits in this many pixels across
+MAX_WINDOW_PIXELS = 512
+
+
+def _level_file(root, level, suffix=""):
+    return os.path.join(root, f"level_{level}{suffix}.npy")
+
+
+def majority_downsample(block, nodata=NODATA):
+    """Halve a (2h, 2w) class block by majority vote; ties go to the lower class"""
+    n_classes = len(GWP_CLASS_NAMES)
+    h, w = block.shape[0] // 2, block.shape[1] // 2
+    quads = block.reshape(h, 2, w, 2)
+
+    votes = np.stack([np.count_nonzero(quads == k, axis=(1, 3)) for k in range(n_classes)])
+    out = votes.argmax(axis=0).astype(np.uint8)
+    out[votes.sum(axis=0) == 0] = nodata
+    return out
+
+
+def _tile_strip(strip, n_tx, tile, fill):
+    """Pad a (rows, cols) strip to (tile, n_tx * tile) and split it into (n_tx, tile, tile) tiles"""
+    padded = np.full((tile, n_tx * tile), fill, dtype=strip.dtype)
+    padded[:strip.shape[0], :strip.shape[1]] = strip
+    return padded.reshape(tile, n_tx, tile).transpose(1, 0, 2)
+
+
+def _sum_children(grid):
+    """Aggregate a (n_ty, n_tx, ...) per-tile grid into its parent level (2x2 tiles -> 1)"""
+    n_ty, n_tx = grid.shape[:2]
+    padded = np.zeros(((n_ty + 1) // 2 * 2, (n_tx + 1) // 2 * 2) + grid.shape[2:], dtype=grid.dtype)
+    padded[:n_ty, :n_tx] = grid
+    return padded[0::2, 0::2] + padded[1::2, 0::2] + padded[0::2, 1::2] + padded[1::2, 1::2]
+
+
+def build_pyramid(raster, out_dir, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Write a tile pyramid for a ClassRaster into a new version directory of
+    out_dir. Levels are built one tile row at a time through memmaps, so memory
+    stays at a few tile strips regardless of the raster size. Every file is
+    written under a temporary name and renamed into place once complete, and
+    the manifest is replaced last, which publishes the new version; older
+    versions are then removed.
+    """
+    version = f"v{time.time_ns():x}"
+    root, out_dir = out_dir, os.path.join(out_dir, version)
+    os.makedirs(out_dir)
+    n_classes = len(GWP_CLASS_NAMES)
+    tile = int(tile_size)
+    a, b, c, d, e, f = raster.transform
+    row_areas = raster.row_pixel_area_km2()
+
+    # Level 0: full-resolution tiles plus exact per-tile counts and areas
+    height, width = raster.shape
+    n_ty, n_tx = -(-height // tile), -(-width // tile)
+    hist = np.zeros((n_ty, n_tx, n_classes), dtype=np.int64)
+    area = np.zeros((n_ty, n_tx, n_classes), dtype=np.float64)
+    with replaced_memmap(_level_file(out_dir, 0), np.uint8, (n_ty, n_tx, tile, tile)) as tiles:
+        for ty in range(n_ty):
+            r0 = ty * tile
+            strip = _tile_strip(raster.read_window(r0, r0 + tile, 0, width), n_tx, tile, raster.nodata)
+            tiles[ty] = strip
+            strip_areas = np.zeros(tile)
+            strip_areas[:min(tile, height - r0)] = row_areas[r0:r0 + tile]
+            for k in range(n_classes):
+                per_row = np.count_nonzero(strip == k, axis=2)
+                hist[ty, :, k] = per_row.sum(axis=1)
+                area[ty, :, k] = per_row @ strip_areas
+        del tiles
+
+    build_integral(raster.classes, out_path=_level_file(out_dir, 0, "_sat"))
+    save_npy(_level_file(out_dir, 0, "_hist"), hist)
+    save_npy(_level_file(out_dir, 0, "_area"), area)
+    levels = [{"shape": [height, width], "tiles": [n_ty, n_tx], "transform": [a, b, c, d, e, f]}]
+
+    # Overviews: halve until the whole level fits in one tile
+    level = 0
+    while n_ty > 1 or n_tx > 1:
+        prev, prev_tx = np.load(_level_file(out_dir, level), mmap_mode="r"), n_tx
+        height, width = -(-height // 2), -(-width // 2)
+        n_ty, n_tx = -(-height // tile), -(-width // tile)
+        level += 1
+
+        with replaced_memmap(_level_file(out_dir, level), np.uint8, (n_ty, n_tx, tile, tile)) as tiles:
+            for ty in range(n_ty):
+                # Two child tile rows -> one (2T, prev_tx * T) strip -> one tile row
+                children = np.full((2, prev_tx, tile, tile), raster.nodata, dtype=np.uint8)
+                child_rows = prev[2 * ty:2 * ty + 2]
+                children[:len(child_rows)] = child_rows
+                strip = children.transpose(0, 2, 1, 3).reshape(2 * tile, prev_tx * tile)
+                tiles[ty] = _tile_strip(majority_downsample(strip, raster.nodata), n_tx, tile, raster.nodata)
+            del tiles
+        del prev
+
+        hist, area = _sum_children(hist), _sum_children(area)
+        save_npy(_level_file(out_dir, level, "_hist"), hist)
+        save_npy(_level_file(out_dir, level, "_area"), area)
+        scale = 2 ** level
+        levels.append({"shape": [height, width], "tiles": [n_ty, n_tx],
+                       "transform": [a * scale, b, c, d, e * scale, f]})
+
+    manifest = {
+        "format_version": 1,
+        "tile_size": tile,
+        "nodata": raster.nodata,
+        "crs": "EPSG:4326",
+        "source": os.path.basename(raster.source_path) if raster.source_path else None,
+        "data": version,
+        "levels": levels,
+    }
+    manifest_path = os.path.join(root, MANIFEST_NAME)
+    tmp = temp_path(manifest_path)
+    with open(tmp, "w") as f_out:
+        json.dump(manifest, f_out, indent=2)
+    os.replace(tmp, manifest_path)
+    _remove_old_versions(root, version)
+
+    print(f"✅ Built {len(levels)}-level GWP pyramid ({tile}px tiles) in {out_dir}")
+    return manifest
+
+
+def _remove_old_versions(root, current):
+    """
+    Drop superseded version directories (and the level files of an unversioned
+    pyramid). Files some process still has mapped cannot be removed on
+    Windows; they are retried on the next build.
+    """
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if VERSION_DIR.match(name) and name != current and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.startswith("level_") and name.endswith(".npy"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class PyramidLevel:
+    """One memory-mapped level of a tile pyramid, readable like a ClassRaster"""
+
+    def __init__(self, tiles, shape, transform, nodata, hist, area):
+        self.tiles = tiles
+        self.shape = tuple(shape)
+        self.transform = tuple(float(v) for v in transform)
+        self.nodata = nodata
+        self.tile_size = tiles.shape[2]
+        self.hist = hist
+        self.area = area
+
+    def pixel_values(self, rows, cols):
+        """Classes at (row, col) pixel indices; each point reads only its own tile"""
+        t = self.tile_size
+        return np.asarray(self.tiles[rows // t, cols // t, rows % t, cols % t])
+
+    def read_window(self, r0, r1, c0, c1):
+        """Class pixels in rows [r0, r1) and columns [c0, c1), assembled from the tiles they overlap"""
+        t = self.tile_size
+        ty0, tx0 = r0 // t, c0 // t
+        block = np.asarray(self.tiles[ty0:(r1 - 1) // t + 1, tx0:(c1 - 1) // t + 1])
+        n_ty, n_tx = block.shape[:2]
+        mosaic = block.transpose(0, 2, 1, 3).reshape(n_ty * t, n_tx * t)
+        return mosaic[r0 - ty0 * t:r1 - ty0 * t, c0 - tx0 * t:c1 - tx0 * t]
+
+
+class GWPPyramid:
+    """
+    Tile pyramid with the ClassRaster query interface (sample, class_at,
+    class_histogram, window_counts), so the backend can use either store.
+    """
+
+    def __init__(self, root, manifest, levels, integral=None):
+        self.root = root
+        self.manifest = manifest
+        self.levels = levels
+        self._integral = integral
+        self.source_path = os.path.join(root, MANIFEST_NAME)
+
+    @classmethod
+    def open(cls, root):
+        """Open every level memory-mapped (nothing is read until a query touches a tile)"""
+        with open(os.path.join(root, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        nodata = manifest.get("nodata", NODATA)
+        # Pyramids built before versioning keep their levels next to the manifest
+        data = os.path.join(root, manifest.get("data", ""))
+        levels = [
+            PyramidLevel(np.load(_level_file(data, k), mmap_mode="r"), meta["shape"], meta["transform"],
+                         nodata, np.load(_level_file(data, k, "_hist")), np.load(_level_file(data, k, "_area")))
+            for k, meta in enumerate(manifest["levels"])
+        ]
+        sat_path = _level_file(data, 0, "_sat")
+        integral = np.load(sat_path, mmap_mode="r") if os.path.exists(sat_path) else None
+        return cls(root, manifest, levels, integral)
+
+    @property
+    def base(self):
+        return self.levels[0]
+
+    @property
+    def transform(self):
+        return self.base.transform
+
+    @property
+    def shape(self):
+        return self.base.shape
+
+    @property
+    def nodata(self):
+        return self.base.nodata
+
+    @property
+    def tile_size(self):
+        return self.base.tile_size
+
+    @property
+    def memory_mapped(self):
+        return True
+
+    @property
+    def nbytes(self):
+        return sum(level.tiles.nbytes for level in self.levels)
+
+    def latlon_to_pixel(self, lat, lon):
+        """Convert lat/lon (scalars or arrays) to clamped full-resolution (row, col) indices"""
+        a, _, c, _, e, f = self.transform
+        height, width = self.shape
+        cols = np.floor((np.asarray(lon, dtype=np.float64) - c) / a).astype(np.int64)
+        rows = np.floor((np.asarray(lat, dtype=np.float64) - f) / e).astype(np.int64)
+        return np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)
+
+    def sample(self, lats, lons):
+        """Class index for each lat/lon at full resolution; points outside the extent read as NODATA"""
+        a, _, c, _, e, f = self.transform
+        height, width = self.shape
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+
+        col_f = (lons - c) / a
+        row_f = (lats - f) / e
+        outside = (row_f < 0) | (row_f > height) | (col_f < 0) | (col_f > width)
+
+        rows, cols = self.latlon_to_pixel(lats, lons)
+        classes = self.base.pixel_values(rows, cols)
+        return np.where(outside, self.nodata, classes).astype(np.uint8)
+
+    def level_for_pixel_size(self, pixel_deg):
+        """Coarsest level whose pixels are no larger than pixel_deg (degrees of longitude)"""
+        base_deg = abs(self.transform[0])
+        level = 0
+        while level + 1 < len(self.levels) and base_deg * 2 ** (level + 1) <= pixel_deg:
+            level += 1
+        return level
+
+    def sample_grid(self, lats, lons, pixel_deg=None):
+        """
+        Classes on the lat x lon grid of two 1-D coordinate vectors (NODATA outside),
+        read from the coarsest level that still resolves pixel_deg (full resolution if None)
+        """
+        level = 0 if pixel_deg is None else self.level_for_pixel_size(pixel_deg)
+        return sample_grid(self.levels[level], lats, lons)
+
+    def class_at(self, lat, lon):
+        """Class index of the full-resolution pixel containing a single lat/lon"""
+        row, col = self.latlon_to_pixel(lat, lon)
+        return int(self.base.pixel_values(row, col))
+
+    def class_counts(self):
+        """Pixel count per class (Low, Moderate, High) at full resolution, from the tile histograms"""
+        return self.levels[-1].hist.sum(axis=(0, 1))
+
+    def class_histogram(self, block_rows=None):
+        """Pixel counts and ground areas (km²) per class, from the coarsest level's tile histograms"""
+        top = self.levels[-1]
+        return top.hist.sum(axis=(0, 1)), top.area.sum(axis=(0, 1))
+
+    def level_for_radius(self, radius_km, max_pixels=MAX_WINDOW_PIXELS):
+        """Finest level at which a circle of radius_km spans at most max_pixels across"""
+        pixel_km = abs(self.transform[4]) * KM_PER_DEG_LAT
+        diameter_px = 2 * radius_km / pixel_km
+        for k in range(len(self.levels)):
+            if diameter_px / 2 ** k <= max_pixels:
+                return k
+        return len(self.levels) - 1
+
+    def integral(self):
+        """Full-resolution summed-area table (rebuilt in memory for pyramids built without one)"""
+        if self._integral is None:
+            height, width = self.shape
+            self._integral = build_integral(self.base.read_window(0, height, 0, width))
+        return self._integral
+
+    def row_pixel_area_km2(self):
+        """Ground area (km²) of one full-resolution pixel for every row"""
+        return row_pixel_area_km2(self.transform, self.shape[0])
+
+    def box_counts(self, r0, r1, c0, c1):
+        """Full-resolution pixel count per class in rows [r0, r1) and columns [c0, c1)"""
+        return rect_counts(self.integral(), r0, r1, c0, c1)
+
+    def window_counts(self, lat, lon, radius_km, max_pixels=MAX_WINDOW_PIXELS):
+        """
+        Pixel count per class inside a circle, returned as (counts, level). Exact
+        from the summed-area table when the pyramid has one; otherwise estimated
+        from the level chosen by level_for_radius.
+        """
+        if self._integral is not None:
+            return circle_counts(self._integral, self.transform, self.shape, lat, lon, radius_km), 0
+        level = self.level_for_radius(radius_km, max_pixels)
+        counts = circle_window_counts(self.levels[level], lat, lon, radius_km)
+        return counts * 4 ** level, level
+
+
+def is_pyramid(path):
+    """True if path is a pyramid directory or its manifest"""
+    if os.path.basename(path) == MANIFEST_NAME:
+        return os.path.exists(path)
+    return os.path.exists(os.path.join(path, MANIFEST_NAME))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (4, 5) and sys.argv[1] == "build":
+        tile_size = int(sys.argv[4]) if len(sys.argv) == 5 else DEFAULT_TILE_SIZE
+        build_pyramid(ClassRaster.from_npy(sys.argv[2]), sys.argv[3], tile_size)
+    else:
+        print("Usage: python gwp_pyramid.py build <dharwad_gwp_classes.npy> <pyramid_dir> [tile_size]")
+        sys.exit(1)
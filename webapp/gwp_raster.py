@@ -0,0 +1,545 @@
+"""
+GWP Class Raster
+Compact uint8 class-index raster (0=Low, 1=Moderate, 2=High) kept together
+with its geotransform, so lookups and histograms index an array directly
+instead of re-classifying overlay colours on every request.
+
+Rasters are stored as a raw .npy array plus a JSON sidecar with the
+transform, and opened memory-mapped: worker processes share one OS page
+cache and only the pages a query touches are ever read.
+
+Per-class integral images (summed-area tables) give the class counts of any
+pixel rectangle from four reads, and of a circle from one read per row.
+
+Exports are published as a new versioned array file (<name>.<version>.npy)
+named by the sidecar's "data" entry, and the sidecar is replaced atomically:
+a running backend keeps its memory map of the previous version (which could
+not be overwritten in place, and on Windows not even replaced) until it
+notices the new sidecar and reopens.
+
+Export the notebook's GeoTIFF once (requires rasterio):
+    python gwp_raster.py export dharwad_gwp_map.tif dharwad_gwp_classes.npy
+"""
+
+import contextlib
+import glob
+import json
+import os
+import re
+import sys
+import time
+import uuid
+
+import numpy as np
+
+GWP_CLASS_NAMES = ("Low", "Moderate", "High")
+NODATA = 255
+
+# Rows per block when streaming rasters to/from disk
+EXPORT_BLOCK_ROWS = 1024
+
+# Length of one degree on the ground (km)
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON_EQUATOR = 111.320
+
+
+def classify_rgb(rgb):
+    """Decode overlay colours into class indices (Green=High, Yellow=Moderate, else Low)"""
+    rgb = np.asarray(rgb)
+    r = rgb[..., 0].astype(np.int16)
+    g = rgb[..., 1].astype(np.int16)
+    b = rgb[..., 2].astype(np.int16)
+
+    classes = np.zeros(r.shape, dtype=np.uint8)
+    classes[(r > 150) & (g > 150)] = 1
+    # Green wins over yellow, same precedence as the original per-pixel rule
+    classes[(g > r) & (g > b)] = 2
+
+    # Fully transparent overlay pixels carry no prediction
+    if rgb.shape[-1] == 4:
+        classes[rgb[..., 3] == 0] = NODATA
+
+    return classes
+
+
+def _fill_runs(mask, seeds):
+    """Grow seeds to the whole runs of True pixels in mask that they touch, along rows"""
+    run_start = mask.copy()
+    run_start[:, 1:] &= ~mask[:, :-1]
+    run_id = np.cumsum(run_start.ravel()).reshape(mask.shape) * mask
+    seeded = np.zeros(int(run_id.max()) + 1, dtype=bool)
+    seeded[run_id[seeds & mask]] = True
+    seeded[0] = False
+    return seeded[run_id]
+
+
+def border_connected(mask):
+    """Pixels of a boolean mask 4-connected to the array border (row and column run filling)"""
+    reached = np.zeros_like(mask)
+    for edge in (np.s_[0, :], np.s_[-1, :], np.s_[:, 0], np.s_[:, -1]):
+        reached[edge] = mask[edge]
+    count = -1
+    while count != np.count_nonzero(reached):
+        count = np.count_nonzero(reached)
+        reached = _fill_runs(mask, reached)
+        reached = _fill_runs(mask.T, reached.T).T
+    return reached
+
+
+def overlay_background(rgba, tolerance=8):
+    """
+    Canvas outside the district on a rendered overlay: pixels of the corner
+    colour connected to the image border. The notebook's overlay is opaque and
+    its background has the Low colour, so Low areas enclosed by the district
+    stay classified while everything around the district becomes no-data.
+    """
+    rgba = np.asarray(rgba)
+    corners = rgba[[0, 0, -1, -1], [0, -1, 0, -1]]
+    if not (corners == corners[0]).all():
+        return np.zeros(rgba.shape[:2], dtype=bool)
+    close = (np.abs(rgba.astype(np.int16) - corners[0].astype(np.int16)) <= tolerance).all(axis=-1)
+    return border_connected(close)
+
+
+class ClassRaster:
+    """uint8 class raster with an affine geotransform (a, b, c, d, e, f) in lon/lat degrees"""
+
+    def __init__(self, classes, transform, nodata=NODATA, source_path=None):
+        self.classes = classes
+        self.transform = tuple(float(v) for v in transform)
+        self.nodata = nodata
+        self.source_path = source_path
+        self._integral = None
+
+    @classmethod
+    def from_overlay_png(cls, path, bounds):
+        """Decode a rendered RGB(A) overlay stretched over [lon_min, lat_min, lon_max, lat_max]"""
+        from PIL import Image
+
+        with Image.open(path) as image:
+            rgba = np.asarray(image.convert("RGBA"))
+        classes = classify_rgb(rgba)
+        classes[overlay_background(rgba)] = NODATA
+
+        height, width = classes.shape
+        lon_min, lat_min, lon_max, lat_max = bounds
+        transform = (
+            (lon_max - lon_min) / width, 0.0, lon_min,
+            0.0, -(lat_max - lat_min) / height, lat_max,
+        )
+        return cls(classes, transform, source_path=path)
+
+    @classmethod
+    def from_npy(cls, path):
+        """Open a .npy class raster memory-mapped, with transform/nodata from its JSON sidecar"""
+        with open(sidecar_path(path)) as f:
+            meta = json.load(f)
+        data = array_path(path, meta)
+        classes = np.load(data, mmap_mode="r")
+        if classes.dtype != np.uint8 or classes.ndim != 2:
+            raise ValueError(f"{path} is not a 2-D uint8 class raster")
+        # The versioned array file, so its summed-area table is versioned with it
+        return cls(classes, meta["transform"], nodata=meta.get("nodata", NODATA), source_path=data)
+
+    @property
+    def memory_mapped(self):
+        return isinstance(self.classes, np.memmap)
+
+    @property
+    def shape(self):
+        return self.classes.shape
+
+    @property
+    def nbytes(self):
+        return self.classes.nbytes
+
+    def latlon_to_pixel(self, lat, lon):
+        """Convert lat/lon (scalars or arrays) to clamped (row, col) pixel indices"""
+        a, _, c, _, e, f = self.transform
+        height, width = self.shape
+
+        cols = np.floor((np.asarray(lon, dtype=np.float64) - c) / a).astype(np.int64)
+        rows = np.floor((np.asarray(lat, dtype=np.float64) - f) / e).astype(np.int64)
+
+        return np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)
+
+    def sample(self, lats, lons):
+        """Class index for each lat/lon; points outside the raster extent read as NODATA"""
+        a, _, c, _, e, f = self.transform
+        height, width = self.shape
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+
+        # Points exactly on the far edge still belong to the last row/column
+        col_f = (lons - c) / a
+        row_f = (lats - f) / e
+        outside = (row_f < 0) | (row_f > height) | (col_f < 0) | (col_f > width)
+
+        rows, cols = self.latlon_to_pixel(lats, lons)
+        classes = np.asarray(self.classes[rows, cols])
+        return np.where(outside, self.nodata, classes).astype(np.uint8)
+
+    def class_at(self, lat, lon):
+        """Class index of the pixel containing a single lat/lon"""
+        row, col = self.latlon_to_pixel(lat, lon)
+        return int(self.classes[row, col])
+
+    def pixel_values(self, rows, cols):
+        """Classes at (row, col) pixel indices (any broadcastable shapes)"""
+        return np.asarray(self.classes[rows, cols])
+
+    def sample_grid(self, lats, lons, pixel_deg=None):
+        """
+        Classes on the lat x lon grid of two 1-D coordinate vectors (NODATA outside).
+        pixel_deg is accepted for parity with GWPPyramid.sample_grid; a single-level
+        raster always reads full resolution.
+        """
+        return sample_grid(self, lats, lons)
+
+    def read_window(self, r0, r1, c0, c1):
+        """Class pixels in rows [r0, r1) and columns [c0, c1)"""
+        return np.asarray(self.classes[r0:r1, c0:c1])
+
+    def integral(self):
+        """
+        Per-class summed-area table, built on first use. For .npy rasters it is
+        persisted next to the raster (<name>_sat.npy) and memory-mapped afterwards.
+        """
+        if self._integral is None:
+            sat_path = None
+            if self.source_path and self.source_path.endswith(".npy"):
+                sat_path = self.source_path[:-4] + "_sat.npy"
+            if sat_path and os.path.exists(sat_path) and os.path.getmtime(sat_path) >= os.path.getmtime(self.source_path):
+                self._integral = np.load(sat_path, mmap_mode="r")
+            else:
+                try:
+                    self._integral = build_integral(self.classes, out_path=sat_path)
+                except OSError:
+                    # Read-only data directory: keep the table in memory only
+                    self._integral = build_integral(self.classes)
+        return self._integral
+
+    def box_counts(self, r0, r1, c0, c1):
+        """Pixel count per class in rows [r0, r1) and columns [c0, c1): four table reads"""
+        return rect_counts(self.integral(), r0, r1, c0, c1)
+
+    def window_counts(self, lat, lon, radius_km):
+        """Exact pixel count per class inside a circle at full resolution (level 0)"""
+        return circle_counts(self.integral(), self.transform, self.shape, lat, lon, radius_km), 0
+
+    def class_counts(self):
+        """Pixel count per class (Low, Moderate, High), no-data excluded"""
+        counts = np.bincount(self.classes.ravel(), minlength=len(GWP_CLASS_NAMES))
+        return counts[:len(GWP_CLASS_NAMES)]
+
+    def row_pixel_area_km2(self):
+        """Ground area (km²) of one pixel for every raster row, from pixel size and latitude"""
+        return row_pixel_area_km2(self.transform, self.shape[0])
+
+    def class_histogram(self, block_rows=1024):
+        """Pixel counts and ground areas (km²) per class, scanned in row blocks"""
+        n_classes = len(GWP_CLASS_NAMES)
+        counts = np.zeros(n_classes, dtype=np.int64)
+        areas_km2 = np.zeros(n_classes, dtype=np.float64)
+        row_areas = self.row_pixel_area_km2()
+
+        for r0 in range(0, self.shape[0], block_rows):
+            block = self.classes[r0:r0 + block_rows]
+            block_areas = row_areas[r0:r0 + block_rows]
+            for k in range(n_classes):
+                per_row = np.count_nonzero(block == k, axis=1)
+                counts[k] += per_row.sum()
+                areas_km2[k] += per_row @ block_areas
+
+        return counts, areas_km2
+
+
+def sample_grid(source, lats, lons):
+    """
+    Classes on the grid spanned by 1-D lats (rows) and lons (columns). Works for
+    any source with .transform, .shape, .nodata and .pixel_values(rows, cols);
+    since the raster is axis-aligned in lon/lat, rows and columns index separately.
+    """
+    a, _, c, _, e, f = source.transform
+    height, width = source.shape
+    row_f = (np.asarray(lats, dtype=np.float64) - f) / e
+    col_f = (np.asarray(lons, dtype=np.float64) - c) / a
+
+    rows = np.clip(np.floor(row_f).astype(np.int64), 0, height - 1)
+    cols = np.clip(np.floor(col_f).astype(np.int64), 0, width - 1)
+    outside = ((row_f < 0) | (row_f > height))[:, None] | ((col_f < 0) | (col_f > width))[None, :]
+
+    classes = source.pixel_values(rows[:, None], cols[None, :])
+    return np.where(outside, source.nodata, classes).astype(np.uint8)
+
+
+def row_pixel_area_km2(transform, height):
+    """Ground area (km²) of one pixel in each of `height` rows of a lon/lat grid"""
+    a, _, _, _, e, f = transform
+    row_centres = f + (np.arange(height) + 0.5) * e
+    width_km = abs(a) * KM_PER_DEG_LON_EQUATOR * np.cos(np.radians(row_centres))
+    height_km = abs(e) * KM_PER_DEG_LAT
+    return width_km * height_km
+
+
+def build_integral(classes, out_path=None, block_rows=256):
+    """
+    Per-class summed-area table sat of shape (H + 1, W + 1, n_classes):
+    sat[r, c, k] is the number of class-k pixels in rows [0, r) and columns [0, c).
+    Accumulated in row blocks; when out_path is given it is written through a
+    memmap to a temporary file next to it and renamed into place once complete,
+    so other processes never map a half-written table.
+    """
+    height, width = classes.shape
+    n_classes = len(GWP_CLASS_NAMES)
+    dtype = np.int32 if height * width < 2 ** 31 else np.int64
+    shape = (height + 1, width + 1, n_classes)
+
+    if not out_path:
+        sat = np.zeros(shape, dtype=dtype)
+        _fill_integral(sat, classes, block_rows)
+        return sat
+
+    with replaced_memmap(out_path, dtype, shape) as sat:
+        sat[0] = 0
+        sat[:, 0] = 0
+        _fill_integral(sat, classes, block_rows)
+        del sat
+    return np.load(out_path, mmap_mode="r")
+
+
+def _fill_integral(sat, classes, block_rows):
+    height, width = classes.shape
+    n_classes = sat.shape[-1]
+    running = np.zeros((width, n_classes), dtype=sat.dtype)
+    for r0 in range(0, height, block_rows):
+        block = np.asarray(classes[r0:r0 + block_rows])
+        onehot = np.stack([block == k for k in range(n_classes)], axis=-1)
+        cumulative = np.cumsum(np.cumsum(onehot, axis=1, dtype=sat.dtype), axis=0, dtype=sat.dtype) + running
+        sat[r0 + 1:r0 + 1 + len(block), 1:] = cumulative
+        running = cumulative[-1]
+
+
+def rect_counts(sat, r0, r1, c0, c1):
+    """Class counts in pixel rows [r0, r1) and columns [c0, c1) from a summed-area table"""
+    counts = sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0]
+    return np.asarray(counts, dtype=np.int64)
+
+
+def circle_row_spans(transform, shape, lat, lon, radius_km):
+    """
+    Rows and [col_start, col_end) spans of the pixels whose centres lie within
+    radius_km of (lat, lon); same membership rule as circle_window_counts.
+    """
+    a, _, c, _, e, f = transform
+    height, width = shape
+    km_per_deg_lon = KM_PER_DEG_LON_EQUATOR * np.cos(np.radians(lat))
+
+    dlat = radius_km / KM_PER_DEG_LAT
+    rows = sorted(((lat + dlat - f) / e, (lat - dlat - f) / e))
+    rows = np.arange(max(int(np.floor(rows[0])), 0), min(int(np.ceil(rows[1])), height))
+    dy = (f + (rows + 0.5) * e - lat) * KM_PER_DEG_LAT
+    rows, dy = rows[dy ** 2 <= radius_km ** 2], dy[dy ** 2 <= radius_km ** 2]
+
+    # Column centres within the half-chord of each row
+    half = np.sqrt(radius_km ** 2 - dy ** 2) / (km_per_deg_lon * abs(a))
+    centre = (lon - c) / a - 0.5
+    col_start = np.clip(np.ceil(centre - half).astype(np.int64), 0, width)
+    col_end = np.clip(np.floor(centre + half).astype(np.int64) + 1, 0, width)
+    keep = col_end > col_start
+    return rows[keep], col_start[keep], col_end[keep]
+
+
+def span_counts(sat, rows, col_start, col_end):
+    """(n_spans, n_classes) class counts of row spans [col_start, col_end) from a summed-area table"""
+    counts = sat[rows + 1, col_end] - sat[rows, col_end] - sat[rows + 1, col_start] + sat[rows, col_start]
+    return np.asarray(counts, dtype=np.int64).reshape(len(rows), sat.shape[-1])
+
+
+def circle_counts(sat, transform, shape, lat, lon, radius_km):
+    """Exact class counts inside a circle from a summed-area table: one span per row"""
+    rows, c0, c1 = circle_row_spans(transform, shape, lat, lon, radius_km)
+    return span_counts(sat, rows, c0, c1).sum(axis=0)
+
+
+def circle_window_counts(source, lat, lon, radius_km):
+    """
+    Pixel count per class for pixel centres within radius_km of (lat, lon).
+    source needs .transform, .shape, .nodata and .read_window(r0, r1, c0, c1);
+    only the bounding window of the circle is read.
+    """
+    a, _, c, _, e, f = source.transform
+    height, width = source.shape
+    n_classes = len(GWP_CLASS_NAMES)
+
+    km_per_deg_lon = KM_PER_DEG_LON_EQUATOR * np.cos(np.radians(lat))
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = radius_km / km_per_deg_lon
+
+    rows = sorted(((lat + dlat - f) / e, (lat - dlat - f) / e))
+    cols = sorted(((lon - dlon - c) / a, (lon + dlon - c) / a))
+    r0, r1 = max(int(np.floor(rows[0])), 0), min(int(np.ceil(rows[1])), height)
+    c0, c1 = max(int(np.floor(cols[0])), 0), min(int(np.ceil(cols[1])), width)
+    if r0 >= r1 or c0 >= c1:
+        return np.zeros(n_classes, dtype=np.int64)
+
+    window = source.read_window(r0, r1, c0, c1)
+    dy = (f + (np.arange(r0, r1) + 0.5) * e - lat) * KM_PER_DEG_LAT
+    dx = (c + (np.arange(c0, c1) + 0.5) * a - lon) * km_per_deg_lon
+    inside = dy[:, None] ** 2 + dx[None, :] ** 2 <= radius_km ** 2
+
+    counts = np.bincount(window[inside], minlength=source.nodata + 1)
+    return counts[:n_classes].astype(np.int64)
+
+
+def sidecar_path(npy_path):
+    """JSON sidecar next to a .npy raster (transform, crs, nodata)"""
+    return os.path.splitext(npy_path)[0] + ".json"
+
+
+def temp_path(path):
+    """Unique temporary file next to path, for writing it and renaming it into place"""
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+@contextlib.contextmanager
+def replaced_memmap(path, dtype, shape):
+    """
+    .npy memmap written to a temporary file and renamed over path when the
+    block completes (removed if it fails). The block must drop its reference
+    to the memmap before leaving, so the file is closed before the rename.
+    """
+    tmp = temp_path(path)
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+    try:
+        yield out
+        out.flush()
+        out = None
+        os.replace(tmp, path)
+    finally:
+        out = None
+        if os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def save_npy(path, array):
+    """np.save through a temporary file renamed into place"""
+    tmp = temp_path(path)
+    try:
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_sidecar(npy_path, transform, shape, nodata=NODATA, crs="EPSG:4326", **extra):
+    """Write the JSON sidecar describing a .npy raster (atomically replaced)"""
+    meta = {
+        "transform": [float(v) for v in transform],
+        "shape": [int(n) for n in shape],
+        "nodata": nodata,
+        "crs": crs,
+    }
+    meta.update(extra)
+    tmp = temp_path(sidecar_path(npy_path))
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, sidecar_path(npy_path))
+
+
+def array_path(npy_path, meta=None):
+    """File holding a .npy raster's array: the version its sidecar names, else npy_path itself"""
+    if meta is None:
+        try:
+            with open(sidecar_path(npy_path)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return npy_path
+    data = meta.get("data")
+    return os.path.join(os.path.dirname(npy_path), data) if data else npy_path
+
+
+def new_version_path(npy_path):
+    """Fresh array file to publish npy_path into, next to it"""
+    return f"{os.path.splitext(npy_path)[0]}.{time.time_ns():x}.npy"
+
+
+def raster_signature(npy_path):
+    """(mtime, size) of a .npy raster's sidecar and array file, or None if either is missing"""
+    try:
+        side = os.stat(sidecar_path(npy_path))
+        data = os.stat(array_path(npy_path))
+    except OSError:
+        return None
+    return (side.st_mtime_ns, side.st_size, data.st_mtime_ns, data.st_size)
+
+
+def publish_npy(npy_path, data_path, transform, shape, **meta):
+    """
+    Make data_path (from new_version_path) the current array of npy_path by
+    replacing the sidecar, then drop older versions. A version some process
+    still has mapped cannot be removed on Windows; it is retried next time.
+    """
+    write_sidecar(npy_path, transform, shape, data=os.path.basename(data_path), **meta)
+    base = os.path.splitext(npy_path)[0]
+    current = os.path.basename(data_path)[:-4]
+    version = re.compile(re.escape(os.path.basename(base)) + r"\.[0-9a-f]+(_sat)?\.npy$")
+    for old in glob.glob(glob.escape(base) + ".*.npy"):
+        name = os.path.basename(old)
+        if not version.match(name) or name.startswith(current):
+            continue
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+
+def save_class_raster(npy_path, classes, transform, nodata=NODATA):
+    """Save an in-memory class raster in the memory-mappable .npy + sidecar layout"""
+    data_path = new_version_path(npy_path)
+    np.save(data_path, np.ascontiguousarray(classes, dtype=np.uint8))
+    publish_npy(npy_path, data_path, transform, classes.shape, nodata=nodata)
+
+
+def export_geotiff(tif_path, npy_path, block_rows=EXPORT_BLOCK_ROWS, **meta):
+    """
+    Convert a uint8 class GeoTIFF (e.g. the notebook's dharwad_gwp_map.tif) into the
+    .npy + sidecar layout, warping to lon/lat (EPSG:4326, nearest neighbour) so the
+    backend needs no GDAL at runtime. Written block by block through a memmap;
+    extra meta is recorded in the sidecar.
+    """
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.vrt import WarpedVRT
+    from rasterio.windows import Window
+
+    with rasterio.open(tif_path) as src:
+        src_nodata = src.nodata if src.nodata is not None else NODATA
+        with WarpedVRT(src, crs="EPSG:4326", resampling=Resampling.nearest,
+                       src_nodata=src_nodata, nodata=NODATA) as vrt:
+            data_path = new_version_path(npy_path)
+            out = np.lib.format.open_memmap(data_path, mode="w+", dtype=np.uint8,
+                                            shape=(vrt.height, vrt.width))
+            for r0 in range(0, vrt.height, block_rows):
+                n = min(block_rows, vrt.height - r0)
+                block = vrt.read(1, window=Window(0, r0, vrt.width, n))
+                block[block > len(GWP_CLASS_NAMES) - 1] = NODATA
+                out[r0:r0 + n] = block
+            out.flush()
+            del out
+            publish_npy(npy_path, data_path, tuple(vrt.transform)[:6], (vrt.height, vrt.width), **meta)
+
+    print(f"✅ Exported {tif_path} -> {npy_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "export":
+        export_geotiff(sys.argv[2], sys.argv[3])
+    else:
+        print("Usage: python gwp_raster.py export <dharwad_gwp_map.tif> <dharwad_gwp_classes.npy>")
+        sys.exit(1)
@@ -0,0 +1,163 @@
+"""
+GWP Map Tiles
+Renders 256x256 Web-Mercator (XYZ / slippy-map) PNG tiles from the class
+raster on demand, coloured with the notebook's map colours, and keeps
+rendered tiles in a bounded in-memory LRU backed by an on-disk tile cache.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+
+import numpy as np
+from PIL import Image
+
+from caching import LRUCache
+from gwp_raster import GWP_CLASS_NAMES
+
+TILE_SIZE = 256
+MAX_ZOOM = 20
+
+# Same colours as the notebook map: Low, Moderate, High; index 3 is transparent
+TILE_COLORS = ["#d73027", "#fee08b", "#1a9850"]
+TRANSPARENT_INDEX = len(GWP_CLASS_NAMES)
+
+
+def _tile_palette():
+    palette = []
+    for color in TILE_COLORS:
+        palette.extend(int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return palette + [0, 0, 0]
+
+
+TILE_PALETTE = _tile_palette()
+
+
+def tile_bounds(z, x, y):
+    """(lon_min, lat_min, lon_max, lat_max) of an XYZ tile"""
+    n = 2 ** z
+    lon_min, lon_max = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    lat_max = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    lat_min = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return lon_min, float(lat_min), lon_max, float(lat_max)
+
+
+def tile_pixel_centres(z, x, y, size=TILE_SIZE):
+    """Latitudes (rows) and longitudes (columns) of the pixel centres of an XYZ tile"""
+    n = 2 ** z
+    frac = (np.arange(size) + 0.5) / size
+    lons = (x + frac) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + frac) / n))))
+    return lats, lons
+
+
+def raster_bounds(source):
+    """(lon_min, lat_min, lon_max, lat_max) covered by a class raster"""
+    a, _, c, _, e, f = source.transform
+    height, width = source.shape
+    lons = sorted((c, c + a * width))
+    lats = sorted((f, f + e * height))
+    return lons[0], lats[0], lons[1], lats[1]
+
+
+def encode_tile(classes):
+    """Paletted PNG bytes for a tile of class indices (anything else is transparent)"""
+    index = np.where(classes < TRANSPARENT_INDEX, classes, TRANSPARENT_INDEX).astype(np.uint8)
+    image = Image.fromarray(index)
+    image.putpalette(TILE_PALETTE)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", transparency=TRANSPARENT_INDEX)
+    return buffer.getvalue()
+
+
+EMPTY_TILE = encode_tile(np.full((TILE_SIZE, TILE_SIZE), TRANSPARENT_INDEX, dtype=np.uint8))
+
+
+def render_tile(source, z, x, y, size=TILE_SIZE):
+    """
+    PNG bytes for XYZ tile (z, x, y). Each tile pixel takes the class of the map
+    pixel under its centre (nearest neighbour). A GWPPyramid reads the coarsest
+    level that still resolves the tile's pixel size (level_for_pixel_size), so
+    zoomed-out tiles touch the small levels; a ClassRaster has only full
+    resolution. Tiles off the map are empty.
+    """
+    lon_min, lat_min, lon_max, lat_max = tile_bounds(z, x, y)
+    map_lon_min, map_lat_min, map_lon_max, map_lat_max = raster_bounds(source)
+    if lon_max <= map_lon_min or lon_min >= map_lon_max or lat_max <= map_lat_min or lat_min >= map_lat_max:
+        return EMPTY_TILE
+
+    lats, lons = tile_pixel_centres(z, x, y, size)
+    classes = source.sample_grid(lats, lons, pixel_deg=(lon_max - lon_min) / size)
+    return encode_tile(classes)
+
+
+def map_version(path, signature):
+    """Short version id for a map file; changes whenever the file is replaced"""
+    return hashlib.sha1(f"{os.path.abspath(path)}|{signature}".encode()).hexdigest()[:12]
+
+
+class TileCache:
+    """
+    Rendered tiles in a bounded in-memory LRU backed by a disk cache laid out
+    as <cache_dir>/<map version>/<z>/<x>/<y>.png. Tiles are keyed by map
+    version, so a new map never serves stale tiles; prune() deletes the
+    directories of the versions it replaced.
+    """
+
+    def __init__(self, cache_dir, maxsize=2048):
+        self.cache_dir = cache_dir
+        self.memory = LRUCache(maxsize)
+        self.disk_hits = 0
+        self.rendered = 0
+
+    def tile_path(self, version, z, x, y):
+        return os.path.join(self.cache_dir, version, str(z), str(x), f"{y}.png")
+
+    def get_tile(self, source, version, z, x, y):
+        """PNG bytes for a tile: memory LRU, then disk, else render and store in both"""
+        key = (version, z, x, y)
+        png = self.memory.get(key)
+        if png is not None:
+            return png
+
+        path = self.tile_path(version, z, x, y)
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            self.disk_hits += 1
+        except OSError:
+            png = render_tile(source, z, x, y)
+            self.rendered += 1
+            if png is not EMPTY_TILE:
+                self._write(path, png)
+
+        self.memory.put(key, png)
+        return png
+
+    def _write(self, path, png):
+        """Write a tile atomically so concurrent workers never read a partial file"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write tile cache {path}: {e}")
+
+    def prune(self, current_version):
+        """Delete the disk tiles of every map version except current_version"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            if name != current_version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats.update({"disk_hits": self.disk_hits, "rendered": self.rendered, "cache_dir": self.cache_dir})
+        return stats
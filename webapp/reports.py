@@ -0,0 +1,524 @@
+"""
+PDF Reports
+reportlab drawing for the groundwater reports, plus a job runner that renders
+them in a bounded process pool. A report is fully described by a small JSON
+"spec" (only the fields that are drawn), and finished PDFs are cached on disk
+under the SHA-256 of that spec, so downloading the same location twice costs
+one file read and identical concurrent requests share a single render.
+
+The drawing functions depend only on reportlab. Workers are spawned, so they
+re-import the launching script as __mp_main__; app_hybrid skips its startup
+(map loading, weather prefetch) there, and a worker only imports the web
+application's cheap module-level objects.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from caching import LRUCache
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Report PDFs print their date, so an artifact is only reused on the day it was
+# rendered; older ones are deleted (at most once per PRUNE_INTERVAL_SECONDS)
+REPORT_RETENTION_DAYS = 2
+PRUNE_INTERVAL_SECONDS = 3600
+
+ADVANCED_REPORT_TITLES = {
+    'temporal': 'Temporal Analysis Report',
+    'borewell': 'Borewell Recommendation Report',
+    'recharge': 'Recharge Zones Analysis Report',
+    'crops': 'Crop Suitability Report',
+    'drought': 'Drought Risk Assessment Report',
+    'rainfall': 'Rainfall Impact Analysis Report'
+}
+
+# analysis_results keys drawn for each advanced report type (the rest is not hashed)
+ADVANCED_REPORT_FIELDS = {
+    'temporal': ('current_status', 'trend', 'change_percent', 'analysis'),
+    'borewell': ('best_location',),
+    'recharge': ('recharge_potential', 'recharge_score', 'recommended_structures'),
+    'crops': ('irrigation_advice', 'suitable_crops'),
+    'drought': ('risk_level', 'risk_score', 'estimated_days_to_crisis', 'recommendations'),
+    'rainfall': ('current_status', 'after_rainfall', 'recharge_mm', 'recharge_rate_percent', 'recharge_time_days')
+}
+
+
+def report_key(kind, spec):
+    """Content hash of a report's inputs; identical inputs give identical PDFs"""
+    canonical = json.dumps({"kind": kind, "spec": spec}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def report_filename(kind, spec):
+    """Download name, as the synchronous endpoints have always named it"""
+    if kind == "advanced":
+        return f"{spec['feature_type']}_analysis_{spec['lat']:.4f}_{spec['lon']:.4f}.pdf"
+    if kind == "combined":
+        return f"gwp_reports_{len(spec['sites'])}_sites.pdf"
+    return f"gwp_report_{spec['lat']:.4f}_{spec['lon']:.4f}.pdf"
+
+
+def draw_basic_report(c, spec):
+    """One-page groundwater potential report for a location"""
+    width, height = letter
+    lat, lon = spec['lat'], spec['lon']
+
+    # Header
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(100, height - 100, "Groundwater Potential Report")
+
+    # Location and Date
+    c.setFont("Helvetica", 12)
+    c.drawString(100, height - 140, f"Location: {lat:.4f} N, {lon:.4f} E")
+    c.drawString(100, height - 160, f"Date: {spec['report_date']}")
+
+    # Main Result
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(100, height - 200, f"Groundwater Potential: {spec['gwp_class']}")
+
+    # Indicators
+    c.setFont("Helvetica", 11)
+    y = height - 240
+    c.drawString(100, y, f"NDVI (Vegetation): {spec['ndvi']:.3f}")
+    c.drawString(100, y - 20, f"NDWI (Water Content): {spec['ndwi']:.3f}")
+    c.drawString(100, y - 40, f"Elevation: {spec['elevation']:.1f}m")
+    c.drawString(100, y - 60, "Data Source: U-Net CNN Model")
+
+    # Weather if available
+    if spec.get('temperature') is not None:
+        c.drawString(100, y - 80, f"Temperature: {spec['temperature']} C")
+
+    # Recommendations
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(100, y - 120, "Analysis & Recommendations:")
+
+    c.setFont("Helvetica", 10)
+    y_pos = y - 140
+
+    # Add up to 3 factors
+    for factor in spec['factors'][:3]:
+        text = str(factor)
+        if len(text) > 75:
+            text = text[:72] + "..."
+        c.drawString(120, y_pos, f"- {text}")
+        y_pos -= 20
+
+    # Add conclusion
+    conclusion = spec['conclusion']
+    if conclusion:
+        y_pos -= 10
+        conclusion_text = str(conclusion)
+        if len(conclusion_text) > 80:
+            # Simple wrapping
+            words = conclusion_text.split()
+            line = ""
+            for word in words:
+                if len(line + word) < 75:
+                    line += word + " "
+                else:
+                    c.drawString(100, y_pos, line.strip())
+                    y_pos -= 15
+                    line = word + " "
+            if line:
+                c.drawString(100, y_pos, line.strip())
+        else:
+            c.drawString(100, y_pos, conclusion_text)
+
+    # Footer
+    c.setFont("Helvetica-Oblique", 9)
+    c.drawString(100, 50, "Generated by Deep Learning GWP System - Dharwad District")
+    c.drawString(100, 35, "U-Net CNN Model | 99.34% Accuracy")
+
+
+def draw_advanced_report(c, spec):
+    """One-page report for an advanced feature analysis (temporal, borewell, recharge, ...)"""
+    width, height = letter
+    lat, lon = spec['lat'], spec['lon']
+    feature_type = spec['feature_type']
+    analysis_results = spec['analysis_results']
+
+    # Header
+    c.setFont("Helvetica-Bold", 20)
+    title = ADVANCED_REPORT_TITLES.get(feature_type, 'Advanced Analysis Report')
+    c.drawString(100, height - 100, title)
+
+    # Location and Date
+    c.setFont("Helvetica", 12)
+    c.drawString(100, height - 140, f"Location: {lat:.4f} N, {lon:.4f} E")
+    c.drawString(100, height - 160, f"Analysis Date: {spec['report_date']}")
+
+    y = height - 200
+
+    # Feature-specific content
+    c.setFont("Helvetica-Bold", 14)
+
+    if feature_type == 'temporal':
+        c.drawString(100, y, "Historical Groundwater Trends")
+        c.setFont("Helvetica", 11)
+        y -= 30
+        c.drawString(100, y, f"Current Status: {analysis_results.get('current_status', 'N/A')}")
+        y -= 20
+        c.drawString(100, y, f"Trend: {analysis_results.get('trend', 'N/A').upper()}")
+        y -= 20
+        c.drawString(100, y, f"Change: {analysis_results.get('change_percent', 0)}%")
+        y -= 30
+        c.setFont("Helvetica", 10)
+        analysis_text = str(analysis_results.get('analysis', ''))
+        if analysis_text:
+            lines = [analysis_text[i:i+80] for i in range(0, len(analysis_text), 80)]
+            for line in lines[:5]:
+                c.drawString(100, y, line)
+                y -= 15
+
+    elif feature_type == 'borewell':
+        c.drawString(100, y, "Borewell Site Recommendations")
+        best_loc = analysis_results.get('best_location', {})
+        if best_loc:
+            c.setFont("Helvetica", 11)
+            y -= 30
+            c.drawString(100, y, f"Success Probability: {best_loc.get('success_probability', 0)}%")
+            y -= 20
+            c.drawString(100, y, f"Estimated Depth: {best_loc.get('estimated_depth_ft', 0)} ft")
+            y -= 20
+            c.drawString(100, y, f"Estimated Cost: ₹{best_loc.get('estimated_cost', 0):,.0f}")
+            y -= 20
+            c.drawString(100, y, f"GWP Classification: {best_loc.get('gwp_class', 'N/A')}")
+
+    elif feature_type == 'recharge':
+        c.drawString(100, y, "Rainwater Recharge Potential")
+        c.setFont("Helvetica", 11)
+        y -= 30
+        c.drawString(100, y, f"Recharge Potential: {analysis_results.get('recharge_potential', 'N/A')}")
+        y -= 20
+        c.drawString(100, y, f"Score: {analysis_results.get('recharge_score', 0)}/100")
+        y -= 30
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(100, y, "Recommended Structures:")
+        c.setFont("Helvetica", 10)
+        y -= 20
+        structures = analysis_results.get('recommended_structures', [])
+        for struct in structures[:5]:
+            c.drawString(120, y, f"• {struct}")
+            y -= 15
+
+    elif feature_type == 'crops':
+        c.drawString(100, y, "Crop Recommendations")
+        c.setFont("Helvetica", 11)
+        y -= 30
+        c.drawString(100, y, f"Irrigation Strategy: {analysis_results.get('irrigation_advice', 'N/A')}")
+        y -= 30
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(100, y, "Suitable Crops:")
+        c.setFont("Helvetica", 10)
+        y -= 20
+        crops = analysis_results.get('suitable_crops', [])
+        for crop in crops[:5]:
+            c.drawString(120, y, f"• {crop.get('name', 'N/A')} - {crop.get('water_req', 'N/A')} water")
+            y -= 15
+
+    elif feature_type == 'drought':
+        c.drawString(100, y, "Drought Risk Assessment")
+        c.setFont("Helvetica", 11)
+        y -= 30
+        c.drawString(100, y, f"Risk Level: {analysis_results.get('risk_level', 'N/A')}")
+        y -= 20
+        c.drawString(100, y, f"Risk Score: {analysis_results.get('risk_score', 0)}/100")
+        y -= 20
+        c.drawString(100, y, f"Time to Crisis: {analysis_results.get('estimated_days_to_crisis', 0)} days")
+        y -= 30
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(100, y, "Immediate Actions:")
+        c.setFont("Helvetica", 10)
+        y -= 20
+        recommendations = analysis_results.get('recommendations', [])
+        for rec in recommendations[:5]:
+            rec_text = str(rec)
+            if len(rec_text) > 70:
+                rec_text = rec_text[:67] + "..."
+            c.drawString(120, y, f"• {rec_text}")
+            y -= 15
+
+    elif feature_type == 'rainfall':
+        c.drawString(100, y, "Rainfall Impact Simulation")
+        c.setFont("Helvetica", 11)
+        y -= 30
+        current = analysis_results.get('current_status', {})
+        after = analysis_results.get('after_rainfall', {})
+        c.drawString(100, y, f"Current GWP: {current.get('gwp_class', 'N/A')}")
+        y -= 20
+        c.drawString(100, y, f"After Rainfall: {after.get('gwp_class', 'N/A')}")
+        y -= 20
+        c.drawString(100, y, f"Improvement: {after.get('improvement', 'N/A')}")
+        y -= 30
+        c.drawString(100, y, f"Recharge Amount: {analysis_results.get('recharge_mm', 0)}mm")
+        y -= 20
+        c.drawString(100, y, f"Recharge Rate: {analysis_results.get('recharge_rate_percent', 0)}%")
+        y -= 20
+        c.drawString(100, y, f"Recharge Time: {analysis_results.get('recharge_time_days', 0)} days")
+
+    # Footer
+    c.setFont("Helvetica-Oblique", 9)
+    c.drawString(100, 50, "Generated by HydroSense Deep Learning - Advanced Features Module")
+    c.drawString(100, 35, "Deep Learning Groundwater Analysis System | Dharwad District")
+
+
+# Site rows per page of the combined report's summary table
+SUMMARY_ROWS_PER_PAGE = 38
+
+
+def draw_combined_report(c, spec):
+    """Summary table of all sites, then one basic report page per site in the district"""
+    width, height = letter
+    sites = spec['sites']
+    columns = [(40, "#"), (70, "Site"), (250, "Latitude"), (320, "Longitude"),
+               (395, "GWP"), (460, "NDVI"), (510, "Elevation")]
+
+    for start in range(0, max(len(sites), 1), SUMMARY_ROWS_PER_PAGE):
+        c.setFont("Helvetica-Bold", 18)
+        c.drawString(40, height - 60, "Groundwater Potential Reports - Summary")
+        c.setFont("Helvetica", 10)
+        c.drawString(40, height - 80, f"{len(sites)} sites | Generated: {spec['report_date']}")
+        y = height - 110
+        c.setFont("Helvetica-Bold", 10)
+        for x, label in columns:
+            c.drawString(x, y, label)
+        c.setFont("Helvetica", 9)
+        for i, site in enumerate(sites[start:start + SUMMARY_ROWS_PER_PAGE], start + 1):
+            y -= 16
+            name = str(site.get('name') or '')[:30]
+            c.drawString(40, y, str(i))
+            c.drawString(70, y, name)
+            c.drawString(250, y, f"{site['lat']:.4f}")
+            c.drawString(320, y, f"{site['lon']:.4f}")
+            if site.get('error'):
+                c.drawString(395, y, site['error'])
+                continue
+            c.drawString(395, y, site['gwp_class'])
+            c.drawString(460, y, f"{site['ndvi']:.3f}")
+            c.drawString(510, y, f"{site['elevation']:.1f}m")
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawString(40, 35, "Generated by Deep Learning GWP System - Dharwad District")
+        c.showPage()
+
+    for site in sites:
+        if not site.get('error'):
+            draw_basic_report(c, dict(site, report_date=spec['report_date']))
+            c.showPage()
+
+
+REPORT_DRAWERS = {"basic": draw_basic_report, "advanced": draw_advanced_report, "combined": draw_combined_report}
+
+
+def render_report_file(kind, spec, path):
+    """Worker entry point: render a report and publish it atomically at path"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            c = canvas.Canvas(f, pagesize=letter)
+            REPORT_DRAWERS[kind](c, spec)
+            c.save()
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object collecting what zipfile writes to it"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(members):
+    """
+    Stream a ZIP archive of (arcname, file path or bytes) members chunk by
+    chunk; zipfile uses data descriptors on an unseekable sink, so only the
+    member being copied is ever in memory.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, content in members:
+            if isinstance(content, bytes):
+                archive.writestr(arcname, content)
+            else:
+                archive.write(content, arcname)
+            yield sink.drain()
+    yield sink.drain()
+
+
+class ReportJobs:
+    """
+    Report job runner: submit() returns a job dict immediately and the PDF is
+    rendered in a bounded process pool. Artifacts live at <cache_dir>/<hash>.pdf;
+    a job whose artifact already exists is done on submission, and jobs with
+    the same hash share one in-flight render. The report date is part of the
+    hashed spec, and artifacts older than retention_days are pruned.
+    """
+
+    def __init__(self, cache_dir, max_workers=DEFAULT_WORKERS, max_jobs=10000,
+                 retention_days=REPORT_RETENTION_DAYS):
+        # Absolute, so send_file does not resolve it against the app root
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_workers = max_workers
+        self.jobs = LRUCache(maxsize=max_jobs)
+        self.renders = 0
+        self.cache_hits = 0
+        self.retention_days = retention_days
+        self._pruned_at = 0.0
+        self._pool = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def artifact_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _executor(self):
+        if self._pool is None:
+            # Spawned, not forked: the web server is multithreaded, and a forked
+            # child could inherit a lock some other thread was holding
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, kind, spec):
+        """Queue a report (or find it cached); returns the job dict"""
+        spec = dict(spec, report_date=date.today().isoformat())
+        key = report_key(kind, spec)
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "key": key,
+            "kind": kind,
+            "filename": report_filename(kind, spec),
+            "status": "queued",
+            "error": None,
+            "submitted_at": datetime.now().isoformat(),
+        }
+        self.jobs.put(job["job_id"], job)
+        path = self.artifact_path(key)
+
+        with self._lock:
+            if os.path.exists(path):
+                self.cache_hits += 1
+                job["status"] = "done"
+                return job
+            future = self._inflight.get(key)
+            if future is None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._prune()
+                try:
+                    future = self._executor().submit(render_report_file, kind, spec, path)
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed); start a fresh pool
+                    self._pool = None
+                    future = self._executor().submit(render_report_file, kind, spec, path)
+                self._inflight[key] = future
+                self.renders += 1
+        # Outside the lock: an already finished future runs the callback immediately
+        future.add_done_callback(lambda f, key=key: self._finished(key))
+        job["status"] = "running"
+        job["future"] = future
+        return job
+
+    def _prune(self):
+        """Delete artifacts (and temp files of dead renders) past the retention age; caller holds the lock"""
+        now = time.time()
+        if now - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = now
+        cutoff = now - self.retention_days * 86400
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _finished(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def status(self, job_id):
+        """Public view of a job with an up-to-date status, or None for an unknown job id"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        future = job.get("future")
+        if future is not None and future.done():
+            error = future.exception()
+            job["status"] = "failed" if error else "done"
+            job["error"] = str(error) if error else None
+            job.pop("future", None)
+        return {k: v for k, v in job.items() if k != "future"}
+
+    def wait(self, job, timeout=None):
+        """Block until a job is finished; returns its artifact path (raises the render error)"""
+        future = job.get("future")
+        if future is not None:
+            future.result(timeout)
+        return self.artifact_path(job["key"])
+
+    def render_many(self, items, window=None):
+        """
+        Render (kind, spec, tag) items in the pool, yielding (tag, path, error)
+        in input order. At most `window` reports are queued ahead of the one
+        being consumed, so huge batches do not flood the pool or the job table.
+        """
+        window = window or 4 * self.max_workers
+        pending = deque()
+        for kind, spec, tag in items:
+            pending.append((tag, self.submit(kind, spec)))
+            if len(pending) >= window:
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+
+    def _collect(self, tag, job):
+        try:
+            return tag, self.wait(job), None
+        except Exception as e:
+            return tag, None, str(e)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "cache_dir": self.cache_dir,
+            "max_workers": self.max_workers,
+            "jobs": len(self.jobs),
+            "in_flight": len(self._inflight),
+            "renders": self.renders,
+            "artifact_cache_hits": self.cache_hits,
+        }
@@ -0,0 +1,208 @@
+"""
+Weather Client
+OpenWeather access for the API backend: one pooled requests.Session, a TTL
+cache per coarse lat/lon grid cell (weather varies on a ~10 km scale),
+request coalescing so concurrent requests for the same cell share a single
+upstream call, and a circuit breaker that fails fast while the upstream keeps
+failing, so callers drop to their simulated path without waiting on timeouts.
+
+base_url is configurable, so the client can be pointed at a local stub server.
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from caching import TTLCache
+
+DEFAULT_BASE_URL = "https://api.openweathermap.org/data/2.5"
+
+# Grid cell size (degrees, ~11 km) that weather requests are snapped to
+DEFAULT_CELL_DEG = 0.1
+
+
+class WeatherUnavailable(Exception):
+    """Upstream weather could not be fetched (error, timeout or open circuit)"""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After failure_threshold consecutive failures the circuit
+    opens and calls are refused for reset_timeout seconds; then one trial call
+    is let through (half-open), and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """True if a call may go upstream now"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class _InFlight:
+    """One upstream call that concurrent requests for the same cell wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WeatherClient:
+    """Cached, coalesced, circuit-broken OpenWeather client"""
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, cell_deg=DEFAULT_CELL_DEG,
+                 current_ttl=600, forecast_ttl=1800, timeout=5, pool_size=10,
+                 failure_threshold=3, reset_timeout=60.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.cell_deg = cell_deg
+        self.timeout = timeout
+        self.ttls = {"weather": current_ttl, "forecast": forecast_ttl}
+        self.caches = {kind: TTLCache(maxsize=4096, ttl=ttl) for kind, ttl in self.ttls.items()}
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def cell(self, lat, lon):
+        """Integer grid cell containing a point"""
+        return (int(round(float(lat) / self.cell_deg)), int(round(float(lon) / self.cell_deg)))
+
+    def cell_centre(self, cell):
+        return round(cell[0] * self.cell_deg, 4), round(cell[1] * self.cell_deg, 4)
+
+    def current(self, lat, lon):
+        """Current conditions for the point's cell: temperature, humidity, rainfall_today, description"""
+        return self.parse_current(self._get("weather", lat, lon))
+
+    @staticmethod
+    def parse_current(data):
+        """Fields the endpoints use from a raw current-weather response"""
+        return {
+            "temperature": data['main']['temp'],
+            "humidity": data['main']['humidity'],
+            "rainfall_today": data.get('rain', {}).get('1h', 0),
+            "description": data['weather'][0]['description']
+        }
+
+    def forecast(self, lat, lon):
+        """Raw 5-day / 3-hour forecast JSON for the point's cell"""
+        return self._get("forecast", lat, lon)
+
+    def get(self, kind, lat, lon):
+        """Raw "weather" or "forecast" JSON for the point's cell"""
+        return self._get(kind, lat, lon)
+
+    def fetch_cell(self, kind, cell):
+        """Fetch one cell from upstream (bypassing the cache) and store the result"""
+        lat, lon = self.cell_centre(cell)
+        self.upstream_calls += 1
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{kind}",
+                params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            # Report the status or error type only: request URLs carry the API key
+            reason = f"HTTP {e.response.status_code}" if getattr(e, "response", None) is not None else type(e).__name__
+            raise WeatherUnavailable(f"OpenWeather {kind} request failed: {reason}") from e
+        self.breaker.record_success()
+        self.caches[kind].put(cell, data)
+        return data
+
+    def _get(self, kind, lat, lon):
+        cell = self.cell(lat, lon)
+        data = self.caches[kind].get(cell)
+        if data is not None:
+            return data
+
+        key = (kind, cell)
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout + 1):
+                raise WeatherUnavailable(f"Timed out waiting for in-flight {kind} request")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise WeatherUnavailable("OpenWeather circuit open, using fallback")
+            call.result = self.fetch_cell(kind, cell)
+            return call.result
+        except WeatherUnavailable as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "cell_deg": self.cell_deg,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_requests": self.coalesced,
+            "rejected_by_circuit": self.rejected,
+            "cache": {kind: cache.stats() for kind, cache in self.caches.items()},
+        }
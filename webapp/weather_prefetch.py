@@ -0,0 +1,142 @@
+"""
+Weather Prefetcher
+Background thread that keeps current conditions and the 5-day forecast warm
+for a fixed grid of weather-client cells covering the district. Results go
+into a WeatherStore that request handlers read without touching the network;
+the store reports the age of every cell so staleness is visible.
+"""
+
+import threading
+import time
+
+from weather_client import WeatherUnavailable
+
+WEATHER_KINDS = ("weather", "forecast")
+
+
+def district_cells(client, bounds):
+    """All weather-client grid cells covering [lon_min, lat_min, lon_max, lat_max]"""
+    lon_min, lat_min, lon_max, lat_max = bounds
+    row_min, col_min = client.cell(lat_min, lon_min)
+    row_max, col_max = client.cell(lat_max, lon_max)
+    return [(row, col) for row in range(row_min, row_max + 1) for col in range(col_min, col_max + 1)]
+
+
+class WeatherStore:
+    """Latest upstream payload per (kind, cell) with its fetch time; reads never block on I/O"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def put(self, kind, cell, payload):
+        with self._lock:
+            self._data[(kind, cell)] = (payload, time.time())
+
+    def get(self, kind, cell):
+        """(payload, age_seconds), or (None, None) if the cell was never fetched"""
+        entry = self._data.get((kind, cell))
+        if entry is None:
+            return None, None
+        payload, fetched_at = entry
+        return payload, time.time() - fetched_at
+
+    def age(self, kind, cell):
+        return self.get(kind, cell)[1]
+
+
+class WeatherPrefetcher:
+    """
+    Refreshes every cell whose entry is older than its kind's refresh interval,
+    pacing upstream calls by min_request_interval (the free OpenWeather tier
+    allows 60 calls/minute) and pausing while the client's circuit is open.
+    """
+
+    def __init__(self, client, cells, store=None, intervals=None, min_request_interval=1.0, poll_seconds=5.0):
+        self.client = client
+        self.cells = list(cells)
+        self.store = store if store is not None else WeatherStore()
+        self.intervals = intervals or {"weather": 600, "forecast": 1800}
+        self.min_request_interval = min_request_interval
+        self.poll_seconds = poll_seconds
+        self.cycles = 0
+        self.errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="weather-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def due(self):
+        """(kind, cell) pairs that are missing or older than their refresh interval"""
+        pending = []
+        for kind in WEATHER_KINDS:
+            for cell in self.cells:
+                age = self.store.age(kind, cell)
+                if age is None or age >= self.intervals[kind]:
+                    pending.append((kind, cell))
+        return pending
+
+    def refresh_once(self):
+        """Fetch every due cell once; returns the number of cells refreshed"""
+        refreshed = 0
+        for kind, cell in self.due():
+            if self._stop.is_set():
+                break
+            if not self.client.breaker.allow():
+                break
+            try:
+                self.store.put(kind, cell, self.client.fetch_cell(kind, cell))
+                refreshed += 1
+            except WeatherUnavailable as e:
+                self.errors += 1
+                self.last_error = str(e)
+            self._stop.wait(self.min_request_interval)
+        self.cycles += 1
+        return refreshed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._stop.wait(self.poll_seconds)
+
+    def status(self):
+        """Per-cell ages (seconds) and staleness for the diagnostic endpoint"""
+        cells = []
+        stale = 0
+        for cell in self.cells:
+            lat, lon = self.client.cell_centre(cell)
+            entry = {"cell": list(cell), "lat": lat, "lon": lon}
+            cell_stale = False
+            for kind in WEATHER_KINDS:
+                age = self.store.age(kind, cell)
+                entry[f"{kind}_age_seconds"] = None if age is None else round(age, 1)
+                # Stale: never fetched or missed more than one refresh
+                cell_stale |= age is None or age > 2 * self.intervals[kind]
+            entry["stale"] = cell_stale
+            stale += cell_stale
+            cells.append(entry)
+        return {
+            "running": self.running,
+            "refresh_intervals_seconds": self.intervals,
+            "cycles": self.cycles,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "total_cells": len(self.cells),
+            "stale_cells": stale,
+            "cells": cells,
+        }